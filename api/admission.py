@@ -0,0 +1,264 @@
+# api/admission.py
+"""
+Admission control (ADMISSION_CONTROL in backend/settings.py).
+
+Views are grouped by URL name into bulkheads. Each group admits at most
+``limit`` concurrent requests per worker process; up to ``queue`` more wait
+up to ``timeout`` seconds for a slot, and anything beyond that is refused
+at once with 503 and Retry-After. When Google or Lemon Squeezy slow down,
+only the views waiting on them pile up, and the worker keeps threads free
+for everything else. Views outside every group are not limited.
+
+Streaming responses hold their slot until the body has been sent.
+Per-group active/waiting/admitted/rejected numbers are exported on /metrics
+by the worker that answers the scrape.
+"""
+import threading
+import time
+from functools import lru_cache
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import JsonResponse
+from django.urls import Resolver404, get_resolver
+from django.utils.decorators import sync_and_async_middleware
+
+
+class Bulkhead:
+    """
+    A counting semaphore with a bounded, time-limited wait queue.
+    """
+
+    def __init__(self, name, limit, queue=0, timeout=0.0, retry_after=1):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._condition = threading.Condition()
+
+    def try_acquire(self):
+        """
+        Take a free slot without waiting. Returns False if there is none.
+        """
+        with self._condition:
+            if self.active < self.limit:
+                self.active += 1
+                self.admitted += 1
+                return True
+            return False
+
+    def acquire(self):
+        """
+        Take a slot, waiting in the queue if there is room in it.
+        Returns False if the request should be shed.
+        """
+        with self._condition:
+            if self.active < self.limit:
+                self.active += 1
+                self.admitted += 1
+                return True
+            if self.waiting >= self.queue:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+            try:
+                deadline = time.monotonic() + self.timeout
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        return False
+                    self._condition.wait(remaining)
+                self.active += 1
+                self.admitted += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'limit': self.limit, 'queue': self.queue, 'active': self.active,
+                'waiting': self.waiting, 'admitted': self.admitted, 'rejected': self.rejected,
+            }
+
+
+class Bulkheads:
+    """
+    The configured groups, built from settings on first use.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._groups = None
+        self._by_view = None
+
+    def _load(self):
+        with self._lock:
+            if self._groups is None:
+                groups, by_view = {}, {}
+                for name, config in getattr(settings, 'ADMISSION_CONTROL', {}).items():
+                    groups[name] = Bulkhead(
+                        name, config['limit'], config.get('queue', 0),
+                        config.get('timeout', 0.0), config.get('retry_after', 1),
+                    )
+                    for view in config.get('views', ()):
+                        by_view[view] = groups[name]
+                self._by_view = by_view
+                self._groups = groups
+
+    def for_view(self, view_name):
+        if self._groups is None:
+            self._load()
+        return self._by_view.get(view_name)
+
+    def stats(self):
+        if self._groups is None:
+            self._load()
+        return {name: group.stats() for name, group in self._groups.items()}
+
+    def reset(self):
+        with self._lock:
+            self._groups = self._by_view = None
+        _view_name.cache_clear()
+
+
+bulkheads = Bulkheads()
+
+
+@receiver(setting_changed)
+def _settings_changed(sender, setting, **kwargs):
+    if setting in ('ADMISSION_CONTROL', 'ROOT_URLCONF'):
+        bulkheads.reset()
+
+
+@lru_cache(maxsize=1024)
+def _view_name(urlconf, path):
+    # The middleware runs before Django resolves the URL
+    try:
+        return get_resolver(urlconf).resolve(path).view_name
+    except Resolver404:
+        return None
+
+
+def _bulkhead(request):
+    if request.method == 'OPTIONS':
+        return None  # CORS preflights
+    return bulkheads.for_view(_view_name(getattr(request, 'urlconf', None), request.path_info))
+
+
+def _shed(bulkhead):
+    response = JsonResponse({"detail": "Server busy, please retry later"}, status=503)
+    response['Retry-After'] = str(bulkhead.retry_after)
+    return response
+
+
+class _ReleaseAfterStreaming:
+    """
+    Streaming body that gives the slot back when the server closes the
+    response, whether or not the body was fully sent.
+    """
+
+    def __init__(self, content, release):
+        self._content = content
+        self._release = release
+
+    def __iter__(self):
+        return iter(self._content)
+
+    def close(self):
+        try:
+            if hasattr(self._content, 'close'):
+                self._content.close()
+        finally:
+            self._release()
+
+
+def _hold(response, bulkhead):
+    """
+    Release the slot now, or once a streaming response has been sent.
+    """
+    if response is None or not response.streaming or response.is_async:
+        bulkhead.release()
+        return response
+    released = []
+
+    def release():
+        if not released:
+            released.append(True)
+            bulkhead.release()
+    response.streaming_content = _ReleaseAfterStreaming(response.streaming_content, release)
+    return response
+
+
+@sync_and_async_middleware
+def AdmissionControlMiddleware(get_response):
+    """
+    Apply the ADMISSION_CONTROL bulkheads. Put it right after MetricsMiddleware
+    so shed requests are still counted.
+    """
+    if not getattr(settings, 'ADMISSION_CONTROL_ENABLED', True):
+        raise MiddlewareNotUsed()
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            bulkhead = _bulkhead(request)
+            if bulkhead is None:
+                return await get_response(request)
+            # Never block the event loop: only queued requests wait, in a thread
+            if not bulkhead.try_acquire() and not await sync_to_async(bulkhead.acquire, thread_sensitive=False)():
+                return _shed(bulkhead)
+            response = None
+            try:
+                response = await get_response(request)
+            finally:
+                if response is None:
+                    bulkhead.release()
+            return _hold(response, bulkhead)
+    else:
+        def middleware(request):
+            bulkhead = _bulkhead(request)
+            if bulkhead is None:
+                return get_response(request)
+            if not bulkhead.acquire():
+                return _shed(bulkhead)
+            response = None
+            try:
+                response = get_response(request)
+            finally:
+                if response is None:
+                    bulkhead.release()
+            return _hold(response, bulkhead)
+    return middleware
+
+
+def render_metrics():
+    """
+    Prometheus lines for this process's bulkheads (appended to /metrics).
+    """
+    stats = bulkheads.stats()
+    lines = []
+    for metric, key, kind, help_text in (
+        ('django_admission_active_requests', 'active', 'gauge', 'Requests holding a slot, by group.'),
+        ('django_admission_queued_requests', 'waiting', 'gauge', 'Requests waiting for a slot, by group.'),
+        ('django_admission_limit', 'limit', 'gauge', 'Concurrent requests allowed, by group.'),
+        ('django_admission_queue_limit', 'queue', 'gauge', 'Requests allowed to wait, by group.'),
+        ('django_admission_admitted_total', 'admitted', 'counter', 'Requests admitted, by group.'),
+        ('django_admission_rejected_total', 'rejected', 'counter', 'Requests shed with 503, by group.'),
+    ):
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} {kind}']
+        lines += [f'{metric}{{group="{name}"}} {group[key]}' for name, group in sorted(stats.items())]
+    return '\n'.join(lines) + '\n'
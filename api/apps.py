@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Connect the user cache and response cache invalidation, DB metrics
+        # and SQLite pragma signals
+        from . import authentication, metrics, response_cache, sqlite  # noqa: F401
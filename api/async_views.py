@@ -0,0 +1,231 @@
+# api/async_views.py
+"""
+Native async versions of the I/O-bound endpoints.
+
+They keep the request/response contracts of their DRF counterparts in
+api/views.py but never park a worker thread on Google or Lemon Squeezy:
+outbound calls go through the pooled httpx client and database access uses
+the async ORM. api/urls.py routes to them when settings.ASYNC_VIEWS is on
+(serve with uvicorn via backend/asgi.py).
+"""
+import json
+import logging
+from decimal import InvalidOperation
+from functools import wraps
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import google_auth, rollups
+from .authentication import CachedJWTAuthentication
+from .catalog import ProductCatalogError
+from .views import (
+    login_response_data,
+    new_transaction_id,
+    parse_price,
+    payment_intent_data,
+    provision_google_user,
+    product_catalog,
+)
+
+logger = logging.getLogger(__name__)
+
+_renderer = JSONRenderer()
+_jwt_authentication = CachedJWTAuthentication()
+
+
+def _render(data, status_code=status.HTTP_200_OK, headers=None):
+    """
+    Render ``data`` exactly as DRF's JSONRenderer would for a Response.
+    """
+    response = HttpResponse(
+        _renderer.render(data),
+        content_type='application/json',
+        status=status_code,
+    )
+    for name, value in (headers or {}).items():
+        response[name] = value
+    return response
+
+
+def _render_exception(exc):
+    """
+    Mirror rest_framework.views.exception_handler for an APIException.
+    """
+    headers = {}
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        headers['WWW-Authenticate'] = _jwt_authentication.authenticate_header(None)
+        status_code = status.HTTP_401_UNAUTHORIZED
+    else:
+        status_code = exc.status_code
+    if isinstance(exc.detail, (list, dict)):
+        data = exc.detail
+    else:
+        data = {'detail': exc.detail}
+    return _render(data, status_code, headers)
+
+
+def _request_data(request):
+    """
+    Parse the request body like DRF's JSON/form parsers do.
+    """
+    if request.content_type == 'application/json':
+        if not request.body:
+            return {}
+        try:
+            return json.loads(request.body)
+        except ValueError as e:
+            raise exceptions.ParseError(f"JSON parse error - {str(e)}")
+    return request.POST
+
+
+def _require_methods(*methods):
+    """
+    Async view decorator rejecting other methods with DRF's 405 body.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                response = _render_exception(exceptions.MethodNotAllowed(request.method))
+                response['Allow'] = ', '.join(methods)
+                return response
+            return await view(request, *args, **kwargs)
+        return csrf_exempt(wrapper)
+    return decorator
+
+
+async def aauthenticate(request):
+    """
+    Async equivalent of JWTAuthentication.authenticate(); returns a user or
+    raises NotAuthenticated/AuthenticationFailed.
+    """
+    header = _jwt_authentication.get_header(request)
+    raw_token = _jwt_authentication.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        raise exceptions.NotAuthenticated()
+
+    # Signature and expiry checks are CPU only; the user usually comes from the cache.
+    validated_token = _jwt_authentication.get_validated_token(raw_token)
+    return await _jwt_authentication.aget_user(validated_token)
+
+
+@_require_methods('POST')
+async def google_login(request):
+    try:
+        google_token = _request_data(request).get('token')
+    except exceptions.APIException as e:
+        return _render_exception(e)
+    if not google_token:
+        return _render({'error': 'No token provided'}, status.HTTP_400_BAD_REQUEST)
+
+    try:
+        # ID tokens are verified locally; access tokens go through the (cached) userinfo call
+        try:
+            userinfo = await google_auth.aresolve_google_user(google_token)
+        except google_auth.GoogleTokenError as e:
+            return _render({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+
+        email = userinfo.get('email')
+        if not email:
+            return _render({'error': 'Email not found in user info'}, status.HTTP_400_BAD_REQUEST)
+
+        first_name = userinfo.get('given_name', '')
+        last_name = userinfo.get('family_name', '')
+        sub = userinfo.get('sub')  # This is the Google user ID
+
+        if not sub:
+            return _render({'error': 'User ID not found in Google response'}, status.HTTP_400_BAD_REQUEST)
+
+        # Provisioning needs a transaction, which the async ORM cannot open
+        user, account = await sync_to_async(provision_google_user)(email, first_name, last_name, sub, userinfo)
+
+        # Generate JWT tokens
+        refresh = RefreshToken.for_user(user)
+
+        return _render(login_response_data(user, account, refresh))
+
+    except httpx.HTTPError as e:
+        logger.error(f"Google login error: {str(e)}")
+        return _render(
+            {'error': f'Failed to communicate with Google: {str(e)}'},
+            status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        logger.error(f"Unexpected error during Google login: {str(e)}")
+        return _render(
+            {'error': f'Authentication failed: {str(e)}'},
+            status.HTTP_400_BAD_REQUEST
+        )
+
+
+@_require_methods('GET')
+async def get_products(request):
+    """
+    Returns the product list as a JSON response.
+    """
+    try:
+        products_list = await product_catalog.aproducts()
+        logger.info(f"Returning {len(products_list)} products to client")
+        return _render(products_list)
+    except Exception as e:
+        logger.exception("Unexpected error fetching Lemon Squeezy products")
+        return _render({"detail": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@_require_methods('POST')
+async def create_payment_intent(request):
+    """
+    Create a payment intent (transaction) and return a checkout URL
+    """
+    try:
+        user = await aauthenticate(request)
+        product_id = _request_data(request).get('product_id')
+    except exceptions.APIException as e:
+        return _render_exception(e)
+
+    try:
+        if not product_id:
+            return _render({"detail": "product_id is required"}, status.HTTP_400_BAD_REQUEST)
+
+        try:
+            product_info = await product_catalog.aget(product_id)
+        except ProductCatalogError as e:
+            logger.error(f"Failed to fetch products list: {str(e)}")
+            return _render({"detail": "Failed to fetch products list"}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        if not product_info:
+            logger.error(f"Invalid product_id received: {product_id}")
+            return _render({"detail": "Invalid product_id"}, status.HTTP_400_BAD_REQUEST)
+
+        try:
+            amount = parse_price(product_info["price"])
+        except (InvalidOperation, ValueError) as e:
+            logger.error(f"Failed to parse price string '{product_info['price']}': {str(e)}")
+            return _render(
+                {"detail": "Invalid price format from product data"},
+                status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        # Create a local transaction with 'pending' status
+        transaction = await sync_to_async(rollups.create_transaction)(
+            user=user,
+            transaction_id=new_transaction_id(),
+            amount=amount,
+            status='pending',
+            currency='CAD'  # Adjust as needed
+        )
+
+        return _render(payment_intent_data(product_info, transaction), status.HTTP_201_CREATED)
+
+    except Exception as e:
+        logger.error(f"Error creating payment intent: {str(e)}", exc_info=True)
+        return _render(
+            {"detail": "Error creating payment intent"},
+            status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
@@ -0,0 +1,239 @@
+# api/authentication.py
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .db_router import primary, replicas
+
+
+class UserCache:
+    """
+    Per-process LRU of authenticated users, keyed by str(user id) since
+    tokens may carry the id claim as a string.
+
+    Entries expire after AUTH_USER_CACHE_TTL seconds and the cache holds at
+    most AUTH_USER_CACHE_SIZE users. If AUTH_USER_CACHE_ALIAS names a Django
+    cache, misses fall through to it so processes share warm entries.
+
+    Only raw field values are stored, minus UNCACHED_FIELDS (the password
+    hash never reaches the cache; it is loaded from the database if a
+    request reads it). Every hit builds a fresh model instance, so related
+    objects cached on one request's user never leak into another.
+
+    Saves and deletes of the user invalidate the entry. With a shared cache
+    they also bump the user's version there, and every process checks the
+    version on each hit, so a deactivated user is refused everywhere on the
+    next request. Without one, other processes keep serving their copy until
+    it expires (at most AUTH_USER_CACHE_TTL seconds). QuerySet.update()
+    bypasses signals and is only picked up once entries expire.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'AUTH_USER_CACHE_TTL', 60)
+
+    @property
+    def maxsize(self):
+        return getattr(settings, 'AUTH_USER_CACHE_SIZE', 1024)
+
+    def _shared(self):
+        alias = getattr(settings, 'AUTH_USER_CACHE_ALIAS', None)
+        return caches[alias] if alias else None
+
+    @staticmethod
+    def _key(user_id):
+        return f'auth-user:{user_id}'
+
+    @staticmethod
+    def _version_key(user_id):
+        return f'auth-user-version:{user_id}'
+
+    def _local_get(self, user_id, version):
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, state, entry_version = entry
+            if expires_at <= time.monotonic() or entry_version != version:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return state
+
+    def _local_set(self, user_id, state, version):
+        user_id = str(user_id)
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, state, version)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def lookup(self, user_id):
+        """
+        Return ``(user, version)``; user is None on a miss. Pass the version
+        to set() so a change that lands while the user is being loaded
+        retires the entry again.
+        """
+        if self.ttl <= 0:
+            return None, None
+        shared = self._shared()
+        version = shared.get(self._version_key(user_id)) if shared is not None else None
+        state = self._local_get(user_id, version)
+        if state is None and shared is not None:
+            entry = shared.get(self._key(user_id))
+            if entry is not None and entry[0] == version:
+                state = entry[1]
+                self._local_set(user_id, state, version)
+        return (_thaw(state) if state is not None else None), version
+
+    async def alookup(self, user_id):
+        if self.ttl <= 0:
+            return None, None
+        shared = self._shared()
+        version = await shared.aget(self._version_key(user_id)) if shared is not None else None
+        state = self._local_get(user_id, version)
+        if state is None and shared is not None:
+            entry = await shared.aget(self._key(user_id))
+            if entry is not None and entry[0] == version:
+                state = entry[1]
+                self._local_set(user_id, state, version)
+        return (_thaw(state) if state is not None else None), version
+
+    def get(self, user_id):
+        return self.lookup(user_id)[0]
+
+    def set(self, user_id, user, version=None):
+        if self.ttl <= 0:
+            return
+        state = _freeze(user)
+        self._local_set(user_id, state, version)
+        shared = self._shared()
+        if shared is not None:
+            shared.set(self._key(user_id), (version, state), self.ttl)
+
+    async def aset(self, user_id, user, version=None):
+        if self.ttl <= 0:
+            return
+        state = _freeze(user)
+        self._local_set(user_id, state, version)
+        shared = self._shared()
+        if shared is not None:
+            await shared.aset(self._key(user_id), (version, state), self.ttl)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+        shared = self._shared()
+        if shared is not None:
+            # Outlives every entry filled under the old version
+            shared.set(self._version_key(user_id), uuid.uuid4().hex, self.ttl)
+            shared.delete(self._key(user_id))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Never copied into the cache; authentication does not need them
+UNCACHED_FIELDS = ('password', 'last_login')
+
+
+def _cached_fields(model):
+    return [field.attname for field in model._meta.concrete_fields if field.attname not in UNCACHED_FIELDS]
+
+
+def _freeze(user):
+    return user._state.db, tuple(getattr(user, name) for name in _cached_fields(type(user)))
+
+
+def _thaw(state):
+    db, values = state
+    user_model = get_user_model()
+    # The uncached fields are deferred and loaded on first access
+    return user_model.from_db(db, _cached_fields(user_model), values)
+
+
+user_cache = UserCache()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def _invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(getattr(instance, api_settings.USER_ID_FIELD))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user through ``user_cache``
+    instead of querying the user table on every request. The active and
+    revoked-token checks still run against the (cached) user on every request.
+    """
+
+    def get_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+        user, version = user_cache.lookup(user_id)
+        if user is None:
+            lookup = {api_settings.USER_ID_FIELD: user_id}
+            try:
+                user = self.user_model.objects.get(**lookup)
+            except self.user_model.DoesNotExist:
+                # A user created moments ago may not have reached the replica yet
+                if not replicas():
+                    raise AuthenticationFailed("User not found", code="user_not_found")
+                try:
+                    with primary():
+                        user = self.user_model.objects.get(**lookup)
+                except self.user_model.DoesNotExist:
+                    raise AuthenticationFailed("User not found", code="user_not_found")
+            user_cache.set(user_id, user, version)
+        return self._check_user(user, validated_token)
+
+    async def aget_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+        user, version = await user_cache.alookup(user_id)
+        if user is None:
+            lookup = {api_settings.USER_ID_FIELD: user_id}
+            try:
+                user = await self.user_model.objects.aget(**lookup)
+            except self.user_model.DoesNotExist:
+                if not replicas():
+                    raise AuthenticationFailed("User not found", code="user_not_found")
+                try:
+                    with primary():
+                        user = await self.user_model.objects.aget(**lookup)
+                except self.user_model.DoesNotExist:
+                    raise AuthenticationFailed("User not found", code="user_not_found")
+            await user_cache.aset(user_id, user, version)
+        return self._check_user(user, validated_token)
+
+    @staticmethod
+    def _user_id(validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+    @staticmethod
+    def _check_user(user, validated_token):
+        if getattr(api_settings, 'CHECK_USER_IS_ACTIVE', True) and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        if getattr(api_settings, 'CHECK_REVOKE_TOKEN', False):
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed("The user's password has been changed.", code="password_changed")
+        return user
@@ -0,0 +1,307 @@
+# api/benchmarks.py
+"""
+Micro-benchmarks for the serializers, every API view and the webhook
+handler, run by ``python manage.py benchmark``.
+
+Each benchmark is a zero-argument callable. It is timed over a number of
+iterations and reported as ops/sec, p50/p99 latency, queries per call and
+peak Python memory (tracemalloc, measured on one extra call so that tracing
+does not skew the timings). Results are plain JSON, so a stored run can be
+used as the baseline for the next one.
+"""
+import hashlib
+import hmac
+import json
+import math
+import time
+import tracemalloc
+from contextlib import ExitStack
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections, transaction as db_transaction
+from django.test import Client, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import google_auth, rollups, webhooks
+from .fast_serializers import FastJSONRenderer, payment_transaction_values, sample_values
+from .models import PaymentTransaction, SampleModel, UserAccount, WebhookEvent
+from .response_cache import sample_list_cache
+from .serializers import PaymentTransactionSerializer, SampleSerializer
+from .views import product_catalog
+
+BENCHMARK_PRODUCT = {
+    'id': 'benchmark-product', 'name': 'Benchmark credits', 'slug': 'benchmark-credits',
+    'price': '$10.00', 'by_now_url': 'https://example.com/checkout/benchmark',
+}
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(sorted_values, q):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def measure(fn, iterations, warmup=0):
+    """
+    Time ``fn`` and return its stats dict.
+    """
+    for _ in range(warmup):
+        fn()
+
+    counter = _QueryCounter()
+    timings = []
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+        for _ in range(iterations):
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    total = sum(timings)
+    return {
+        'iterations': iterations,
+        'ops_per_sec': round(iterations / total, 1) if total else None,
+        'mean_ms': round(total / iterations * 1000, 4),
+        'p50_ms': round(percentile(timings, 50) * 1000, 4),
+        'p99_ms': round(percentile(timings, 99) * 1000, 4),
+        'queries_per_op': round(counter.count / iterations, 2),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def seed(samples, users, transactions):
+    """
+    Bulk-insert the benchmark data set. Returns the user the views run as.
+    """
+    SampleModel.objects.bulk_create(
+        [SampleModel(name=f'benchmark-{i}', age=i % 100) for i in range(samples)], batch_size=1000
+    )
+    User.objects.bulk_create(
+        [User(username=f'benchmark-user-{i}', email=f'benchmark-user-{i}@example.com') for i in range(users)],
+        batch_size=1000,
+    )
+    # Not every backend returns primary keys from bulk_create
+    created = list(User.objects.filter(username__startswith='benchmark-user-').order_by('id'))
+    UserAccount.objects.bulk_create(
+        [UserAccount(user=user, account_value=Decimal('100.00')) for user in created], batch_size=1000
+    )
+    statuses = ('completed', 'completed', 'completed', 'pending', 'failed')
+    PaymentTransaction.objects.bulk_create(
+        [
+            PaymentTransaction(
+                user=created[i % len(created)],
+                transaction_id=f'benchmark-seed-{i}',
+                amount=Decimal(f'{(i % 50) + 1}.00'),
+                status=statuses[i % len(statuses)],
+            )
+            for i in range(transactions)
+        ],
+        batch_size=1000,
+    )
+    return created[0]
+
+
+def _consume(response):
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def build_benchmarks(user, calls, page_size=500):
+    """
+    Return {name: callable}. ``calls`` is the number of times each callable
+    will run, so one-shot fixtures (pending transactions, inbox events) can
+    be created up front.
+    """
+    token = str(RefreshToken.for_user(user).access_token)
+    client = Client(SERVER_NAME='localhost', headers={'Authorization': f'Bearer {token}'})
+    anonymous = Client(SERVER_NAME='localhost')
+
+    samples = list(SampleModel.objects.order_by('id')[:page_size])
+    payments = list(PaymentTransaction.objects.filter(user=user).order_by('-created_at', '-id')[:page_size])
+    sample_rows = list(sample_values.rows(SampleModel.objects.order_by('id'))[:page_size])
+    payment_rows = list(payment_transaction_values.rows(
+        PaymentTransaction.objects.filter(user=user).order_by('-created_at', '-id'))[:page_size])
+    payment_page = {'next': None, 'previous': None,
+                    'results': payment_transaction_values.to_representation(payment_rows)}
+
+    # Fixtures consumed one per call
+    pending = PaymentTransaction.objects.bulk_create([
+        PaymentTransaction(user=user, transaction_id=f'benchmark-pending-{i}', amount=Decimal('5.00'))
+        for i in range(calls * 2)
+    ])
+    apply_ids = iter(t.transaction_id for t in pending[:calls])
+    inbox_ids = [t.transaction_id for t in pending[calls:]]
+    WebhookEvent.objects.bulk_create([
+        WebhookEvent(
+            event_id=f'benchmark-{transaction_id}', event_name='order_paid',
+            payload=json.dumps({'meta': {'event_name': 'order_paid',
+                                         'custom_data': {'transaction_id': transaction_id}}}),
+        )
+        for transaction_id in inbox_ids
+    ])
+    received = iter(range(calls))
+    secret = settings.LEMON_SQUEEZY_SIGNING_SECRET.encode('utf-8')
+
+    def check(response, expected=200):
+        assert response.status_code == expected, (response.status_code, response.content[:200])
+        return _consume(response)
+
+    def serialize_samples():
+        SampleSerializer(samples, many=True).data
+
+    def serialize_payments():
+        PaymentTransactionSerializer(payments, many=True).data
+
+    def render_payments(renderer):
+        renderer.render(payment_page, 'application/json', {})
+
+    def receive_webhook():
+        body = json.dumps({'meta': {'event_name': 'order_created',
+                                    'custom_data': {'transaction_id': f'benchmark-received-{next(received)}'}}})
+        signature = hmac.new(secret, body.encode('utf-8'), hashlib.sha256).hexdigest()
+        check(anonymous.post('/api/webhooks/lemonsqueezy/', body, content_type='application/json',
+                             headers={'X-Signature': signature}))
+
+    def apply_webhook():
+        with db_transaction.atomic():
+            webhooks.apply_event('order_paid', next(apply_ids), {})
+
+    def process_webhook():
+        counts = webhooks.process_batch(batch_size=1)
+        assert counts['processed'] == 1, counts
+
+    return {
+        'serializer.samples_many': serialize_samples,
+        'serializer.payment_transactions_many': serialize_payments,
+        # The read-only fast path the list views use, from rows already fetched
+        'serializer.samples_values': lambda: sample_values.to_representation(sample_rows),
+        'serializer.payment_transactions_values': lambda: payment_transaction_values.to_representation(payment_rows),
+        'renderer.json': lambda: render_payments(JSONRenderer()),
+        'renderer.fast_json': lambda: render_payments(FastJSONRenderer()),
+        'view.root': lambda: check(client.get('/api/')),
+        'view.all_samples': lambda: check(client.get('/api/api/all')),
+        'view.all_samples_large_page': lambda: check(client.get(f'/api/api/all?page_size={page_size}')),
+        'view.search_prefix': lambda: check(client.get('/api/api/search?q=benchmark-12')),
+        'view.search_contains': lambda: check(client.get('/api/api/search?q=99999&match=contains')),
+        'view.search_age_range': lambda: check(client.get('/api/api/search?age_min=40&age_max=42&ordering=-age')),
+        'view.export_samples': lambda: check(client.get('/api/api/export')),
+        'view.add_sample': lambda: check(client.post('/api/api/add', {'name': 'bench', 'age': 30},
+                                                     content_type='application/json'), 201),
+        'view.add_samples_bulk': lambda: check(client.post(
+            '/api/api/bulk', [{'name': f'bench-{i}', 'age': i % 100} for i in range(100)],
+            content_type='application/json'), 201),
+        'view.user_account': lambda: check(client.get('/api/account/')),
+        'view.payment_history': lambda: check(client.get('/api/payments/history/')),
+        'view.payment_stats': lambda: check(client.get('/api/payments/stats/?group_by=day,status')),
+        'view.export_payments': lambda: check(client.get('/api/payments/export/')),
+        'view.products': lambda: check(client.get('/api/payments/products/')),
+        'view.create_payment': lambda: check(client.post(
+            '/api/payments/create/', {'product_id': BENCHMARK_PRODUCT['id']},
+            content_type='application/json'), 201),
+        'view.google_login_returning_user': lambda: check(anonymous.post(
+            '/api/auth/google/', {'token': 'benchmark'}, content_type='application/json')),
+        'webhook.receive': receive_webhook,
+        'webhook.apply_event': apply_webhook,
+        'webhook.process_event': process_webhook,
+    }
+
+
+def run(samples, users, transactions, iterations, warmup, only=None, page_size=500):
+    """
+    Seed the data set, run the selected benchmarks and roll everything back.
+    """
+    results = {}
+    calls = iterations + warmup + 1
+    userinfo = None
+
+    class _Rollback(Exception):
+        pass
+
+    try:
+        with db_transaction.atomic(), ExitStack() as stack:
+            user = seed(samples, users, transactions)
+            rollups.rebuild()
+            # bulk_create bypasses the signals; also retire the seeded pages afterwards
+            sample_list_cache.bump()
+            stack.callback(sample_list_cache.bump)
+            userinfo = {'sub': 'benchmark-google-id', 'email': user.email,
+                        'given_name': 'Bench', 'family_name': 'Mark'}
+            stack.enter_context(mock.patch.object(
+                google_auth, 'resolve_google_user', side_effect=lambda token: dict(userinfo)))
+            # The webhook view refuses the placeholder secret from settings.py
+            stack.enter_context(override_settings(LEMON_SQUEEZY_SIGNING_SECRET='benchmark-signing-secret'))
+            product_catalog._publish([BENCHMARK_PRODUCT])
+            stack.callback(product_catalog.invalidate)
+
+            benchmarks = build_benchmarks(user, calls, page_size=page_size)
+            for name, fn in benchmarks.items():
+                if only and not any(pattern in name for pattern in only):
+                    continue
+                results[name] = measure(fn, iterations, warmup)
+            raise _Rollback
+    except _Rollback:
+        pass
+
+    return {
+        'meta': {
+            'samples': samples,
+            'users': users,
+            'transactions': transactions,
+            'iterations': iterations,
+            'warmup': warmup,
+            'database': connections['default'].vendor,
+        },
+        'benchmarks': results,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare a run against a baseline run. A benchmark regresses when its p50
+    is more than ``tolerance`` (a fraction) slower or it runs more queries.
+    Returns (changes, regressions).
+    """
+    changes, regressions = {}, []
+    for name, current in results['benchmarks'].items():
+        previous = baseline.get('benchmarks', {}).get(name)
+        if not previous:
+            continue
+        ratio = current['p50_ms'] / previous['p50_ms'] if previous['p50_ms'] else None
+        changes[name] = {
+            'p50_ratio': round(ratio, 3) if ratio is not None else None,
+            'queries_delta': round(current['queries_per_op'] - previous['queries_per_op'], 2),
+        }
+        if ratio is not None and ratio > 1 + tolerance:
+            regressions.append(f"{name}: p50 {previous['p50_ms']}ms -> {current['p50_ms']}ms")
+        if current['queries_per_op'] > previous['queries_per_op'] + 0.01:
+            regressions.append(
+                f"{name}: queries/op {previous['queries_per_op']} -> {current['queries_per_op']}"
+            )
+    return changes, regressions
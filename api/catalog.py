@@ -0,0 +1,202 @@
+# api/catalog.py
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ProductCatalogError(Exception):
+    """
+    Raised when the product catalog cannot be loaded from the upstream API.
+    """
+
+
+class _Flight:
+    """
+    A single in-progress fetch that concurrent callers can wait on.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+
+class ProductCatalog:
+    """
+    In-process cache for the Lemon Squeezy product list.
+
+    - Fresh entries (younger than ``ttl``) are served straight from memory.
+    - Stale entries (younger than ``ttl + stale_ttl``) are served immediately
+      while a single background thread refreshes them.
+    - When there is nothing usable, exactly one caller fetches while all
+      concurrent callers wait for its result (single-flight).
+    - ``get(product_id)`` is a dict lookup on an id -> product index.
+
+    ``aproducts()``/``aget()`` are the async variants; on a cold miss they
+    fetch with ``async_fetcher`` instead of blocking a thread.
+    """
+
+    def __init__(self, fetcher, ttl=None, stale_ttl=None, async_fetcher=None):
+        self._fetcher = fetcher
+        self._async_fetcher = async_fetcher
+        self._ttl = ttl
+        self._stale_ttl = stale_ttl
+        self._lock = threading.Lock()
+        # (products, index, fetched_at) is swapped as one tuple so readers
+        # never observe a list and an index from different fetches.
+        self._snapshot = None
+        self._flight = None
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(settings, 'PRODUCT_CATALOG_TTL', 300)
+
+    @property
+    def stale_ttl(self):
+        if self._stale_ttl is not None:
+            return self._stale_ttl
+        return getattr(settings, 'PRODUCT_CATALOG_STALE_TTL', 3600)
+
+    def products(self):
+        """
+        Return the cached product list, loading or refreshing it as needed.
+        """
+        products, _ = self._current()
+        return list(products)
+
+    def get(self, product_id):
+        """
+        Return the product with the given id, or None if it is unknown.
+        """
+        _, index = self._current()
+        return index.get(product_id)
+
+    async def aproducts(self):
+        products, _ = await self._acurrent()
+        return list(products)
+
+    async def aget(self, product_id):
+        _, index = await self._acurrent()
+        return index.get(product_id)
+
+    def invalidate(self):
+        """
+        Drop the cached catalog so the next caller fetches a fresh copy.
+        """
+        with self._lock:
+            self._snapshot = None
+
+    def _cached(self):
+        """
+        Return ``(products, index)`` if a usable snapshot exists, else None.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        products, index, fetched_at = snapshot
+        age = time.monotonic() - fetched_at
+        if age < self.ttl:
+            return products, index
+        if age < self.ttl + self.stale_ttl:
+            self._refresh_in_background()
+            return products, index
+        return None
+
+    def _loaded(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            raise ProductCatalogError("Product catalog is not available")
+        products, index, _ = snapshot
+        return products, index
+
+    def _current(self):
+        cached = self._cached()
+        if cached is not None:
+            return cached
+        self._load()
+        return self._loaded()
+
+    async def _acurrent(self):
+        cached = self._cached()
+        if cached is not None:
+            return cached
+        if self._async_fetcher is None:
+            await sync_to_async(self._load, thread_sensitive=False)()
+        else:
+            await self._aload()
+        return self._loaded()
+
+    def _start_flight(self):
+        """
+        Return ``(flight, is_leader)``; only the leader performs the fetch.
+        """
+        with self._lock:
+            if self._flight is not None:
+                return self._flight, False
+            self._flight = _Flight()
+            return self._flight, True
+
+    def _load(self):
+        flight, is_leader = self._start_flight()
+        if is_leader:
+            self._run_flight(flight)
+        else:
+            flight.done.wait()
+        if flight.error is not None and self._snapshot is None:
+            raise flight.error
+
+    async def _aload(self):
+        flight, is_leader = self._start_flight()
+        if is_leader:
+            try:
+                self._publish(await self._async_fetcher())
+            except Exception as e:
+                self._fail(flight, e)
+            finally:
+                self._land(flight)
+        else:
+            await sync_to_async(flight.done.wait, thread_sensitive=False)()
+        if flight.error is not None and self._snapshot is None:
+            raise flight.error
+
+    def _refresh_in_background(self):
+        flight, is_leader = self._start_flight()
+        if not is_leader:
+            return
+        thread = threading.Thread(
+            target=self._run_flight,
+            args=(flight,),
+            name='product-catalog-refresh',
+            daemon=True,
+        )
+        thread.start()
+
+    def _run_flight(self, flight):
+        try:
+            self._publish(self._fetcher())
+        except Exception as e:
+            self._fail(flight, e)
+        finally:
+            self._land(flight)
+
+    def _publish(self, products):
+        products = list(products)
+        index = {item['id']: item for item in products if item.get('id')}
+        with self._lock:
+            self._snapshot = (products, index, time.monotonic())
+        logger.debug(f"Product catalog refreshed with {len(products)} products")
+
+    def _fail(self, flight, error):
+        flight.error = error
+        logger.error(f"Failed to refresh product catalog: {str(error)}")
+
+    def _land(self, flight):
+        with self._lock:
+            self._flight = None
+        flight.done.set()
@@ -0,0 +1,169 @@
+# api/db_router.py
+"""
+Primary/replica routing (DATABASE_REPLICAS in backend/settings.py).
+
+Writes always go to the primary ('default'). Reads made while handling a
+safe request (GET/HEAD/OPTIONS) go to a random replica, except:
+
+- inside a transaction on the primary, which must see its own writes;
+- once the request has written anything;
+- for REPLICA_PIN_SECONDS after a user's own write, so they read their
+  writes back (the pin is kept in the Django cache, shared across workers
+  when CACHE_DIR is set);
+- in views wrapped with @use_primary, or inside ``with primary():``;
+- for sessions, whose rows are written on login and read immediately after.
+
+Reads outside a request (management commands, background work) use the
+primary. ReplicaRoutingMiddleware tracks the request; without replicas the
+router sends everything to the primary.
+"""
+import contextvars
+import functools
+import random
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.decorators import sync_and_async_middleware
+from django.utils.functional import SimpleLazyObject, empty
+
+PRIMARY = DEFAULT_DB_ALIAS
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Written during a request and read back by the next one
+PRIMARY_APPS = ('sessions',)
+
+_request = contextvars.ContextVar('api_db_request', default=None)
+_forced = contextvars.ContextVar('api_db_primary', default=False)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class _RequestState:
+    __slots__ = ('request', 'wrote', 'pinned')
+
+    def __init__(self, request):
+        self.request = request
+        self.wrote = False
+        self.pinned = None  # unknown until the user is
+
+
+def _user_id(request):
+    # DRF sets request.user once it has authenticated the request; Django's
+    # lazy session user is only used if something already evaluated it
+    user = request.__dict__.get('user')
+    if isinstance(user, SimpleLazyObject):
+        user = None if user._wrapped is empty else user._wrapped
+    if user is None or not user.is_authenticated:
+        return None
+    return user.pk
+
+
+def _pin_key(user_id):
+    return f'db-primary-pin:{user_id}'
+
+
+def _pinned(state):
+    if state.pinned is None:
+        user_id = _user_id(state.request)
+        if user_id is None:
+            return False
+        state.pinned = cache.get(_pin_key(user_id)) is not None
+    return state.pinned
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        databases = replicas()
+        if not databases or _forced.get() or model._meta.app_label in PRIMARY_APPS:
+            return PRIMARY
+        state = _request.get()
+        if (state is None or state.wrote or state.request.method not in SAFE_METHODS
+                or connections[PRIMARY].in_atomic_block or _pinned(state)):
+            return PRIMARY
+        return random.choice(databases)
+
+    def db_for_write(self, model, **hints):
+        state = _request.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        if db in replicas():
+            return False
+        return None
+
+
+@contextmanager
+def primary():
+    """
+    Send every read in the block to the primary.
+    """
+    token = _forced.set(True)
+    try:
+        yield
+    finally:
+        _forced.reset(token)
+
+
+def use_primary(view):
+    """
+    View decorator: the view reads from the primary only, e.g. when it must
+    see writes made by someone else (a webhook) moments ago.
+    """
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(*args, **kwargs):
+            with primary():
+                return await view(*args, **kwargs)
+    else:
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with primary():
+                return view(*args, **kwargs)
+    return wrapper
+
+
+def _finish(state):
+    if state.wrote:
+        user_id = _user_id(state.request)
+        if user_id is not None:
+            cache.set(_pin_key(user_id), 1, getattr(settings, 'REPLICA_PIN_SECONDS', 15))
+
+
+@sync_and_async_middleware
+def ReplicaRoutingMiddleware(get_response):
+    """
+    Track the current request for PrimaryReplicaRouter and pin users to the
+    primary after they write.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            state = _RequestState(request)
+            token = _request.set(state)
+            try:
+                return await get_response(request)
+            finally:
+                _request.reset(token)
+                _finish(state)
+    else:
+        def middleware(request):
+            state = _RequestState(request)
+            token = _request.set(state)
+            try:
+                return get_response(request)
+            finally:
+                _request.reset(token)
+                _finish(state)
+    return middleware
@@ -0,0 +1,207 @@
+# api/fast_serializers.py
+"""
+Read-only fast path for list endpoints.
+
+ValuesSerializer produces the same dicts as ``ModelSerializer(many=True).data``
+but reads rows with ``values_list()`` instead of building model instances, and
+converts each column with a function picked once per serializer from the
+serializer's own fields: nothing for ints and strings, a precompiled
+quantize/format for Decimal, isoformat in the current time zone for datetimes.
+Fields it does not recognise are converted with their own to_representation,
+so the output stays identical to the serializer it wraps.
+
+FastJSONRenderer renders those plain dicts with orjson when it is installed
+(an optional dependency) and with a reused stdlib encoder otherwise, handing
+anything else back to DRF's JSONRenderer.
+"""
+import decimal
+import json
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+from rest_framework import fields as drf_fields
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import ISO_8601, api_settings
+
+from .serializers import PaymentTransactionSerializer, SampleSerializer
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+
+class _DateTimeConverter:
+    """
+    DRF's DateTimeField with the default ISO 8601 format. Looking up the
+    current time zone is the slow part, so it is bound once per call to
+    ValuesSerializer.to_representation() rather than once per value.
+    """
+
+    def __init__(self, field):
+        self.field = field
+
+    def bind(self):
+        field = self.field
+        field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if field_timezone is None:
+            return field.to_representation
+
+        def convert(value):
+            if value.utcoffset() is None:
+                return field.to_representation(value)
+            try:
+                value = value.astimezone(field_timezone).isoformat()
+            except OverflowError:
+                return field.to_representation(value)
+            if value.endswith('+00:00'):
+                value = value[:-6] + 'Z'
+            return value
+        return convert
+
+
+def _decimal_converter(field):
+    if field.decimal_places is None:
+        return lambda value: f'{value:f}'
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    rounding = field.rounding
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+
+    def convert(value):
+        # Same as DRF's DecimalField.quantize() followed by COERCE_DECIMAL_TO_STRING
+        return f'{value.quantize(exponent, rounding=rounding, context=context):f}'
+    return convert
+
+
+def _converter(field, model_field):
+    """
+    Return the converter for one serializer field, or None if the value from
+    the database is already what the field would output.
+    """
+    method = type(field).to_representation
+    if method is drf_fields.IntegerField.to_representation and isinstance(model_field, models.IntegerField):
+        return None
+    # BigIntegerField and COERCE_BIGINT_TO_STRING only exist from DRF 3.17
+    big_integer_field = getattr(drf_fields, 'BigIntegerField', None)
+    if (big_integer_field is not None and method is big_integer_field.to_representation
+            and isinstance(model_field, models.IntegerField)):
+        if not getattr(field, 'coerce_to_string', getattr(api_settings, 'COERCE_BIGINT_TO_STRING', False)):
+            return None
+    if method is drf_fields.CharField.to_representation and isinstance(model_field, (models.CharField, models.TextField)):
+        return None
+    if method is drf_fields.DateTimeField.to_representation:
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        if output_format is not None and output_format.lower() == ISO_8601:
+            return _DateTimeConverter(field)
+    if method is drf_fields.DecimalField.to_representation and isinstance(model_field, models.DecimalField):
+        coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+        if coerce_to_string and not field.localize and not field.normalize_output:
+            return _decimal_converter(field)
+    return field.to_representation
+
+
+class ValuesSerializer:
+    """
+    ``ValuesSerializer(SampleSerializer)``: the read-only, many=True output of
+    a ModelSerializer built from ``values_list()`` rows.
+
+    Only serializers whose fields map straight onto model columns are
+    supported; anything else raises ImproperlyConfigured on first use.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._compiled = None
+
+    def _compile(self):
+        if self._compiled is None:
+            model = self.serializer_class.Meta.model
+            names, columns, converters = [], [], []
+            for name, field in self.serializer_class().fields.items():
+                if field.write_only:
+                    continue
+                try:
+                    model_field = model._meta.get_field(field.source)
+                except Exception:
+                    raise ImproperlyConfigured(
+                        f"{self.serializer_class.__name__}.{name} is not a model column"
+                    )
+                if not model_field.concrete or model_field.is_relation:
+                    raise ImproperlyConfigured(
+                        f"{self.serializer_class.__name__}.{name} is not a model column"
+                    )
+                names.append(name)
+                columns.append(model_field.attname)
+                converters.append(_converter(field, model_field))
+            self._compiled = (tuple(names), tuple(columns), tuple(converters))
+        return self._compiled
+
+    @property
+    def columns(self):
+        return self._compile()[1]
+
+    def rows(self, queryset):
+        """
+        ``queryset`` as named ``values_list()`` rows of this serializer's columns.
+        The rows can be paginated by KeysetPagination.
+        """
+        return queryset.values_list(*self.columns, named=True)
+
+    def to_representation(self, rows):
+        names, _, converters = self._compile()
+        if not any(converters):
+            return [dict(zip(names, row)) for row in rows]
+        converters = [c.bind() if isinstance(c, _DateTimeConverter) else c for c in converters]
+        pairs = tuple(enumerate(converters))
+        data = []
+        for row in rows:
+            values = list(row)
+            for i, convert in pairs:
+                if convert is not None and values[i] is not None:
+                    values[i] = convert(values[i])
+            data.append(dict(zip(names, values)))
+        return data
+
+
+sample_values = ValuesSerializer(SampleSerializer)
+payment_transaction_values = ValuesSerializer(PaymentTransactionSerializer)
+
+
+def _not_native(value):
+    raise TypeError
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer with the same output, faster on large plain payloads.
+
+    With orjson, anything but plain dicts, lists, strings, ints and bools
+    (ErrorDetail, ReturnDict, datetimes, Decimals...) is handed back to
+    JSONRenderer. orjson writes floats in their shortest form (1e16 rather
+    than 1e+16) and NaN as null, so keep float payloads on JSONRenderer.
+    Indented output (the browsable API) always goes through JSONRenderer.
+    """
+    _encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (data is None or self.ensure_ascii or not self.compact or not self.strict
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            if orjson is not None:
+                ret = orjson.dumps(data, default=_not_native, option=(
+                    orjson.OPT_PASSTHROUGH_SUBCLASS | orjson.OPT_PASSTHROUGH_DATETIME
+                    | orjson.OPT_PASSTHROUGH_DATACLASS
+                ))
+            else:
+                ret = self._encoder(data).encode()
+        except (TypeError, ValueError):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # JSONRenderer escapes these so the output is also valid JavaScript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
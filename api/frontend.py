@@ -0,0 +1,206 @@
+# api/frontend.py
+"""
+In-memory serving of the React build (frontend/build) when SERVE_UI is on.
+
+Files are read once and kept in memory together with their precompressed
+variants: ``<file>.br`` and ``<file>.gz`` written at build time by
+``python manage.py compress_frontend`` (gzip is produced in memory on load if
+no .gz exists). A file is re-read when its mtime changes, checked at most
+every FRONTEND_RELOAD_INTERVAL seconds, so a new build is picked up without
+a restart.
+
+Every variant has a strong ETag and If-None-Match is answered with 304.
+index.html is served with ``Cache-Control: no-cache`` so deploys show up
+immediately; content-hashed assets (main.3f2a1b9c.js) never change and are
+served as ``immutable`` for a year.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import stat as stat_module
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.views.decorators.http import require_safe
+
+# Extensions worth compressing; images and fonts are already compressed
+COMPRESSIBLE = ('.html', '.js', '.css', '.json', '.map', '.svg', '.txt', '.xml', '.ico')
+# Build tools put a content hash in the names of files that never change
+HASHED_NAME = re.compile(r'\.[0-9a-f]{8,}\.')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+
+def build_dir():
+    return getattr(settings, 'FRONTEND_BUILD_DIR', os.path.join(settings.BASE_DIR, 'frontend', 'build'))
+
+
+class _Variant:
+    __slots__ = ('body', 'etag')
+
+    def __init__(self, body, etag):
+        self.body = body
+        self.etag = etag
+
+
+class _Entry:
+    __slots__ = ('mtime', 'size', 'checked_at', 'content_type', 'variants')
+
+
+def _load(path, stat):
+    with open(path, 'rb') as f:
+        body = f.read()
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    entry = _Entry()
+    entry.mtime = stat.st_mtime_ns
+    entry.size = stat.st_size
+    entry.checked_at = time.monotonic()
+    entry.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if entry.content_type.startswith('text/') or entry.content_type in ('application/javascript', 'application/json'):
+        entry.content_type += '; charset=utf-8'
+
+    # Strong ETags must differ per encoding
+    entry.variants = {'identity': _Variant(body, f'"{digest}"')}
+    if path.endswith(COMPRESSIBLE) and len(body) > 256:
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            compressed = _read_precompressed(path + suffix, stat)
+            if compressed is None and encoding == 'gzip':
+                compressed = gzip.compress(body, compresslevel=6, mtime=0)
+            if compressed is not None and len(compressed) < len(body):
+                entry.variants[encoding] = _Variant(compressed, f'"{digest}-{encoding}"')
+    return entry
+
+
+def _read_precompressed(path, source_stat):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    if stat.st_mtime_ns < source_stat.st_mtime_ns:
+        return None  # left over from an older build
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+class FileCache:
+    """
+    Path -> in-memory file with its encoded variants.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, path):
+        """
+        Return the cached entry for ``path``, (re)loading it if the file changed.
+        Raises Http404 if it is missing.
+        """
+        entry = self._entries.get(path)
+        now = time.monotonic()
+        if entry is not None and now - entry.checked_at < getattr(settings, 'FRONTEND_RELOAD_INTERVAL', 1.0):
+            return entry
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._entries.pop(path, None)
+            raise Http404("File not found")
+        if not stat_module.S_ISREG(stat.st_mode):
+            raise Http404("File not found")
+        if entry is not None and (entry.mtime, entry.size) == (stat.st_mtime_ns, stat.st_size):
+            entry.checked_at = now
+            return entry
+        with self._lock:
+            entry = _load(path, stat)
+            self._entries[path] = entry
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+file_cache = FileCache()
+
+
+def accepted_encodings(header):
+    """
+    Parse Accept-Encoding into the set of codings with a non-zero q value.
+    """
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(coding)
+    return accepted
+
+
+def _etag_matches(header, etag):
+    if header.strip() == '*':
+        return True
+    # If-None-Match uses the weak comparison
+    candidates = (tag.strip() for tag in header.split(','))
+    return any(tag.removeprefix('W/') == etag for tag in candidates)
+
+
+def serve(request, path, cache_control):
+    """
+    Serve ``path`` from the file cache, honoring Accept-Encoding and If-None-Match.
+    """
+    entry = file_cache.get(path)
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    for encoding in ('br', 'gzip', 'identity'):
+        variant = entry.variants.get(encoding)
+        if variant is not None and (encoding == 'identity' or encoding in accepted):
+            break
+
+    if _etag_matches(request.META.get('HTTP_IF_NONE_MATCH', ''), variant.etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(variant.body if request.method != 'HEAD' else b'',
+                                content_type=entry.content_type)
+        response['Content-Length'] = str(len(variant.body))
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+    response['ETag'] = variant.etag
+    response['Cache-Control'] = cache_control
+    if len(entry.variants) > 1:
+        response['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def serve_index(request):
+    return serve(request, os.path.join(build_dir(), 'index.html'), REVALIDATE)
+
+
+@require_safe
+def serve_static(request, path):
+    """
+    GET /static/<path>: files from the React build's static/ directory.
+    """
+    try:
+        full_path = safe_join(os.path.join(build_dir(), 'static'), path)
+    except SuspiciousFileOperation:
+        raise Http404("File not found")
+    if full_path.endswith(('.gz', '.br')):
+        raise Http404("File not found")
+    cache_control = IMMUTABLE if HASHED_NAME.search(os.path.basename(full_path)) else REVALIDATE
+    return serve(request, full_path, cache_control)
@@ -0,0 +1,223 @@
+# api/google_auth.py
+import base64
+import hashlib
+import logging
+import re
+import threading
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.conf import settings
+from django.core.cache import cache
+from google.auth import exceptions as google_exceptions
+from google.auth import jwt as google_jwt
+
+from . import http_client
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_USERINFO_URL = 'https://www.googleapis.com/oauth2/v3/userinfo'
+GOOGLE_JWKS_URL = 'https://www.googleapis.com/oauth2/v3/certs'
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+
+
+class GoogleTokenError(Exception):
+    """
+    The Google token could not be verified; the message is safe to return to the client.
+    """
+
+
+def is_id_token(token):
+    """
+    ID tokens are JWTs (header.payload.signature); access tokens are opaque.
+    """
+    return token.count('.') == 2
+
+
+def _b64_int(value):
+    return int.from_bytes(base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)), 'big')
+
+
+def jwk_to_pem(jwk):
+    """
+    Convert an RSA JWK into the PEM public key google-auth verifies with.
+    """
+    public_key = rsa.RSAPublicNumbers(_b64_int(jwk['e']), _b64_int(jwk['n'])).public_key()
+    return public_key.public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+
+
+def _max_age(cache_control):
+    match = re.search(r'max-age=(\d+)', cache_control or '')
+    return int(match.group(1)) if match else None
+
+
+class JWKSCache:
+    """
+    Process-wide cache of Google's signing keys (kid -> PEM).
+
+    Keys live for the response's Cache-Control max-age (capped by
+    GOOGLE_JWKS_TTL). A token signed with an unknown kid triggers an early
+    refresh to pick up rotated keys, at most once per GOOGLE_JWKS_MIN_REFRESH
+    seconds so forged kids cannot hammer Google.
+    """
+
+    def __init__(self, url=GOOGLE_JWKS_URL):
+        self.url = url
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._expires_at = 0.0
+        self._refreshed_at = None
+
+    def get(self, kid):
+        now = time.monotonic()
+        keys = self._keys
+        if now < self._expires_at and kid in keys:
+            return keys[kid]
+        with self._lock:
+            if self._needs_refresh(kid, time.monotonic()):
+                self._store(http_client.get(self.url))
+            return self._keys.get(kid)
+
+    async def aget(self, kid):
+        now = time.monotonic()
+        keys = self._keys
+        if now < self._expires_at and kid in keys:
+            return keys[kid]
+        if self._needs_refresh(kid, time.monotonic()):
+            self._store(await http_client.aget(self.url))
+        return self._keys.get(kid)
+
+    def clear(self):
+        with self._lock:
+            self._keys = {}
+            self._expires_at = 0.0
+            self._refreshed_at = None
+
+    def _needs_refresh(self, kid, now):
+        if now >= self._expires_at:
+            return True
+        if kid in self._keys:
+            return False
+        min_interval = getattr(settings, 'GOOGLE_JWKS_MIN_REFRESH', 60)
+        return self._refreshed_at is None or now - self._refreshed_at >= min_interval
+
+    def _store(self, response):
+        if response.status_code != 200:
+            logger.error(f"Failed to fetch Google JWKS: {response.status_code}")
+            raise GoogleTokenError('Failed to fetch Google signing keys')
+        keys = {
+            jwk['kid']: jwk_to_pem(jwk)
+            for jwk in response.json().get('keys', [])
+            if jwk.get('kty') == 'RSA' and jwk.get('kid')
+        }
+        ttl = getattr(settings, 'GOOGLE_JWKS_TTL', 3600)
+        max_age = _max_age(response.headers.get('Cache-Control'))
+        if max_age is not None:
+            ttl = min(ttl, max_age)
+        now = time.monotonic()
+        self._keys = keys
+        self._expires_at = now + ttl
+        self._refreshed_at = now
+        logger.debug(f"Loaded {len(keys)} Google signing keys, valid for {ttl}s")
+
+
+jwks_cache = JWKSCache()
+
+
+def _unverified_kid(token):
+    try:
+        header = google_jwt.decode_header(token)
+    except (ValueError, google_exceptions.GoogleAuthError):
+        raise GoogleTokenError('Invalid Google ID token: malformed token')
+    return header.get('kid')
+
+
+def _check_claims(token, pem):
+    if pem is None:
+        raise GoogleTokenError('Invalid Google ID token: unknown signing key')
+    try:
+        claims = google_jwt.decode(
+            token,
+            certs=pem,
+            audience=settings.GOOGLE_CLIENT_ID,
+            clock_skew_in_seconds=getattr(settings, 'GOOGLE_ID_TOKEN_CLOCK_SKEW', 10),
+        )
+    except (ValueError, google_exceptions.GoogleAuthError) as e:
+        raise GoogleTokenError(f'Invalid Google ID token: {str(e)}')
+    if claims.get('iss') not in GOOGLE_ISSUERS:
+        raise GoogleTokenError('Invalid Google ID token: wrong issuer')
+    return claims
+
+
+def _require_client_id():
+    if not getattr(settings, 'GOOGLE_CLIENT_ID', None):
+        logger.error("GOOGLE_CLIENT_ID not set; cannot verify Google ID tokens")
+        raise GoogleTokenError('Google ID tokens are not supported: server has no client id')
+
+
+def verify_id_token(token):
+    """
+    Verify a Google ID token locally against the cached JWKS and return its claims.
+    """
+    _require_client_id()
+    return _check_claims(token, jwks_cache.get(_unverified_kid(token)))
+
+
+async def averify_id_token(token):
+    _require_client_id()
+    return _check_claims(token, await jwks_cache.aget(_unverified_kid(token)))
+
+
+def _userinfo_cache_key(token):
+    return f"google-userinfo:{hashlib.sha256(token.encode('utf-8')).hexdigest()}"
+
+
+def _parse_userinfo(response):
+    if response.status_code != 200:
+        raise GoogleTokenError(f'Failed to get user info from Google: {response.text}')
+    return response.json()
+
+
+def fetch_userinfo(token):
+    """
+    Return Google's user info for an access token. Results are cached for
+    GOOGLE_USERINFO_CACHE_TTL seconds under a hash of the token, never the token itself.
+    """
+    key = _userinfo_cache_key(token)
+    userinfo = cache.get(key)
+    if userinfo is None:
+        userinfo = _parse_userinfo(
+            http_client.get(GOOGLE_USERINFO_URL, headers={'Authorization': f'Bearer {token}'})
+        )
+        cache.set(key, userinfo, getattr(settings, 'GOOGLE_USERINFO_CACHE_TTL', 60))
+    return userinfo
+
+
+async def afetch_userinfo(token):
+    key = _userinfo_cache_key(token)
+    userinfo = await cache.aget(key)
+    if userinfo is None:
+        userinfo = _parse_userinfo(
+            await http_client.aget(GOOGLE_USERINFO_URL, headers={'Authorization': f'Bearer {token}'})
+        )
+        await cache.aset(key, userinfo, getattr(settings, 'GOOGLE_USERINFO_CACHE_TTL', 60))
+    return userinfo
+
+
+def resolve_google_user(token):
+    """
+    Return the Google profile (email, given_name, family_name, sub, ...) for
+    either an ID token (verified locally) or an access token (userinfo call).
+    """
+    if is_id_token(token):
+        return verify_id_token(token)
+    return fetch_userinfo(token)
+
+
+async def aresolve_google_user(token):
+    if is_id_token(token):
+        return await averify_id_token(token)
+    return await afetch_userinfo(token)
@@ -0,0 +1,158 @@
+# api/http_client.py
+import asyncio
+import logging
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Defaults for settings.OUTBOUND_HTTP; any key can be overridden there.
+DEFAULTS = {
+    'POOL_CONNECTIONS': 10,   # number of per-host pools kept alive
+    'POOL_MAXSIZE': 20,       # keep-alive connections per host pool
+    'CONNECT_TIMEOUT': 3.05,  # seconds
+    'READ_TIMEOUT': 10,       # seconds
+    'MAX_RETRIES': 2,         # retries on connect errors / 502, 503, 504
+    'BACKOFF_FACTOR': 0.3,    # sleep 0.3s, 0.6s, 1.2s ... between retries
+}
+
+_session = None
+_session_lock = threading.Lock()
+# httpx.AsyncClient is bound to the event loop it was first used on.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_config():
+    """
+    Return the outbound HTTP configuration merged over the defaults.
+    """
+    return {**DEFAULTS, **getattr(settings, 'OUTBOUND_HTTP', {})}
+
+
+def _build_session(config):
+    retry = Retry(
+        total=config['MAX_RETRIES'],
+        connect=config['MAX_RETRIES'],
+        read=config['MAX_RETRIES'],
+        status=config['MAX_RETRIES'],
+        backoff_factor=config['BACKOFF_FACTOR'],
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD', 'OPTIONS']),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=config['POOL_CONNECTIONS'],
+        pool_maxsize=config['POOL_MAXSIZE'],
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session():
+    """
+    Return the process-wide pooled session, creating it on first use.
+    """
+    global _session
+    session = _session
+    if session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session(get_config())
+            session = _session
+    return session
+
+
+def reset_session():
+    """
+    Close the shared session; the next request builds a new one from settings.
+    """
+    global _session
+    with _session_lock:
+        session, _session = _session, None
+    if session is not None:
+        session.close()
+    # Async clients can only be closed from their own loop; drop them and
+    # let them be garbage collected.
+    _async_clients.clear()
+
+
+def get_async_client():
+    """
+    Return the pooled httpx.AsyncClient for the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        config = get_config()
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=config['POOL_CONNECTIONS'] * config['POOL_MAXSIZE'],
+                max_keepalive_connections=config['POOL_MAXSIZE'],
+            ),
+            timeout=httpx.Timeout(config['READ_TIMEOUT'], connect=config['CONNECT_TIMEOUT']),
+            # httpx only retries failed connects, not responses
+            transport=httpx.AsyncHTTPTransport(retries=config['MAX_RETRIES']),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(sender, setting, **kwargs):
+    if setting == 'OUTBOUND_HTTP':
+        reset_session()
+
+
+def request(method, url, **kwargs):
+    """
+    Send a request through the shared session with the configured timeouts.
+    """
+    if 'timeout' not in kwargs:
+        config = get_config()
+        kwargs['timeout'] = (config['CONNECT_TIMEOUT'], config['READ_TIMEOUT'])
+    start = time.perf_counter()
+    try:
+        return get_session().request(method, url, **kwargs)
+    finally:
+        metrics.record_outbound(url, time.perf_counter() - start)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+async def arequest(method, url, **kwargs):
+    """
+    Async counterpart of request() using the loop's pooled httpx client.
+    """
+    start = time.perf_counter()
+    try:
+        return await get_async_client().request(method, url, **kwargs)
+    finally:
+        metrics.record_outbound(url, time.perf_counter() - start)
+
+
+async def aget(url, **kwargs):
+    return await arequest('GET', url, **kwargs)
+
+
+async def apost(url, **kwargs):
+    return await arequest('POST', url, **kwargs)
@@ -0,0 +1,71 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Expire abandoned pending payments and move old completed, failed and expired "
+        "payments to the archive table, a small chunk per transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pending-ttl', type=int, default=None,
+                            help='Seconds before a pending payment expires (default: PAYMENT_PENDING_TTL)')
+        parser.add_argument('--archive-after', type=int, default=None,
+                            help='Days before a finished payment is archived (default: PAYMENT_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Rows per transaction (default: PAYMENT_RETENTION_CHUNK_SIZE)')
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help='Seconds to pause between chunks, to leave room for other writers')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how many payments would be expired and archived')
+
+    def handle(self, *args, **options):
+        pending_ttl = options['pending_ttl']
+        if pending_ttl is None:
+            pending_ttl = getattr(settings, 'PAYMENT_PENDING_TTL', 86400)
+        archive_after = options['archive_after']
+        if archive_after is None:
+            archive_after = getattr(settings, 'PAYMENT_ARCHIVE_AFTER_DAYS', 90)
+        chunk_size = options['chunk_size'] or getattr(settings, 'PAYMENT_RETENTION_CHUNK_SIZE', 500)
+
+        now = timezone.now()
+        expire_cutoff = now - timedelta(seconds=pending_ttl)
+        archive_cutoff = now - timedelta(days=archive_after)
+        to_expire = retention.stale_pending(expire_cutoff).count()
+        # Payments expired by this run are archived by it too if old enough
+        to_archive = (retention.archivable(archive_cutoff).count()
+                      + retention.stale_pending(min(expire_cutoff, archive_cutoff)).count())
+
+        if options['dry_run']:
+            self.stdout.write(
+                f"{to_expire} pending payment(s) would be expired and {to_archive} archived "
+                f"(dry run, nothing changed)"
+            )
+            return
+
+        expired = self._in_chunks('Expired', to_expire, options['sleep'],
+                                  lambda: retention.expire_chunk(expire_cutoff, chunk_size))
+        archived = self._in_chunks('Archived', to_archive, options['sleep'],
+                                   lambda: retention.archive_chunk(archive_cutoff, chunk_size))
+        self.stdout.write(self.style.SUCCESS(f"Done: expired={expired} archived={archived}"))
+
+    def _in_chunks(self, label, total, sleep, chunk):
+        """
+        Call ``chunk`` until it returns 0, reporting progress after each call.
+        """
+        done = 0
+        while True:
+            count = chunk()
+            if not count:
+                return done
+            done += count
+            self.stdout.write(f"{label} {done}/{max(total, done)}")
+            if sleep:
+                time.sleep(sleep)
@@ -0,0 +1,55 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the serializers, API views and webhook handler against a seeded "
+        "data set and print the results as JSON. All seeded rows are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=10000, help='SampleModel rows to seed')
+        parser.add_argument('--users', type=int, default=100, help='Users (with accounts) to seed')
+        parser.add_argument('--transactions', type=int, default=10000, help='PaymentTransaction rows to seed')
+        parser.add_argument('--iterations', type=int, default=200, help='Timed calls per benchmark')
+        parser.add_argument('--warmup', type=int, default=10, help='Untimed calls before timing')
+        parser.add_argument('--only', action='append', default=None,
+                            help='Only run benchmarks whose name contains this text (repeatable)')
+        parser.add_argument('--output', help='Also write the results to this file')
+        parser.add_argument('--baseline', help='Compare against a results file from an earlier run')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed p50 slowdown against the baseline, as a fraction (default 0.25)')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError("--iterations must be at least 1")
+
+        results = benchmarks.run(
+            samples=options['samples'],
+            users=max(options['users'], 1),
+            transactions=options['transactions'],
+            iterations=options['iterations'],
+            warmup=options['warmup'],
+            only=options['only'],
+        )
+
+        regressions = []
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            results['comparison'], regressions = benchmarks.compare(results, baseline, options['tolerance'])
+            results['regressions'] = regressions
+
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
+
+        if regressions:
+            raise CommandError(f"{len(regressions)} regression(s) against {options['baseline']}:\n"
+                               + '\n'.join(regressions))
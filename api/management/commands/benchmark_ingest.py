@@ -0,0 +1,78 @@
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.models import SampleModel
+
+
+# Prefix of every benchmark row, so cleanup never touches real samples
+ROW_PREFIX = 'benchmark-ingest-'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare sample ingestion throughput of the single-row endpoint (api/add) "
+        "with the bulk endpoint (api/bulk). Every request commits like it would in "
+        "production; the inserted rows are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help='Rows to insert per run')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Override BULK_INSERT_BATCH_SIZE for the bulk runs')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        payload = [{'name': f'{ROW_PREFIX}{i}', 'age': i % 100} for i in range(rows)]
+        results = {}
+
+        # No outer transaction: each single-row request has to pay for its own
+        # commit, as it does in production, or the baseline looks far too cheap
+        User.objects.filter(username='benchmark-ingest-user').delete()
+        user = User.objects.create_user(username='benchmark-ingest-user')
+        last_id = SampleModel.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        try:
+            token = str(RefreshToken.for_user(user).access_token)
+            client = Client(SERVER_NAME='localhost', headers={'Authorization': f'Bearer {token}'})
+
+            def single():
+                for row in payload:
+                    response = client.post('/api/api/add', row, content_type='application/json')
+                    assert response.status_code == 201, response.content
+
+            def bulk_json():
+                response = client.post('/api/api/bulk', payload, content_type='application/json')
+                assert response.status_code == 201, response.content
+
+            def bulk_ndjson():
+                body = '\n'.join(json.dumps(row) for row in payload)
+                response = client.post('/api/api/bulk', body, content_type='application/x-ndjson')
+                assert response.status_code == 201, response.content
+
+            overrides = {}
+            if options['batch_size']:
+                overrides['BULK_INSERT_BATCH_SIZE'] = options['batch_size']
+            with override_settings(**overrides):
+                for name, run in (('single', single), ('bulk_json', bulk_json), ('bulk_ndjson', bulk_ndjson)):
+                    before = SampleModel.objects.count()
+                    started = time.perf_counter()
+                    run()
+                    elapsed = time.perf_counter() - started
+                    inserted = SampleModel.objects.count() - before
+                    results[name] = {
+                        'rows': inserted,
+                        'seconds': round(elapsed, 4),
+                        'rows_per_sec': round(inserted / elapsed, 1) if elapsed else None,
+                    }
+        finally:
+            SampleModel.objects.filter(id__gt=last_id, name__startswith=ROW_PREFIX).delete()
+            user.delete()
+
+        baseline = results['single']['rows_per_sec']
+        for name, result in results.items():
+            result['speedup'] = round(result['rows_per_sec'] / baseline, 1) if baseline else None
+        self.stdout.write(json.dumps(results, indent=2))
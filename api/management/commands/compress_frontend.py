@@ -0,0 +1,54 @@
+import gzip
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.frontend import COMPRESSIBLE, build_dir
+
+try:
+    import brotli
+except ImportError:  # optional: only needed to produce .br files
+    brotli = None
+
+
+class Command(BaseCommand):
+    help = (
+        "Precompress the React build (index.html and static/) into .gz and .br "
+        "files served by api/frontend.py. Run after `npm run build`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-size', type=int, default=256,
+                            help='Skip files smaller than this many bytes')
+
+    def handle(self, *args, **options):
+        root = build_dir()
+        if not os.path.isdir(root):
+            raise CommandError(f"React build not found at {root}; run `npm run build` first")
+        if brotli is None:
+            self.stderr.write("brotli is not installed; writing gzip files only (pip install brotli)")
+
+        written = saved = 0
+        for directory, _, names in os.walk(root):
+            for name in names:
+                if not name.endswith(COMPRESSIBLE):
+                    continue
+                path = os.path.join(directory, name)
+                with open(path, 'rb') as f:
+                    body = f.read()
+                if len(body) < options['min_size']:
+                    continue
+                variants = [('.gz', gzip.compress(body, compresslevel=9, mtime=0))]
+                if brotli is not None:
+                    variants.append(('.br', brotli.compress(body, quality=11)))
+                for suffix, compressed in variants:
+                    if len(compressed) >= len(body):
+                        continue
+                    with open(path + suffix, 'wb') as f:
+                        f.write(compressed)
+                    written += 1
+                    saved += len(body) - len(compressed)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} precompressed file(s), saving {saved // 1024} KiB per full download"
+        ))
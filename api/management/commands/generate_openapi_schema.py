@@ -0,0 +1,27 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from api.openapi import SCHEMA_FILES, generate, schema_dir
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the OpenAPI schema served by the swagger/redoc endpoints into "
+        "OPENAPI_SCHEMA_DIR. Run at build time, after changing any API view."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', help='Write here instead of OPENAPI_SCHEMA_DIR')
+
+    def handle(self, *args, **options):
+        directory = options['output_dir'] or schema_dir()
+        os.makedirs(directory, exist_ok=True)
+        for fmt, body in generate().items():
+            path = os.path.join(directory, SCHEMA_FILES[fmt])
+            # Write then rename, so a running server never reads a partial file
+            with open(path + '.tmp', 'wb') as f:
+                f.write(body)
+            os.replace(path + '.tmp', path)
+            self.stdout.write(f"Wrote {path} ({len(body) // 1024} KiB)")
+        self.stdout.write(self.style.SUCCESS("OpenAPI schema generated"))
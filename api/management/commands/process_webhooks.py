@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import webhooks
+
+
+class Command(BaseCommand):
+    help = "Apply queued Lemon Squeezy webhook events from the WebhookEvent inbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Events per batch (default: WEBHOOK_BATCH_SIZE)')
+        parser.add_argument('--max-attempts', type=int, default=None,
+                            help='Attempts before an event is marked failed (default: WEBHOOK_MAX_ATTEMPTS)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling the inbox instead of exiting once it is drained')
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help='Seconds to wait between polls when the inbox is empty (with --loop)')
+
+    def handle(self, *args, **options):
+        totals = {'processed': 0, 'pending': 0, 'failed': 0, 'skipped': 0}
+        try:
+            while True:
+                counts = webhooks.process_batch(
+                    batch_size=options['batch_size'],
+                    max_attempts=options['max_attempts'],
+                )
+                for key, value in counts.items():
+                    totals[key] += value
+                if any(counts.values()):
+                    self.stdout.write(
+                        f"processed={counts['processed']} retrying={counts['pending']} "
+                        f"failed={counts['failed']} skipped={counts['skipped']}"
+                    )
+                    continue
+                if not options['loop']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: processed={totals['processed']} retrying={totals['pending']} failed={totals['failed']}"
+        ))
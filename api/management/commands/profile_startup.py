@@ -0,0 +1,111 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: boot the WSGI application the way a worker
+# does, then serve one request through it
+PROBE = r'''
+import io, json, sys, time
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+booted = time.perf_counter()
+statuses = []
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+    'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+    'wsgi.url_scheme': 'http', 'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': True,
+    'wsgi.run_once': False,
+}
+response = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+b''.join(response)
+responded = time.perf_counter()
+print(json.dumps({
+    'boot_ms': (booted - start) * 1000,
+    'first_response_ms': (responded - booted) * 1000,
+    'status': int(statuses[0].split()[0]),
+    'modules': sorted(sys.modules),
+}))
+'''
+
+
+def parse_importtime(stderr):
+    """
+    Sum ``-X importtime`` self times (microseconds) per top-level package.
+    Returns ({package: {'self_us', 'modules'}}, other stderr lines).
+    """
+    packages, other = {}, []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            other.append(line)
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header line
+        package = fields[2].strip().split('.')[0]
+        entry = packages.setdefault(package, {'self_us': 0, 'modules': 0})
+        entry['self_us'] += int(fields[0])
+        entry['modules'] += 1
+    return packages, other
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure worker cold start in a fresh interpreter: import cost per top-level "
+        "package (aggregated -X importtime), WSGI boot time and time to the first response."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/api/', help='Path of the first request (default /api/)')
+        parser.add_argument('--top', type=int, default=15, help='Packages to list, most expensive first')
+        parser.add_argument('--json', action='store_true', help='Print the full report as JSON')
+        parser.add_argument('--budget-ms', type=float,
+                            help='Fail if boot plus first response takes longer than this')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(path for path in sys.path if path)
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE, options['url']],
+            env=env, capture_output=True, text=True,
+        )
+        total_ms = (time.perf_counter() - started) * 1000
+        packages, other = parse_importtime(result.stderr)
+        if result.returncode != 0:
+            raise CommandError("Startup probe failed:\n" + '\n'.join(other[-20:]))
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+
+        ranked = sorted(packages.items(), key=lambda item: item[1]['self_us'], reverse=True)
+        report = {
+            'url': options['url'],
+            'status': probe['status'],
+            'process_ms': round(total_ms, 1),
+            'boot_ms': round(probe['boot_ms'], 1),
+            'first_response_ms': round(probe['first_response_ms'], 1),
+            'import_ms': round(sum(entry['self_us'] for entry in packages.values()) / 1000, 1),
+            'packages': {name: {'ms': round(entry['self_us'] / 1000, 1), 'modules': entry['modules']}
+                         for name, entry in ranked},
+            'modules': probe['modules'],
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.stdout.write(
+                f"GET {report['url']} -> {report['status']}: boot {report['boot_ms']} ms, "
+                f"first response {report['first_response_ms']} ms, process {report['process_ms']} ms"
+            )
+            self.stdout.write(f"Imports: {report['import_ms']} ms in {len(probe['modules'])} modules")
+            for name, entry in ranked[:options['top']]:
+                self.stdout.write(f"  {entry['self_us'] / 1000:8.1f} ms  {entry['modules']:4d}  {name}")
+
+        budget = options['budget_ms']
+        if budget is not None and probe['boot_ms'] + probe['first_response_ms'] > budget:
+            raise CommandError(
+                f"Cold start took {probe['boot_ms'] + probe['first_response_ms']:.1f} ms, over the {budget} ms budget"
+            )
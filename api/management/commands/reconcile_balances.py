@@ -0,0 +1,53 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from api.models import BalanceLedgerEntry, UserAccount
+
+
+def ledger_total():
+    """
+    Subquery: the sum of the ledger entries of the outer UserAccount's user.
+    """
+    return Coalesce(
+        Subquery(
+            BalanceLedgerEntry.objects.filter(user_id=OuterRef('user_id'))
+            .values('user_id')
+            .annotate(total=Sum('amount'))
+            .values('total')[:1]
+        ),
+        Value(Decimal('0.00')),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+class Command(BaseCommand):
+    help = "Rebuild UserAccount.account_value from the balance ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report accounts whose balance differs from the ledger')
+
+    def handle(self, *args, **options):
+        drifted = [
+            (account.user_id, account.account_value, account.ledger_total)
+            for account in UserAccount.objects.annotate(ledger_total=ledger_total()).iterator()
+            if account.account_value != account.ledger_total
+        ]
+        for user_id, balance, total in drifted:
+            self.stdout.write(f"user {user_id}: balance {balance} != ledger {total}")
+
+        if options['dry_run']:
+            self.stdout.write(f"{len(drifted)} account(s) out of sync (dry run, nothing changed)")
+            return
+
+        # UPDATE ... SET account_value = (SELECT SUM(...)) so concurrent F()
+        # increments are never overwritten with a stale Python value.
+        updated = UserAccount.objects.filter(
+            user_id__in=[user_id for user_id, _, _ in drifted]
+        ).update(account_value=ledger_total())
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {updated} balance(s) from the ledger"
+        ))
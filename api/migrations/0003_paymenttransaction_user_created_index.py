@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_paymenttransaction_useraccount'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymenttransaction',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='api_payment_user_created_idx'),
+        ),
+    ]
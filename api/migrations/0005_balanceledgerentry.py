@@ -0,0 +1,56 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:46
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_ledger(apps, schema_editor):
+    """
+    Seed the ledger so that rebuilding balances from it keeps today's values:
+    one entry per completed transaction plus an adjustment for any remainder.
+    """
+    PaymentTransaction = apps.get_model('api', 'PaymentTransaction')
+    UserAccount = apps.get_model('api', 'UserAccount')
+    BalanceLedgerEntry = apps.get_model('api', 'BalanceLedgerEntry')
+
+    totals = {}
+    entries = []
+    for transaction in PaymentTransaction.objects.filter(status='completed').iterator():
+        entries.append(BalanceLedgerEntry(
+            user_id=transaction.user_id, transaction_id=transaction.pk,
+            amount=transaction.amount, reason='payment',
+        ))
+        totals[transaction.user_id] = totals.get(transaction.user_id, Decimal('0')) + transaction.amount
+
+    for account in UserAccount.objects.iterator():
+        remainder = account.account_value - totals.get(account.user_id, Decimal('0'))
+        if remainder:
+            entries.append(BalanceLedgerEntry(user_id=account.user_id, amount=remainder, reason='adjustment'))
+
+    BalanceLedgerEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_webhookevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('reason', models.CharField(default='payment', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('transaction', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entry', to='api.paymenttransaction')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.1.5 on 2026-10-18 20:24
+
+from django.db import migrations, models
+
+# SQLite only: an FTS5 trigram index over SampleModel.name for the search
+# endpoint's contains match (api/search.py), kept in sync by triggers.
+# Rebuilding api_samplemodel on SQLite (e.g. AlterField) drops the triggers
+# with it, so a migration that does must run CREATE_FTS_TRIGGERS again.
+CREATE_FTS_TABLE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS api_samplemodel_fts USING fts5("
+    "name, content='api_samplemodel', content_rowid='id', tokenize='trigram')"
+)
+CREATE_FTS_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS api_samplemodel_fts_insert AFTER INSERT ON api_samplemodel BEGIN "
+    "INSERT INTO api_samplemodel_fts(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS api_samplemodel_fts_delete AFTER DELETE ON api_samplemodel BEGIN "
+    "INSERT INTO api_samplemodel_fts(api_samplemodel_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER IF NOT EXISTS api_samplemodel_fts_update AFTER UPDATE ON api_samplemodel BEGIN "
+    "INSERT INTO api_samplemodel_fts(api_samplemodel_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO api_samplemodel_fts(rowid, name) VALUES (new.id, new.name); END",
+]
+DROP_FTS = [
+    "DROP TRIGGER IF EXISTS api_samplemodel_fts_insert",
+    "DROP TRIGGER IF EXISTS api_samplemodel_fts_delete",
+    "DROP TRIGGER IF EXISTS api_samplemodel_fts_update",
+    "DROP TABLE IF EXISTS api_samplemodel_fts",
+]
+
+
+def create_fts(apps, schema_editor):
+    connection = schema_editor.connection
+    # The trigram tokenizer needs SQLite 3.34; without it search falls back to LIKE
+    if connection.vendor != 'sqlite' or connection.Database.sqlite_version_info < (3, 34, 0):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if not cursor.fetchone()[0]:
+            return
+        cursor.execute(CREATE_FTS_TABLE)
+        for statement in CREATE_FTS_TRIGGERS:
+            cursor.execute(statement)
+        cursor.execute("INSERT INTO api_samplemodel_fts(api_samplemodel_fts) VALUES ('rebuild')")
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for statement in DROP_FTS:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_balanceledgerentry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='samplemodel',
+            name='name',
+            field=models.CharField(max_length=150),
+        ),
+        migrations.AddIndex(
+            model_name='samplemodel',
+            index=models.Index(fields=['name', 'id'], name='api_sample_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='samplemodel',
+            index=models.Index(fields=['age', 'id'], name='api_sample_age_id_idx'),
+        ),
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.5 on 2026-10-18 20:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_rollups(apps, schema_editor):
+    """
+    Roll up the transactions that already exist (the same aggregate as
+    api.rollups.rebuild()).
+    """
+    import datetime
+
+    from django.db.models import Count, Sum
+    from django.db.models.functions import TruncDate
+
+    PaymentTransaction = apps.get_model('api', 'PaymentTransaction')
+    PaymentRollup = apps.get_model('api', 'PaymentRollup')
+    database = schema_editor.connection.alias
+    buckets = (
+        PaymentTransaction.objects.using(database)
+        .annotate(day=TruncDate('created_at', tzinfo=datetime.timezone.utc))
+        .values('user_id', 'day', 'currency', 'status')
+        .annotate(count=Count('id'), amount=Sum('amount'))
+        .order_by()
+    )
+    PaymentRollup.objects.using(database).bulk_create(
+        [PaymentRollup(**bucket) for bucket in buckets.iterator()], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_samplemodel_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('currency', models.CharField(max_length=3)),
+                ('status', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payment_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'day', 'currency', 'status'), name='api_payment_rollup_bucket')],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
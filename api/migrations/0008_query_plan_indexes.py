@@ -0,0 +1,37 @@
+# Generated by Django 5.1.5 on 2026-10-18 20:31
+
+from django.db import migrations, models
+
+USER_EMAIL_INDEX = 'api_auth_user_email_idx'
+
+
+def add_user_email_index(apps, schema_editor):
+    # auth_user.email is not indexed by django.contrib.auth, and Google
+    # login looks users up by it
+    User = apps.get_model('auth', 'User')
+    schema_editor.add_index(User, models.Index(fields=['email'], name=USER_EMAIL_INDEX))
+
+
+def remove_user_email_index(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    schema_editor.remove_index(User, models.Index(fields=['email'], name=USER_EMAIL_INDEX))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_paymentrollup'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='webhookevent',
+            name='api_webhook_due_idx',
+        ),
+        migrations.AddIndex(
+            model_name='webhookevent',
+            index=models.Index(fields=['status', 'id'], name='api_webhook_pending_idx'),
+        ),
+        migrations.RunPython(add_user_email_index, remove_user_email_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 21:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_payment_retention'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedpaymenttransaction',
+            name='transaction_id',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+    ]
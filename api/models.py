@@ -1,17 +1,26 @@
 # users/models.py
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class SampleModel(models.Model):
     """
     Database model for storing user info.
     """
-    name = models.CharField(max_length=150, db_index=True)
+    name = models.CharField(max_length=150)
     age = models.IntegerField()
 
     # By default, Django creates an "id" primary key
     # so no need to explicitly declare it unless you want a custom field name.
 
+    class Meta:
+        indexes = [
+            # Search (api/search.py): name prefix ranges and age ranges, each
+            # already in keyset order (sort column, id)
+            models.Index(fields=['name', 'id'], name='api_sample_name_id_idx'),
+            models.Index(fields=['age', 'id'], name='api_sample_age_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.age})"
 
@@ -34,10 +43,107 @@ class PaymentTransaction(models.Model):
     transaction_id = models.CharField(max_length=100, unique=True)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     currency = models.CharField(max_length=3, default='USD')
-    status = models.CharField(max_length=20, default='pending')  # pending, completed, failed
+    status = models.CharField(max_length=20, default='pending')  # pending, processing, completed, failed, expired
     payment_method = models.CharField(max_length=50, default='lemon_squeezy')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of a user's history: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+            models.Index(fields=['user', '-created_at', '-id'], name='api_payment_user_created_idx'),
+            # Expiry and archival chunks (api/retention.py): WHERE status IN (...) AND created_at < ?
+            models.Index(fields=['status', 'created_at'], name='api_payment_status_created_idx'),
+        ]
     
     def __str__(self):
-        return f"Transaction {self.transaction_id} - {self.user.username} - ${self.amount}"
\ No newline at end of file
+        return f"Transaction {self.transaction_id} - {self.user.username} - ${self.amount}"
+
+class BalanceLedgerEntry(models.Model):
+    """
+    Append-only record of every change to a user's balance.
+    UserAccount.account_value is a materialized sum of these entries; see the
+    reconcile_balances command.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ledger_entries')
+    # One entry per completed payment; null for manual adjustments
+    transaction = models.OneToOneField(
+        PaymentTransaction, on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_entry'
+    )
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    reason = models.CharField(max_length=20, default='payment')  # payment, adjustment
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user.username} {self.amount:+} ({self.reason})"
+
+
+class WebhookEvent(models.Model):
+    """
+    Inbox of verified Lemon Squeezy webhook deliveries.
+    The webhook view only appends rows; the process_webhooks command applies them.
+    """
+    event_id = models.CharField(max_length=64, unique=True)  # sha256 of the signed body
+    event_name = models.CharField(max_length=50)
+    payload = models.TextField()
+    status = models.CharField(max_length=20, default='pending')  # pending, processed, failed
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    received_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Worker polling: WHERE status = 'pending' AND next_attempt_at <= now ORDER BY id,
+            # read in id order so the LIMIT stops the scan without sorting
+            models.Index(fields=['status', 'id'], name='api_webhook_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"Webhook {self.event_name} ({self.status})"
+
+
+class PaymentRollup(models.Model):
+    """
+    Running count and sum of PaymentTransaction rows per user, day (of
+    created_at, UTC), currency and status. Maintained incrementally by
+    api/rollups.py whenever a transaction is created or changes status;
+    rebuild with the rebuild_payment_rollups command.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='payment_rollups')
+    day = models.DateField()
+    currency = models.CharField(max_length=3)
+    status = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            # One row per bucket; also serves WHERE user_id = ? AND day BETWEEN ...
+            models.UniqueConstraint(fields=['user', 'day', 'currency', 'status'], name='api_payment_rollup_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.day} {self.currency} {self.status}: {self.count} / {self.amount}"
+
+
+class ArchivedPaymentTransaction(models.Model):
+    """
+    Finished PaymentTransaction rows moved out of the live table by the
+    archive_payments command (api/retention.py). Keeps the original id.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_transactions')
+    # Looked up by late webhooks (retention.restore_archived)
+    transaction_id = models.CharField(max_length=100, db_index=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3)
+    status = models.CharField(max_length=20)
+    payment_method = models.CharField(max_length=50)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Archived transaction {self.transaction_id} ({self.status})"
@@ -0,0 +1,150 @@
+# api/pagination.py
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opaque-cursor keyset pagination.
+
+    Pages are selected with a ``WHERE (a, b) < (x, y)``-style predicate on the
+    ordering columns instead of OFFSET, so page 10,000 costs the same as page
+    1 as long as an index covers ``ordering``. The last ordering field must be
+    unique (normally the primary key) to make the order total.
+
+    Responses look like ``{"next": url, "previous": url, "results": [...]}``.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering, page_size=None, max_page_size=None):
+        self.ordering = tuple(ordering)
+        self.page_size = page_size or getattr(settings, 'PAGINATION_PAGE_SIZE', 50)
+        self.max_page_size = max_page_size or getattr(settings, 'PAGINATION_MAX_PAGE_SIZE', 500)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self._invert(field) for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self._after(ordering, position))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        # One extra row tells us whether there is anything beyond this page.
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        self.page = rows
+        if reverse:
+            self.next_position = self._position(rows[-1]) if rows else position
+            self.previous_position = self._position(rows[0]) if has_more else None
+        else:
+            self.next_position = self._position(rows[-1]) if has_more else None
+            self.previous_position = self._position(rows[0]) if position is not None and rows else None
+            if position is not None and not rows:
+                self.previous_position = position
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def encode_cursor(self, position, reverse):
+        payload = {'p': position}
+        if reverse:
+            payload['r'] = 1
+        raw = json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8')
+        cursor = base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        """
+        Return ``(position, reverse)`` from the request's cursor, if any.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            raw = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            payload = json.loads(raw)
+            position = payload['p']
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError(position)
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(payload.get('r'))
+
+    def _position(self, row):
+        return [self._value(row, self._name(field)) for field in self.ordering]
+
+    @staticmethod
+    def _value(row, name):
+        value = row[name] if isinstance(row, dict) else getattr(row, name)
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return value
+
+    @staticmethod
+    def _name(field):
+        return field.lstrip('-')
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def _after(self, ordering, position):
+        """
+        Build ``(f1, f2, ...) > (v1, v2, ...)`` in the given ordering:
+        ``f1 > v1 OR (f1 = v1 AND f2 > v2) OR ...``.
+        """
+        predicate = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = self._name(field)
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            predicate |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return predicate
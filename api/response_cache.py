@@ -0,0 +1,109 @@
+# api/response_cache.py
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction as db_transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+from .models import SampleModel
+
+class VersionedResponseCache:
+    """
+    Rendered-response cache for read endpoints over one table.
+
+    Entries are keyed on the table's current version, the database the page
+    is read from and the full request URL, so a write only has to replace the version to retire every cached
+    page at once. The version is a random token rather than an incremented
+    counter because the file-based cache has no atomic incr; replacing it is
+    safe from any number of workers.
+
+    Readers must fetch the version *before* querying, and writers call
+    invalidate(), which bumps it right away and again once their transaction
+    commits. A response built from rows read before the commit can then only
+    be stored under a version that is already obsolete.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+
+    def version(self):
+        key = f'response-version:{self.name}'
+        version = self.cache.get(key)
+        if version is None:
+            self.cache.add(key, uuid.uuid4().hex, None)
+            version = self.cache.get(key)
+        return version
+
+    def bump(self):
+        self.cache.set(f'response-version:{self.name}', uuid.uuid4().hex, None)
+
+    def invalidate(self):
+        self.bump()
+        db_transaction.on_commit(self.bump)
+
+    def key(self, request, version, database=DEFAULT_DB_ALIAS):
+        url = hashlib.sha256(request.build_absolute_uri().encode('utf-8')).hexdigest()
+        return f'response:{self.name}:{version}:{database}:{url}'
+
+    def get(self, key):
+        """
+        Return the cached (etag, body) or None.
+        """
+        return self.cache.get(key)
+
+    def set(self, key, body, database=DEFAULT_DB_ALIAS):
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        timeout = self.timeout
+        if database != DEFAULT_DB_ALIAS:
+            # A replica may still be behind the write that bumped the version;
+            # it has caught up by the end of the read-your-writes window
+            timeout = min(timeout, getattr(settings, 'REPLICA_PIN_SECONDS', 15))
+        self.cache.set(key, (etag, body), timeout)
+        return etag
+
+
+def not_modified(request, etag):
+    """
+    True if the request's If-None-Match matches ``etag`` (weak comparison).
+    """
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag in (tag.removeprefix('W/') for tag in etags)
+
+
+def cached_response(request, etag, body, content_type='application/json'):
+    """
+    Build the 200 (or 304) response for a cached body.
+    """
+    if not_modified(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type=content_type)
+    response['ETag'] = etag
+    # Per-user auth, so browsers may keep it but must revalidate
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+sample_list_cache = VersionedResponseCache('samples')
+
+
+@receiver(post_save, sender=SampleModel)
+@receiver(post_delete, sender=SampleModel)
+def _sample_changed(sender, **kwargs):
+    sample_list_cache.invalidate()
@@ -0,0 +1,101 @@
+# api/retention.py
+"""
+PaymentTransaction housekeeping (the archive_payments command).
+
+- Pending transactions older than PAYMENT_PENDING_TTL are abandoned
+  checkouts and are marked ``expired``. A late order_paid webhook still
+  completes them.
+- Completed, failed and expired transactions older than
+  PAYMENT_ARCHIVE_AFTER_DAYS are copied to ArchivedPaymentTransaction and
+  deleted from the live table, which keeps the history, webhook and
+  transaction_id lookups working on recent rows only. A late order_paid
+  for an archived failed or expired transaction moves it back to the live
+  table (restore_archived) and completes it there, so the payment is still
+  credited; replays for archived completed ones are acknowledged.
+
+Both run in chunks of at most ``chunk_size`` rows, one short transaction
+per chunk, found through (status, created_at) without sorting. Archived
+transactions stay in the payment rollups. Their ledger entries are kept,
+but lose the link to the transaction (ON DELETE SET NULL).
+"""
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from . import rollups
+from .models import ArchivedPaymentTransaction, PaymentTransaction
+
+EXPIRED = 'expired'
+# Finished as far as the app is concerned. Only a late order_paid moves
+# failed and expired transactions on, and it restores them first
+ARCHIVED_STATUSES = ('completed', 'failed', EXPIRED)
+
+ARCHIVED_FIELDS = (
+    'id', 'user_id', 'transaction_id', 'amount', 'currency', 'status',
+    'payment_method', 'created_at', 'updated_at',
+)
+
+
+def stale_pending(cutoff):
+    return PaymentTransaction.objects.filter(status='pending', created_at__lt=cutoff)
+
+
+def archivable(cutoff):
+    return PaymentTransaction.objects.filter(status__in=ARCHIVED_STATUSES, created_at__lt=cutoff)
+
+
+def expire_chunk(cutoff, chunk_size):
+    """
+    Mark up to ``chunk_size`` pending transactions created before ``cutoff``
+    as expired. Returns how many were expired; 0 once none are left.
+    """
+    now = timezone.now()
+    with db_transaction.atomic():
+        ids = list(stale_pending(cutoff).values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return 0
+        # Conditional, like the webhook transitions: a row paid in the
+        # meantime keeps its new status
+        expired = PaymentTransaction.objects.filter(id__in=ids, status='pending').update(
+            status=EXPIRED, updated_at=now
+        )
+        rollups.record_bulk_transition(
+            PaymentTransaction.objects.filter(id__in=ids, status=EXPIRED, updated_at=now), 'pending'
+        )
+    return expired
+
+
+def archive_chunk(cutoff, chunk_size):
+    """
+    Move up to ``chunk_size`` finished transactions created before ``cutoff``
+    to the archive. Returns how many were moved; 0 once none are left.
+    """
+    now = timezone.now()
+    with db_transaction.atomic():
+        rows = list(archivable(cutoff).select_for_update().values(*ARCHIVED_FIELDS)[:chunk_size])
+        if not rows:
+            return 0
+        ArchivedPaymentTransaction.objects.bulk_create(
+            [ArchivedPaymentTransaction(archived_at=now, **row) for row in rows]
+        )
+        PaymentTransaction.objects.filter(id__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+def restore_archived(transaction_id):
+    """
+    Move an archived failed or expired transaction back to the live table,
+    keeping its id and timestamps (and so its rollup bucket). Must run inside
+    a transaction. Returns False if there is none, or another worker
+    restored it first.
+    """
+    row = (ArchivedPaymentTransaction.objects
+           .filter(transaction_id=transaction_id).exclude(status='completed')
+           .values(*ARCHIVED_FIELDS).first())
+    if row is None or not ArchivedPaymentTransaction.objects.filter(pk=row['id']).delete()[0]:
+        return False
+    PaymentTransaction.objects.create(**row)
+    # auto_now_add / auto_now overwrote the original timestamps on insert
+    PaymentTransaction.objects.filter(pk=row['id']).update(
+        created_at=row['created_at'], updated_at=row['updated_at']
+    )
+    return True
@@ -0,0 +1,143 @@
+# api/rollups.py
+"""
+Incrementally maintained payment totals (PaymentRollup).
+
+Every place that creates a PaymentTransaction or changes its status calls
+record_created() or record_transition() in the same database transaction,
+which moves the transaction's count and amount between (user, day, currency,
+status) buckets with F() increments. The stats endpoint then reads only the
+rollups, so its cost grows with the number of days, not of transactions.
+
+Archiving a transaction (api/retention.py) leaves its rollups alone, so the
+totals keep counting it. Code that changes transactions any other way
+(bulk_create, ad-hoc UPDATEs, the admin) bypasses the rollups; run
+``python manage.py rebuild_payment_rollups`` afterwards.
+"""
+import datetime
+
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+from .models import ArchivedPaymentTransaction, PaymentRollup, PaymentTransaction
+
+# Grouping keys accepted by totals()
+DIMENSIONS = ('user', 'day', 'currency', 'status')
+
+
+def day_of(created_at):
+    return created_at.astimezone(datetime.timezone.utc).date()
+
+
+def _add(user_id, day, currency, status, count, amount):
+    bucket = PaymentRollup.objects.filter(user_id=user_id, day=day, currency=currency, status=status)
+    if bucket.update(count=F('count') + count, amount=F('amount') + amount):
+        return
+    try:
+        # Savepoint, so losing the race to create the bucket leaves the caller's transaction usable
+        with db_transaction.atomic():
+            PaymentRollup.objects.create(
+                user_id=user_id, day=day, currency=currency, status=status, count=count, amount=amount
+            )
+    except IntegrityError:
+        bucket.update(count=F('count') + count, amount=F('amount') + amount)
+
+
+def record_created(transaction):
+    """
+    Count a newly created transaction under its current status.
+    """
+    _add(transaction.user_id, day_of(transaction.created_at), transaction.currency,
+         transaction.status, 1, transaction.amount)
+
+
+def record_transition(transaction, old_status):
+    """
+    Move a transaction from its ``old_status`` bucket to its current status.
+    """
+    if old_status == transaction.status:
+        return
+    day = day_of(transaction.created_at)
+    _add(transaction.user_id, day, transaction.currency, old_status, -1, -transaction.amount)
+    _add(transaction.user_id, day, transaction.currency, transaction.status, 1, transaction.amount)
+
+
+def record_bulk_transition(transactions, old_status):
+    """
+    record_transition() for every transaction in the ``transactions``
+    queryset at once, with one update per bucket instead of per row.
+    """
+    moved = {}
+    for user_id, created_at, currency, status, amount in transactions.values_list(
+        'user_id', 'created_at', 'currency', 'status', 'amount'
+    ):
+        if status != old_status:
+            key = (user_id, day_of(created_at), currency, status)
+            count, total = moved.get(key, (0, 0))
+            moved[key] = (count + 1, total + amount)
+    for (user_id, day, currency, status), (count, amount) in moved.items():
+        _add(user_id, day, currency, old_status, -count, -amount)
+        _add(user_id, day, currency, status, count, amount)
+
+
+def create_transaction(**fields):
+    """
+    PaymentTransaction.objects.create() that also updates the rollups.
+    """
+    with db_transaction.atomic():
+        transaction = PaymentTransaction.objects.create(**fields)
+        record_created(transaction)
+    return transaction
+
+
+def rebuild():
+    """
+    Recompute every rollup from PaymentTransaction and
+    ArchivedPaymentTransaction. Returns the number of buckets. Runs in one
+    transaction, but writes that commit while it runs may be missed on
+    backends without SQLite's single writer, so run it when payments are
+    quiet.
+    """
+    with db_transaction.atomic():
+        PaymentRollup.objects.all().delete()
+        buckets = {}
+        for model in (PaymentTransaction, ArchivedPaymentTransaction):
+            rows = (
+                model.objects
+                .annotate(day=TruncDate('created_at', tzinfo=datetime.timezone.utc))
+                .values_list('user_id', 'day', 'currency', 'status')
+                .annotate(count=Count('id'), amount=Sum('amount'))
+                .order_by()
+            )
+            for user_id, day, currency, status, count, amount in rows.iterator():
+                key = (user_id, day, currency, status)
+                total_count, total_amount = buckets.get(key, (0, 0))
+                buckets[key] = (total_count + count, total_amount + amount)
+        created = PaymentRollup.objects.bulk_create(
+            [PaymentRollup(user_id=user_id, day=day, currency=currency, status=status, count=count, amount=amount)
+             for (user_id, day, currency, status), (count, amount) in buckets.items()],
+            batch_size=1000,
+        )
+    return len(created)
+
+
+def totals(group_by, user=None, start=None, end=None):
+    """
+    Sum the rollups of ``user`` (or everyone) with ``start <= day <= end``,
+    grouped by the given DIMENSIONS. Returns dicts with the grouping keys
+    plus count and amount; empty buckets are left out.
+    """
+    rollups = PaymentRollup.objects.all()
+    if user is not None:
+        rollups = rollups.filter(user=user)
+    if start is not None:
+        rollups = rollups.filter(day__gte=start)
+    if end is not None:
+        rollups = rollups.filter(day__lte=end)
+    columns = ['user_id' if dimension == 'user' else dimension for dimension in group_by]
+    return (
+        rollups.values(*columns)
+        .annotate(count=Sum('count'), amount=Sum('amount'))
+        .filter(count__gt=0)
+        .order_by(*columns)
+    )
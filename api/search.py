@@ -0,0 +1,94 @@
+# api/search.py
+"""
+Sample search (GET /api/api/search).
+
+Every filter maps onto an index:
+
+- ``match=prefix`` (the default) is a case-sensitive range on name,
+  ``name >= q AND name < successor(q)``, served by (name, id). LIKE 'q%'
+  would be case-insensitive, which SQLite cannot answer from a BINARY index.
+- ``match=contains`` is case-insensitive. On SQLite with three or more
+  characters it is answered by the api_samplemodel_fts FTS5 trigram table
+  (migration 0006), otherwise by icontains, which scans the table.
+- ``age_min``/``age_max`` are an inclusive range on (age, id).
+
+Results are keyset-paginated in one of ORDERINGS, with id as the tiebreaker,
+so every ordering has an index that already returns rows in page order.
+"""
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+from .models import SampleModel
+
+FTS_TABLE = 'api_samplemodel_fts'
+# The trigram tokenizer cannot match anything shorter
+FTS_MIN_LENGTH = 3
+
+ORDERINGS = {
+    'id': ('id',),
+    '-id': ('-id',),
+    'name': ('name', 'id'),
+    '-name': ('-name', '-id'),
+    'age': ('age', 'id'),
+    '-age': ('-age', '-id'),
+}
+
+_fts_tables = {}
+
+
+def fts_available(database):
+    """
+    True if ``database`` has the FTS5 table; checked once per database file.
+    """
+    connection = connections[database]
+    if connection.vendor != 'sqlite':
+        return False
+    key = (database, connection.settings_dict['NAME'])
+    if key not in _fts_tables:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _fts_tables[key] = cursor.fetchone() is not None
+    return _fts_tables[key]
+
+
+def prefix_upper_bound(prefix):
+    """
+    The smallest string greater than every string starting with ``prefix``,
+    or None if there is none. SQLite compares BINARY text as UTF-8 bytes,
+    which sort in code point order.
+    """
+    while prefix:
+        last = ord(prefix[-1])
+        if last < 0x10FFFF:
+            # Surrogates cannot be encoded, so the next character after them is U+E000
+            return prefix[:-1] + chr(0xE000 if 0xD7FF <= last < 0xE000 else last + 1)
+        prefix = prefix[:-1]
+    return None
+
+
+def search_samples(database, q=None, match='prefix', age_min=None, age_max=None):
+    """
+    Return the SampleModel queryset on ``database`` for the given filters,
+    unordered: the paginator orders it.
+    """
+    queryset = SampleModel.objects.using(database)
+    if q:
+        if match == 'contains':
+            if len(q) >= FTS_MIN_LENGTH and fts_available(database):
+                # One phrase, so FTS5 query syntax in q is matched literally
+                phrase = '"' + q.replace('"', '""') + '"'
+                queryset = queryset.filter(id__in=RawSQL(
+                    f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [phrase]
+                ))
+            else:
+                queryset = queryset.filter(name__icontains=q)
+        else:
+            queryset = queryset.filter(name__gte=q)
+            upper = prefix_upper_bound(q)
+            if upper is not None:
+                queryset = queryset.filter(name__lt=upper)
+    if age_min is not None:
+        queryset = queryset.filter(age__gte=age_min)
+    if age_max is not None:
+        queryset = queryset.filter(age__lte=age_max)
+    return queryset
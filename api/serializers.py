@@ -3,10 +3,75 @@ from rest_framework import serializers
 from .models import SampleModel, UserAccount, PaymentTransaction
 from django.contrib.auth.models import User
 
+class SampleListSerializer(serializers.ListSerializer):
+    """
+    List variant of SampleSerializer used for bulk ingestion.
+    Rows are validated one by one so a bad row does not reject its neighbours.
+    """
+
+    def validate_rows(self, indexed_rows):
+        """
+        Validates (index, row) pairs. Returns (valid, errors): valid is a list
+        of (index, validated_data), errors a list of {"row": index, "errors": ...}.
+        """
+        valid, errors = [], []
+        for index, row in indexed_rows:
+            try:
+                valid.append((index, self.child.run_validation(row)))
+            except serializers.ValidationError as e:
+                errors.append({"row": index, "errors": e.detail})
+        return valid, errors
+
+    def create(self, validated_data):
+        return SampleModel.objects.bulk_create(
+            [SampleModel(**item) for item in validated_data],
+            batch_size=self.context.get('batch_size'),
+        )
+
+
 class SampleSerializer(serializers.ModelSerializer):
     class Meta:
         model = SampleModel
         fields = ['id', 'name', 'age']
+        list_serializer_class = SampleListSerializer
+
+class SampleSearchSerializer(serializers.Serializer):
+    """
+    Query parameters of the sample search endpoint (see api/search.py).
+    """
+    q = serializers.CharField(required=False, allow_blank=True, max_length=150)
+    match = serializers.ChoiceField(choices=['prefix', 'contains'], default='prefix')
+    age_min = serializers.IntegerField(required=False)
+    age_max = serializers.IntegerField(required=False)
+    ordering = serializers.ChoiceField(choices=['id', '-id', 'name', '-name', 'age', '-age'], required=False)
+
+    def validate(self, attrs):
+        age_min, age_max = attrs.get('age_min'), attrs.get('age_max')
+        if age_min is not None and age_max is not None and age_min > age_max:
+            raise serializers.ValidationError({"age_max": "Must be greater than or equal to age_min."})
+        return attrs
+
+class PaymentStatsSerializer(serializers.Serializer):
+    """
+    Query parameters of the payment stats endpoint: an inclusive day range
+    and a comma-separated group_by of day, currency, status (and user, for
+    staff).
+    """
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    group_by = serializers.CharField(required=False, default='currency,status')
+
+    def validate_group_by(self, value):
+        group_by = [part.strip() for part in value.split(',') if part.strip()]
+        allowed = ('user', 'day', 'currency', 'status')
+        if not group_by or any(part not in allowed for part in group_by) or len(set(group_by)) != len(group_by):
+            raise serializers.ValidationError(f"Comma-separated list of: {', '.join(allowed)}.")
+        return group_by
+
+    def validate(self, attrs):
+        if attrs.get('start') and attrs.get('end') and attrs['start'] > attrs['end']:
+            raise serializers.ValidationError({"end": "Must not be before start."})
+        return attrs
 
 class UserAccountSerializer(serializers.ModelSerializer):
     class Meta:
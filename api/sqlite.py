@@ -0,0 +1,58 @@
+# api/sqlite.py
+"""
+Production SQLite profile (SQLITE_PROFILE in backend/settings.py).
+
+Every new SQLite connection gets the pragmas in settings.SQLITE_PRAGMAS:
+WAL journaling so readers never block the writer, synchronous=NORMAL (safe
+with WAL, fsyncs at checkpoints only), a busy_timeout so writers queue for
+the lock instead of failing, and larger mmap and page caches. Connections
+are kept for CONN_MAX_AGE seconds, so this runs once per connection rather
+than once per request.
+
+The other half of the profile is ``OPTIONS: {'transaction_mode':
+'IMMEDIATE'}``. With SQLite's default deferred transactions, two
+transactions that both read and then write deadlock on the upgrade to a
+write lock, and SQLite fails one of them at once with "database is locked",
+without waiting out busy_timeout. BEGIN IMMEDIATE takes the write lock up
+front, so concurrent writers simply wait their turn.
+"""
+import logging
+import re
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+_NAME = re.compile(r'^[a-z_]+$')
+_VALUE = re.compile(r'^(-?\d+|[A-Za-z_]+)$')
+
+
+def pragma_statements(pragmas):
+    """
+    ``PRAGMA name = value`` statements for a {name: value} dict. Names and
+    values come from settings (and the environment), so they are validated
+    rather than interpolated blindly.
+    """
+    statements = []
+    for name, value in pragmas.items():
+        if not _NAME.match(name) or not _VALUE.match(str(value)):
+            raise ValueError(f"Invalid SQLite pragma: {name} = {value!r}")
+        statements.append(f'PRAGMA {name} = {value}')
+    return statements
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if not pragmas:
+        return
+    # On the raw connection: not a query of whichever request opened it
+    for statement in pragma_statements(pragmas):
+        try:
+            connection.connection.execute(statement).fetchall()
+        except Exception as e:
+            logger.error(f"Error applying {statement}: {str(e)}")
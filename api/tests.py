@@ -1,3 +1,2043 @@
-from django.test import TestCase
+import base64
+import csv
+import datetime
+import gzip
+import hashlib
+import hmac
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.http import Http404, JsonResponse
+from django.db import DatabaseError, OperationalError, connection, connections, transaction
+from django.db.utils import ConnectionHandler
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import path
+from django.utils import timezone
+
+from google.auth import crypt as google_crypt
+from google.auth import jwt as google_jwt
+
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import (
+    admission, async_views, frontend, google_auth, http_client, metrics, openapi, retention, rollups, search, urls as api_urls, webhooks,
+)
+from .authentication import UserCache, user_cache
+from .catalog import ProductCatalog, ProductCatalogError
+from .management.commands.profile_startup import parse_importtime
+from .db_router import PrimaryReplicaRouter, ReplicaRoutingMiddleware, use_primary
+from .fast_serializers import FastJSONRenderer, ValuesSerializer, payment_transaction_values, sample_values
+from .response_cache import sample_list_cache
+from .sqlite import pragma_statements
+from .views import product_catalog
+from allauth.socialaccount.models import SocialAccount
+
+from .models import (
+    ArchivedPaymentTransaction, BalanceLedgerEntry, PaymentRollup, PaymentTransaction, SampleModel, UserAccount,
+    WebhookEvent,
+)
+from .serializers import PaymentTransactionSerializer, SampleListSerializer, SampleSerializer, UserWithAccountSerializer
+
+
+class ProductCatalogTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = [1000.0]
+        patcher = mock.patch('api.catalog.time.monotonic', side_effect=lambda: self.clock[0])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _catalog(self, fetch_product_list):
+        return ProductCatalog(fetch_product_list, ttl=10, stale_ttl=100)
+
+    def _refreshed(self, catalog):
+        # Wait for the background refresh started by the last read
+        flight = catalog._flight
+        if flight is not None:
+            self.assertTrue(flight.done.wait(5))
+
+    def test_concurrent_cold_misses_fetch_once(self):
+        release = threading.Event()
+
+        def slow_fetch():
+            release.wait(5)
+            return [{'id': 'a', 'name': 'A'}]
+        fetch_product_list = mock.Mock(side_effect=slow_fetch)
+        catalog = self._catalog(fetch_product_list)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(catalog.get, 'a') for _ in range(8)]
+            while fetch_product_list.call_count == 0:
+                time.sleep(0.01)
+            time.sleep(0.05)  # let the other callers join the flight
+            release.set()
+            results = [future.result() for future in futures]
+        self.assertEqual(results, [{'id': 'a', 'name': 'A'}] * 8)
+        self.assertEqual(fetch_product_list.call_count, 1)
+
+    def test_stale_entries_are_served_while_refreshing(self):
+        release = threading.Event()
+        versions = iter([[{'id': 'a', 'name': 'old'}], [{'id': 'a', 'name': 'new'}]])
+
+        def fetch():
+            products = next(versions)
+            if products[0]['name'] == 'new':
+                release.wait(5)
+            return products
+        fetch_product_list = mock.Mock(side_effect=fetch)
+        catalog = self._catalog(fetch_product_list)
+        self.assertEqual(catalog.get('a')['name'], 'old')
+
+        self.clock[0] += 5  # fresh
+        self.assertEqual(catalog.get('a')['name'], 'old')
+        self.assertEqual(fetch_product_list.call_count, 1)
+
+        self.clock[0] += 50  # stale: answered at once, refreshed once in the background
+        self.assertEqual(catalog.get('a')['name'], 'old')
+        self.assertEqual(catalog.get('a')['name'], 'old')
+        release.set()
+        self._refreshed(catalog)
+        self.assertEqual(fetch_product_list.call_count, 2)
+        self.assertEqual(catalog.get('a')['name'], 'new')
+
+    def test_upstream_errors_fall_back_to_stale_data(self):
+        fetch_product_list = mock.Mock(side_effect=[
+            [{'id': 'a', 'name': 'old'}],
+            ProductCatalogError("Lemon Squeezy is down"),
+            ProductCatalogError("Lemon Squeezy is down"),
+        ])
+        catalog = self._catalog(fetch_product_list)
+        catalog.products()
+
+        self.clock[0] += 50
+        with self.assertLogs('api.catalog', 'ERROR'):
+            self.assertEqual(catalog.products(), [{'id': 'a', 'name': 'old'}])
+            self._refreshed(catalog)
+            self.assertEqual(catalog.products(), [{'id': 'a', 'name': 'old'}])
+            self._refreshed(catalog)
+        self.assertEqual(fetch_product_list.call_count, 3)
+
+        # Past the stale window the caller waits for the fetch, and still
+        # gets the last good copy if it fails
+        self.clock[0] += 100
+        fetch_product_list.side_effect = ProductCatalogError("Lemon Squeezy is down")
+        with self.assertLogs('api.catalog', 'ERROR'):
+            self.assertEqual(catalog.products(), [{'id': 'a', 'name': 'old'}])
+        self.assertEqual(fetch_product_list.call_count, 4)
+
+        # With no copy at all the error reaches the caller
+        with self.assertLogs('api.catalog', 'ERROR'), self.assertRaises(ProductCatalogError):
+            self._catalog(fetch_product_list).products()
+
+    def test_products_view_uses_the_catalog(self):
+        fetch_product_list = mock.Mock(return_value=[{'id': 'a', 'name': 'A'}])
+        self.addCleanup(product_catalog.invalidate)
+        product_catalog.invalidate()
+        with mock.patch.object(product_catalog, '_fetcher', fetch_product_list):
+            for _ in range(3):
+                response = self.client.get('/api/payments/products/')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), [{'id': 'a', 'name': 'A'}])
+            self.assertEqual(fetch_product_list.call_count, 1)
+
+            product_catalog.invalidate()
+            fetch_product_list.side_effect = ProductCatalogError("Lemon Squeezy is down")
+            with self.assertLogs('api', 'ERROR'):
+                self.assertEqual(self.client.get('/api/payments/products/').status_code, 500)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_GET(self):
+        server = self.server
+        server.client_ports.add(self.client_address[1])
+        code = server.statuses.pop(0) if server.statuses else 200
+        server.hits += 1
+        body = b'{"ok": true}'
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(OUTBOUND_HTTP={'MAX_RETRIES': 2, 'BACKOFF_FACTOR': 0})
+class OutboundHttpClientTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+        self.server.client_ports = set()
+        self.server.statuses = []
+        self.server.hits = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/'
+        http_client.reset_session()
+
+    def tearDown(self):
+        http_client.reset_session()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_reused(self):
+        for _ in range(5):
+            self.assertEqual(http_client.get(self.url).status_code, 200)
+        self.assertEqual(self.server.hits, 5)
+        self.assertEqual(len(self.server.client_ports), 1)
+
+    def test_retries_transient_errors(self):
+        self.server.statuses = [503, 503]
+        response = http_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.hits, 3)
+
+    def test_retries_are_bounded(self):
+        self.server.statuses = [503, 503, 503, 503]
+        response = http_client.get(self.url)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.server.hits, 3)
+
+    def test_default_timeout_is_applied(self):
+        with override_settings(OUTBOUND_HTTP={'CONNECT_TIMEOUT': 1, 'READ_TIMEOUT': 2}):
+            session = http_client.get_session()
+            original = session.request
+            seen = {}
+
+            def spy(method, url, **kwargs):
+                seen.update(kwargs)
+                return original(method, url, **kwargs)
+
+            session.request = spy
+            http_client.get(self.url)
+        self.assertEqual(seen['timeout'], (1, 2))
+
+
+class _AsyncURLs:
+    """
+    The I/O-bound routes of api/urls.py as they are with ASYNC_VIEWS on.
+    """
+    urlpatterns = [
+        path('api/auth/google/', async_views.google_login, name='google_login'),
+        path('api/payments/products/', async_views.get_products, name='get_products'),
+        path('api/payments/create/', async_views.create_payment_intent, name='create_payment'),
+    ]
+
+
+class AsyncViewParityTests(TestCase):
+    """
+    Each native async view answers like its DRF counterpart.
+    """
+    userinfo = {'sub': 'google-7', 'email': 'async@example.com', 'given_name': 'Grace', 'family_name': 'Hopper'}
+    products = [{'id': 'credits', 'name': 'Credits', 'slug': 'credits', 'price': '$12.00',
+                 'by_now_url': 'https://example.com/checkout'}]
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(username='async')
+        self.auth = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        product_catalog._publish(self.products)
+        self.addCleanup(product_catalog.invalidate)
+
+    async def _both(self, method, url, data=None, **headers):
+        """
+        Return the (sync, async) responses to the same request.
+        """
+        kwargs = {'content_type': 'application/json'} if data is not None else {}
+        sync_response = await sync_to_async(getattr(self.client, method))(url, data, headers=headers, **kwargs)
+        with override_settings(ROOT_URLCONF=_AsyncURLs):
+            async_response = await getattr(self.async_client, method)(url, data, headers=headers, **kwargs)
+            # resolver_match is lazy; resolve it while the async routes are active
+            self.assertIn(async_response.resolver_match.func, [route.callback for route in _AsyncURLs.urlpatterns])
+        return sync_response, async_response
+
+    def assertSameResponse(self, sync_response, async_response, status_code):
+        self.assertEqual(sync_response.status_code, status_code, sync_response.content)
+        self.assertEqual(async_response.status_code, status_code, async_response.content)
+        self.assertEqual(async_response.content, sync_response.content)
+        self.assertEqual(async_response.get('WWW-Authenticate'), sync_response.get('WWW-Authenticate'))
+
+    async def test_get_products(self):
+        self.assertSameResponse(*await self._both('get', '/api/payments/products/'), 200)
+        self.assertSameResponse(*await self._both('post', '/api/payments/products/', {}), 405)
+
+        product_catalog.invalidate()
+        with mock.patch.object(product_catalog, '_fetcher', side_effect=ProductCatalogError("down")), \
+                mock.patch.object(product_catalog, '_async_fetcher', side_effect=ProductCatalogError("down")), \
+                self.assertLogs('api', 'ERROR'):
+            self.assertSameResponse(*await self._both('get', '/api/payments/products/'), 500)
+
+    async def test_create_payment_intent(self):
+        url = '/api/payments/create/'
+        # Authentication and permission failures
+        self.assertSameResponse(*await self._both('post', url, {'product_id': 'credits'}), 401)
+        self.assertSameResponse(*await self._both('post', url, {'product_id': 'credits'},
+                                                  Authorization='Bearer not-a-token'), 401)
+        self.assertSameResponse(*await self._both('get', url, **self.auth), 405)
+        # Validation
+        self.assertSameResponse(*await self._both('post', url, {}, **self.auth), 400)
+        with self.assertLogs('api', 'ERROR'):
+            self.assertSameResponse(*await self._both('post', url, {'product_id': 'nope'}, **self.auth), 400)
+
+        sync_response, async_response = await self._both('post', url, {'product_id': 'credits'}, **self.auth)
+        self.assertEqual((sync_response.status_code, async_response.status_code), (201, 201))
+        sync_data, async_data = sync_response.json(), async_response.json()
+        self.assertNotEqual(async_data.pop('transaction_id'), sync_data.pop('transaction_id'))
+        self.assertEqual(async_data.pop('checkout_url').split('=')[0], sync_data.pop('checkout_url').split('=')[0])
+        self.assertEqual(async_data, sync_data)
+        self.assertEqual(await PaymentTransaction.objects.filter(user=self.user, status='pending').acount(), 2)
+
+    async def test_google_login(self):
+        url = '/api/auth/google/'
+        self.assertSameResponse(*await self._both('post', url, {}), 400)
+        self.assertSameResponse(*await self._both('get', url), 405)
+
+        error = google_auth.GoogleTokenError("Invalid Google token")
+        with mock.patch.object(google_auth, 'resolve_google_user', side_effect=error), \
+                mock.patch.object(google_auth, 'aresolve_google_user', side_effect=error):
+            self.assertSameResponse(*await self._both('post', url, {'token': 'bad'}), 400)
+
+        with mock.patch.object(google_auth, 'resolve_google_user', return_value=dict(self.userinfo)), \
+                mock.patch.object(google_auth, 'aresolve_google_user', return_value=dict(self.userinfo)):
+            sync_response, async_response = await self._both('post', url, {'token': 'good'})
+        self.assertEqual((sync_response.status_code, async_response.status_code), (200, 200))
+        self.assertEqual(async_response.json()['user'], sync_response.json()['user'])
+        self.assertEqual(sorted(async_response.json()), ['access', 'refresh', 'user'])
+        self.assertEqual(await User.objects.filter(email='async@example.com').acount(), 1)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(username='pages')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+        other = User.objects.create_user(username='pages-other')
+        PaymentTransaction.objects.bulk_create(
+            [PaymentTransaction(user=self.user, transaction_id=f'page-{i}', amount=Decimal('1.00')) for i in range(7)]
+            + [PaymentTransaction(user=other, transaction_id='page-other', amount=Decimal('1.00'))]
+        )
+        # Three created_at values shared by several rows, so pages split ties on id
+        base = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+        ids = list(PaymentTransaction.objects.filter(user=self.user).order_by('id').values_list('id', flat=True))
+        for offset, group in ((0, ids[:3]), (1, ids[3:5]), (2, ids[5:])):
+            PaymentTransaction.objects.filter(id__in=group).update(created_at=base + datetime.timedelta(hours=offset))
+        self.expected = list(
+            PaymentTransaction.objects.filter(user=self.user).order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+
+    def _page(self, url):
+        response = self.client.get(url, **self.auth)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_forward_and_backward_across_ties(self):
+        pages, url = [], '/api/payments/history/?page_size=2'
+        while url:
+            page = self._page(url)
+            pages.append([row['id'] for row in page['results']])
+            url = page['next']
+        self.assertEqual(pages, [self.expected[i:i + 2] for i in range(0, 7, 2)])
+        self.assertIsNone(self._page('/api/payments/history/?page_size=2')['previous'])
+
+        # Walk back from the last page to the first
+        backwards, url = [pages[-1]], page['previous']
+        while url:
+            page = self._page(url)
+            backwards.append([row['id'] for row in page['results']])
+            url = page['previous']
+        self.assertEqual(backwards[::-1], pages)
+
+        # A previous page links forward again to where it came from
+        second = self._page(self._page('/api/payments/history/?page_size=2')['next'])
+        self.assertEqual([row['id'] for row in self._page(second['previous'])['results']], pages[0])
+
+    def test_tampered_cursor_is_404(self):
+        def cursor(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+        for value in ('not-base64!', cursor({'x': 1}), cursor({'p': [1]}), cursor({'p': 'id'}),
+                      cursor({'p': ['not a date', 1]})):
+            response = self.client.get('/api/payments/history/', {'cursor': value}, **self.auth)
+            self.assertEqual(response.status_code, 404, value)
+            self.assertEqual(response.json(), {'detail': 'Invalid cursor'})
+
+    def test_page_size_is_capped(self):
+        with override_settings(PAGINATION_PAGE_SIZE=2, PAGINATION_MAX_PAGE_SIZE=5):
+            self.assertEqual(len(self._page('/api/payments/history/')['results']), 2)
+            self.assertEqual(len(self._page('/api/payments/history/?page_size=3')['results']), 3)
+            page = self._page('/api/payments/history/?page_size=1000')
+            self.assertEqual([row['id'] for row in page['results']], self.expected[:5])
+            self.assertIn('page_size=1000', page['next'])
+            for page_size in ('0', '-1', 'many'):
+                self.assertEqual(len(self._page(f'/api/payments/history/?page_size={page_size}')['results']), 2)
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class StreamingExportTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(username='exporter')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+        SampleModel.objects.bulk_create([SampleModel(name=f'row, "{i}"', age=20 + i) for i in range(5)])
+
+    def _get(self, url, **extra):
+        response = self.client.get(url, **self.auth, **extra)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_ndjson_is_the_default(self):
+        for accept in (None, '*/*', 'application/x-ndjson'):
+            response, body = self._get('/api/api/export', **({'HTTP_ACCEPT': accept} if accept else {}))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+            self.assertEqual(response['Content-Disposition'], 'attachment; filename="samples.ndjson"')
+            rows = [json.loads(line) for line in body.decode().splitlines()]
+            self.assertEqual(rows, list(SampleModel.objects.order_by('id').values('id', 'name', 'age')))
+
+    def test_csv_on_request(self):
+        response, body = self._get('/api/api/export', HTTP_ACCEPT='text/csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="samples.csv"')
+        rows = list(csv.reader(io.StringIO(body.decode())))
+        self.assertEqual(rows[0], ['id', 'name', 'age'])
+        self.assertEqual(rows[1:], [[str(pk), name, str(age)] for pk, name, age in
+                                    SampleModel.objects.order_by('id').values_list('id', 'name', 'age')])
+
+    def test_gzip_when_accepted(self):
+        _, plain = self._get('/api/api/export', HTTP_ACCEPT='text/csv')
+        response, body = self._get('/api/api/export', HTTP_ACCEPT='text/csv', HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(body), plain)
+
+        for encoding in ('gzip;q=0', 'br', 'identity'):
+            response, body = self._get('/api/api/export', HTTP_ACCEPT='text/csv', HTTP_ACCEPT_ENCODING=encoding)
+            self.assertFalse(response.has_header('Content-Encoding'), encoding)
+            self.assertEqual(body, plain)
+
+    def test_unsupported_accept_is_406(self):
+        for accept in ('application/json', 'application/xml', 'text/html'):
+            response, _ = self._get('/api/api/export', HTTP_ACCEPT=accept)
+            self.assertEqual(response.status_code, 406, accept)
+
+    def test_payment_export_is_limited_to_the_user(self):
+        other = User.objects.create_user(username='exporter-other')
+        rollups.create_transaction(user=self.user, transaction_id='mine-1', amount=Decimal('12.50'))
+        rollups.create_transaction(user=self.user, transaction_id='mine-2', amount=Decimal('3.00'), status='completed')
+        rollups.create_transaction(user=other, transaction_id='theirs', amount=Decimal('99.00'))
+
+        response, body = self._get('/api/payments/export/')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="payments.ndjson"')
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([(row['transaction_id'], row['amount'], row['status']) for row in rows],
+                         [('mine-2', '3.00', 'completed'), ('mine-1', '12.50', 'pending')])
+        # Same field formats as the paged history
+        history = self.client.get('/api/payments/history/', **self.auth).json()['results']
+        self.assertEqual([row['created_at'] for row in rows], [row['created_at'] for row in history])
+
+        response, body = self._get('/api/payments/export/', HTTP_ACCEPT='text/csv')
+        self.assertNotIn(b'theirs', body)
+        self.assertEqual(len(body.decode().splitlines()), 3)
+
+        self.assertEqual(self.client.get('/api/payments/export/').status_code, 401)
+
+
+@override_settings(BULK_INSERT_BATCH_SIZE=2)
+class BulkSampleIngestTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(username='ingest')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def _post(self, body, content_type='application/json'):
+        if content_type == 'application/json' and not isinstance(body, str):
+            body = json.dumps(body)
+        return self.client.post('/api/api/bulk', body, content_type=content_type, **self.auth)
+
+    def _names(self):
+        return list(SampleModel.objects.order_by('id').values_list('name', flat=True))
+
+    def test_json_array_reports_invalid_rows(self):
+        response = self._post([
+            {'name': 'a', 'age': 1},
+            {'name': 'b', 'age': 'old'},
+            {'age': 3},
+            {'name': 'd', 'age': 4},
+            {'name': 'e', 'age': 5},
+        ])
+        self.assertEqual(response.status_code, 201, response.content)
+        body = response.json()
+        self.assertEqual((body['created'], body['failed']), (3, 2))
+        self.assertEqual([error['row'] for error in body['errors']], [1, 2])
+        self.assertIn('age', body['errors'][0]['errors'])
+        self.assertIn('name', body['errors'][1]['errors'])
+        self.assertEqual(self._names(), ['a', 'd', 'e'])
+
+    def test_ndjson_reports_unparsable_lines(self):
+        body = '\n'.join([
+            '{"name": "a", "age": 1}',
+            '',
+            '{"name": "b", "age": ',
+            '{"name": "c", "age": -}',
+            '{"name": "d", "age": 4}',
+        ]) + '\n'
+        response = self._post(body, 'application/x-ndjson')
+        self.assertEqual(response.status_code, 201, response.content)
+        body = response.json()
+        self.assertEqual((body['created'], body['failed']), (2, 2))
+        # Blank lines are skipped and do not count as rows
+        self.assertEqual([error['row'] for error in body['errors']], [1, 2])
+        self.assertTrue(body['errors'][0]['errors']['non_field_errors'][0].startswith('JSON parse error'))
+        self.assertEqual(self._names(), ['a', 'd'])
+
+    def test_rejects_bodies_that_are_not_arrays(self):
+        for body in ({'name': 'a', 'age': 1}, '"a"', '{"name": '):
+            response = self._post(body)
+            self.assertEqual(response.status_code, 400, body)
+            self.assertIn('detail', response.json())
+        self.assertEqual(self._names(), [])
+
+        response = self._post([{'name': 'x'}, {'age': 2}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['created'], 0)
+        self.assertEqual(self._post([]).status_code, 201)
+        self.assertEqual(self.client.post('/api/api/bulk', '[]', content_type='application/json').status_code, 401)
+
+    def test_failed_batch_does_not_abort_the_others(self):
+        create = SampleListSerializer.create
+        calls = []
+
+        def flaky_create(serializer, validated_data):
+            calls.append(len(validated_data))
+            if len(calls) == 2:
+                raise DatabaseError("disk I/O error")
+            return create(serializer, validated_data)
+
+        with mock.patch.object(SampleListSerializer, 'create', flaky_create), self.assertLogs('api', 'ERROR'):
+            response = self._post([{'name': f's{i}', 'age': i} for i in range(5)])
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body['created'], body['failed']), (3, 2))
+        self.assertEqual([error['row'] for error in body['errors']], [2, 3])
+        self.assertEqual(self._names(), ['s0', 's1', 's4'])
+
+
+@override_settings(LEMON_SQUEEZY_SIGNING_SECRET='test-secret')
+class WebhookInboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='inbox')
+
+    def _body(self, event_name='order_paid', transaction_id='inbox-1'):
+        return json.dumps({
+            'meta': {'event_name': event_name, 'custom_data': {'transaction_id': transaction_id}},
+        }).encode('utf-8')
+
+    def _deliver(self, body):
+        signature = hmac.new(b'test-secret', body, hashlib.sha256).hexdigest()
+        return self.client.post('/api/webhooks/lemonsqueezy/', body, content_type='application/json',
+                                headers={'X-Signature': signature})
+
+    def _due(self, event):
+        # Skip the wait until the event's next attempt
+        WebhookEvent.objects.filter(pk=event.pk).update(next_attempt_at=timezone.now())
+
+    def test_redeliveries_are_queued_once(self):
+        body = self._body()
+        for _ in range(3):
+            self.assertEqual(self._deliver(body).status_code, 200)
+        webhooks.enqueue_event(body, 'order_paid')
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.event_id, event.status), (webhooks.event_id_for(body), 'pending'))
+
+        # A different body for the same transaction is a different event
+        self._deliver(self._body('order_created'))
+        self.assertEqual(WebhookEvent.objects.count(), 2)
+
+    def test_rejects_bodies_that_are_not_utf8(self):
+        with self.assertLogs('api.views', 'ERROR'):
+            for body in (b'{"meta": "\xff"}', json.dumps({'meta': {}}).encode('utf-16')):
+                self.assertEqual(self._deliver(body).status_code, 400)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_claimed_events_are_not_claimed_again_during_the_lease(self):
+        rollups.create_transaction(user=self.user, transaction_id='inbox-1', amount=Decimal('5.00'))
+        self._deliver(self._body())
+        event = WebhookEvent.objects.get()
+        stale_copy = WebhookEvent.objects.get()
+
+        self.assertTrue(webhooks._claim(event, datetime.timedelta(seconds=300)))
+        # Another worker that read the event before the claim loses the race...
+        self.assertFalse(webhooks._claim(stale_copy, datetime.timedelta(seconds=300)))
+        # ...and polling does not see it again until the lease runs out
+        self.assertEqual(webhooks.process_batch(lease=300), {'processed': 0, 'pending': 0, 'failed': 0, 'skipped': 0})
+
+        self._due(event)
+        self.assertEqual(webhooks.process_batch(lease=300)['processed'], 1)
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ('processed', 2))
+        self.assertEqual(PaymentTransaction.objects.get().status, 'completed')
+
+    def test_retries_with_backoff_then_fails(self):
+        self._deliver(self._body(transaction_id='not-created-yet'))
+        event = WebhookEvent.objects.get()
+
+        for attempt, delay in ((1, 30), (2, 60)):
+            before = timezone.now()
+            with self.assertLogs('api.webhooks', 'WARNING'):
+                self.assertEqual(webhooks.process_batch(max_attempts=3, backoff=30)['pending'], 1)
+            event.refresh_from_db()
+            self.assertEqual((event.status, event.attempts), ('pending', attempt))
+            self.assertIn('Transaction not found', event.last_error)
+            self.assertGreaterEqual(event.next_attempt_at, before + datetime.timedelta(seconds=delay))
+            self.assertLess(event.next_attempt_at, before + datetime.timedelta(seconds=delay + 5))
+            # Not due yet
+            self.assertEqual(webhooks.process_batch(max_attempts=3, backoff=30)['pending'], 0)
+            self._due(event)
+
+        with self.assertLogs('api.webhooks', 'ERROR'):
+            self.assertEqual(webhooks.process_batch(max_attempts=3, backoff=30)['failed'], 1)
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ('failed', 3))
+        self._due(event)
+        self.assertEqual(webhooks.process_batch(max_attempts=3, backoff=30)['failed'], 0)
+
+    def test_malformed_events_fail_without_retrying(self):
+        WebhookEvent.objects.create(event_id='broken', event_name='order_paid', payload='{"meta": {}}')
+        with self.assertLogs('api.webhooks', 'ERROR'):
+            self.assertEqual(webhooks.process_batch(max_attempts=5)['failed'], 1)
+        self.assertEqual(WebhookEvent.objects.get().attempts, 1)
+
+
+@override_settings(LEMON_SQUEEZY_SIGNING_SECRET='test-secret', WEBHOOK_RETRY_BACKOFF=0)
+class ConcurrentBalanceUpdateTests(TransactionTestCase):
+    """
+    Webhook deliveries and inbox workers on several threads. The SQLite test
+    database fails a write immediately ("database table is locked") instead of
+    waiting for the other connection, so the threads take turns at the
+    database through db_lock: one request or one batch at a time, interleaved
+    in whatever order the threads reach it.
+    """
+    payments = 40
+    threads = 8
+
+    def setUp(self):
+        self.db_lock = threading.Lock()
+        self.user = User.objects.create_user(username='payer')
+        UserAccount.objects.create(user=self.user, account_value=Decimal('0.00'))
+        self.transactions = [
+            PaymentTransaction.objects.create(
+                user=self.user, transaction_id=f'ls_test_{i}', amount=Decimal(f'{i + 1}.25')
+            )
+            for i in range(self.payments)
+        ]
+
+    def _post_webhook(self, transaction_id):
+        body = json.dumps({
+            'meta': {'event_name': 'order_paid', 'custom_data': {'transaction_id': transaction_id}},
+        }).encode('utf-8')
+        signature = hmac.new(b'test-secret', body, hashlib.sha256).hexdigest()
+        try:
+            with self.db_lock:
+                return Client().post(
+                    '/api/webhooks/lemonsqueezy/', body,
+                    content_type='application/json', headers={'X-Signature': signature},
+                ).status_code
+        finally:
+            connection.close()
+
+    def _drain(self):
+        try:
+            while True:
+                with self.db_lock:
+                    if not WebhookEvent.objects.filter(status='pending').exists():
+                        return
+                    webhooks.process_batch(batch_size=5)
+        finally:
+            connection.close()
+
+    def test_parallel_webhooks_credit_exact_balance(self):
+        # Every payment is delivered twice to also exercise deduplication
+        transaction_ids = [t.transaction_id for t in self.transactions] * 2
+        with ThreadPoolExecutor(self.threads) as pool:
+            statuses = list(pool.map(self._post_webhook, transaction_ids))
+        self.assertEqual(set(statuses), {200})
+        self.assertEqual(WebhookEvent.objects.count(), self.payments)
+
+        with ThreadPoolExecutor(self.threads) as pool:
+            for future in [pool.submit(self._drain) for _ in range(self.threads)]:
+                future.result()
+
+        expected = sum(t.amount for t in self.transactions)
+        self.assertEqual(WebhookEvent.objects.filter(status='processed').count(), self.payments)
+        # No lock errors, so every event was applied on its first attempt
+        self.assertEqual(set(WebhookEvent.objects.values_list('attempts', flat=True)), {1})
+        self.assertEqual(BalanceLedgerEntry.objects.filter(user=self.user).count(), self.payments)
+        self.assertEqual(UserAccount.objects.get(user=self.user).account_value, expected)
+
+        call_command('reconcile_balances', stdout=io.StringIO())
+        self.assertEqual(UserAccount.objects.get(user=self.user).account_value, expected)
+
+    def test_reconcile_rebuilds_balance_from_ledger(self):
+        for payment in self.transactions[:3]:
+            webhooks.apply_event('order_paid', payment.transaction_id, {})
+        expected = sum(t.amount for t in self.transactions[:3])
+        UserAccount.objects.filter(user=self.user).update(account_value=Decimal('999.99'))
+
+        call_command('reconcile_balances', '--dry-run', stdout=io.StringIO())
+        self.assertEqual(UserAccount.objects.get(user=self.user).account_value, Decimal('999.99'))
+
+        call_command('reconcile_balances', stdout=io.StringIO())
+        self.assertEqual(UserAccount.objects.get(user=self.user).account_value, expected)
+
+
+class SQLiteProfileTests(SimpleTestCase):
+    """
+    Concurrent read-then-write transactions, like the webhook handler's, on a
+    file database: the default setup fails some with "database is locked",
+    the production profile serializes them.
+    """
+    # The temporary database's connections are also named 'default'
+    databases = {'default'}
+    threads = 8
+    iterations = 15
+    # As configured in backend/settings.py with SQLITE_PROFILE on
+    options = {'transaction_mode': 'IMMEDIATE'}
+    pragmas = {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 5000,
+               'mmap_size': 1048576, 'cache_size': -2048, 'temp_store': 'MEMORY'}
+
+    def _run(self, options, pragmas):
+        with tempfile.TemporaryDirectory() as directory, override_settings(SQLITE_PRAGMAS=pragmas):
+            handler = ConnectionHandler({'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': os.path.join(directory, 'db.sqlite3'),
+                'OPTIONS': options,
+            }})
+            with handler['default'].cursor() as cursor:
+                cursor.execute('CREATE TABLE counter (id INTEGER PRIMARY KEY, value INTEGER NOT NULL)')
+                cursor.execute('INSERT INTO counter VALUES (1, 0)')
+                cursor.execute('PRAGMA journal_mode')
+                journal_mode = cursor.fetchone()[0]
+
+            barrier = threading.Barrier(self.threads)
+
+            def worker():
+                connection = handler['default']
+                errors = 0
+                barrier.wait()
+                try:
+                    for _ in range(self.iterations):
+                        try:
+                            with transaction.atomic(), connection.cursor() as cursor:
+                                cursor.execute('SELECT value FROM counter WHERE id = 1')
+                                value = cursor.fetchone()[0]
+                                time.sleep(0.001)
+                                cursor.execute('UPDATE counter SET value = %s WHERE id = 1', [value + 1])
+                        except OperationalError as e:
+                            self.assertIn('locked', str(e))
+                            errors += 1
+                finally:
+                    connection.close()
+                return errors
+
+            # Point transaction.atomic() at the temporary database
+            with mock.patch.object(transaction, 'get_connection', side_effect=lambda using=None: handler['default']):
+                with ThreadPoolExecutor(self.threads) as pool:
+                    errors = sum(pool.map(lambda _: worker(), range(self.threads)))
+            with handler['default'].cursor() as cursor:
+                cursor.execute('SELECT value FROM counter WHERE id = 1')
+                value = cursor.fetchone()[0]
+            handler.close_all()
+        return errors, value, journal_mode
+
+    def test_default_setup_fails_with_lock_errors(self):
+        errors, value, journal_mode = self._run({}, {})
+        self.assertEqual(journal_mode, 'delete')
+        self.assertGreater(errors, 0)
+        self.assertEqual(value, self.threads * self.iterations - errors)
+
+    def test_profile_serializes_writers_without_lock_errors(self):
+        errors, value, journal_mode = self._run(self.options, self.pragmas)
+        self.assertEqual(journal_mode, 'wal')
+        self.assertEqual(errors, 0)
+        self.assertEqual(value, self.threads * self.iterations)
+
+    def test_pragmas_are_validated(self):
+        self.assertEqual(pragma_statements({'synchronous': 'NORMAL', 'cache_size': -2048}),
+                         ['PRAGMA synchronous = NORMAL', 'PRAGMA cache_size = -2048'])
+        for pragmas in ({'journal_mode': 'WAL; DROP TABLE x'}, {'a b': 1}):
+            with self.assertRaises(ValueError):
+                pragma_statements(pragmas)
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    A second SQLite file stands in for a replica of the test database.
+    _replicate() copies the primary into it, like replication catching up.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Registered after the test runner has set up its databases
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings['replica'] = {
+            **connections['default'].settings_dict,
+            'NAME': os.path.join(cls.directory.name, 'replica.sqlite3'),
+        }
+        cls.databases = cls.databases | {'replica'}
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        override = override_settings(DATABASE_REPLICAS=['replica'])
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(username='reader')
+        self.other = User.objects.create_user(username='other')
+        SampleModel.objects.create(name='replicated', age=1)
+        self._replicate()
+        SampleModel.objects.create(name='lagging', age=2)
+
+    def _replicate(self):
+        for alias in ('default', 'replica'):
+            connections[alias].ensure_connection()
+        connections['default'].connection.backup(connections['replica'].connection)
+
+    def _auth(self, user):
+        return {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}'}
+
+    def _names(self, user):
+        response = self.client.get('/api/api/all', **self._auth(user))
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in json.loads(response.content)['results']]
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self._names(self.user), ['replicated'])
+        response = self.client.get('/api/account/', **self._auth(self.other))
+        self.assertEqual(response.status_code, 200)
+        # Outside a request everything reads from the primary
+        self.assertEqual(SampleModel.objects.count(), 2)
+
+    def test_users_read_their_own_writes(self):
+        response = self.client.post('/api/api/add', {'name': 'mine', 'age': 3},
+                                    content_type='application/json', **self._auth(self.user))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self._names(self.user), ['replicated', 'lagging', 'mine'])
+        self.assertEqual(self._names(self.other), ['replicated'])
+
+        cache.clear()  # the pin expires
+        self.assertEqual(self._names(self.user), ['replicated'])
+
+    def test_users_missing_from_replica_authenticate_on_primary(self):
+        newcomer = User.objects.create_user(username='newcomer')
+        response = self.client.get('/api/account/', **self._auth(newcomer))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(UserAccount.objects.filter(user=newcomer).exists())
+
+    def test_use_primary(self):
+        def count(request):
+            return JsonResponse({'count': SampleModel.objects.count()})
+
+        factory = RequestFactory()
+        for view, method, expected in (
+            (count, 'get', 1),
+            (use_primary(count), 'get', 2),
+            (count, 'post', 2),
+        ):
+            response = ReplicaRoutingMiddleware(view)(getattr(factory, method)('/'))
+            self.assertEqual(json.loads(response.content)['count'], expected, (view, method))
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(PrimaryReplicaRouter().allow_migrate('replica', 'api'))
+        self.assertIsNone(PrimaryReplicaRouter().allow_migrate('default', 'api'))
+
+
+def _jwk(kid, private_key):
+    numbers = private_key.public_key().public_numbers()
+
+    def b64(value):
+        raw = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+        return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+    return {'kty': 'RSA', 'alg': 'RS256', 'use': 'sig', 'kid': kid, 'n': b64(numbers.n), 'e': b64(numbers.e)}
+
+
+class _FakeResponse:
+    def __init__(self, status_code=200, payload=None, headers=None, text=''):
+        self.status_code = status_code
+        self._payload = payload
+        self.headers = headers or {}
+        self.text = text
+
+    def json(self):
+        return self._payload
+
+
+@override_settings(GOOGLE_CLIENT_ID='test-client', GOOGLE_JWKS_TTL=3600, GOOGLE_JWKS_MIN_REFRESH=60)
+class GoogleTokenVerificationTests(SimpleTestCase):
+    def setUp(self):
+        self.keys = {kid: rsa.generate_private_key(public_exponent=65537, key_size=2048)
+                     for kid in ('key-1', 'key-2', 'unpublished')}
+        self.published = ['key-1']
+        self.fetches = []
+        self.userinfo_calls = 0
+        google_auth.jwks_cache.clear()
+        cache.clear()
+        patcher = mock.patch.object(google_auth.http_client, 'get', side_effect=self._fake_get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(google_auth.jwks_cache.clear)
+
+    def _fake_get(self, url, **kwargs):
+        if url == google_auth.GOOGLE_JWKS_URL:
+            self.fetches.append(list(self.published))
+            return _FakeResponse(
+                payload={'keys': [_jwk(kid, self.keys[kid]) for kid in self.published]},
+                headers={'Cache-Control': 'public, max-age=600'},
+            )
+        self.userinfo_calls += 1
+        if kwargs['headers']['Authorization'] != 'Bearer good-access-token':
+            return _FakeResponse(401, text='invalid token')
+        return _FakeResponse(payload={'sub': '42', 'email': 'user@example.com'})
+
+    def _token(self, kid='key-1', **claims):
+        now = int(time.time())
+        payload = {
+            'iss': 'https://accounts.google.com', 'aud': 'test-client', 'sub': '42',
+            'email': 'user@example.com', 'iat': now, 'exp': now + 3600,
+        }
+        payload.update(claims)
+        signer = google_crypt.RSASigner.from_service_account_info({
+            'private_key': self.keys[kid].private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            ).decode('ascii'),
+            'private_key_id': kid,
+        })
+        return google_jwt.encode(signer, payload).decode('ascii')
+
+    def test_id_token_verified_locally_with_cached_keys(self):
+        for _ in range(3):
+            claims = google_auth.resolve_google_user(self._token())
+            self.assertEqual(claims['email'], 'user@example.com')
+        self.assertEqual(len(self.fetches), 1)
+        self.assertEqual(self.userinfo_calls, 0)
+
+    def test_keys_expire_after_cache_control_max_age(self):
+        google_auth.verify_id_token(self._token())
+        with mock.patch.object(google_auth.time, 'monotonic', return_value=time.monotonic() + 601):
+            google_auth.verify_id_token(self._token())
+        self.assertEqual(len(self.fetches), 2)
+
+    def test_unknown_kid_refetches_rotated_keys(self):
+        google_auth.verify_id_token(self._token('key-1'))
+        self.published = ['key-1', 'key-2']
+        later = time.monotonic() + 61
+        with mock.patch.object(google_auth.time, 'monotonic', return_value=later):
+            self.assertEqual(google_auth.verify_id_token(self._token('key-2'))['sub'], '42')
+            self.assertEqual(len(self.fetches), 2)
+
+            # A kid Google never published refetches at most once per interval
+            for _ in range(3):
+                with self.assertRaisesMessage(google_auth.GoogleTokenError, 'unknown signing key'):
+                    google_auth.verify_id_token(self._token('unpublished'))
+        self.assertEqual(len(self.fetches), 2)
+
+    def test_rejects_wrong_audience_issuer_expiry_and_signature(self):
+        now = int(time.time())
+        self.published = ['key-1', 'key-2']
+        bad_tokens = [
+            self._token(aud='someone-else'),
+            self._token(iss='https://evil.example.com'),
+            self._token(iat=now - 7200, exp=now - 3600),
+        ]
+        header, payload, _ = self._token('key-1').split('.')
+        bad_tokens.append('.'.join([header, payload, self._token('key-2').split('.')[2]]))
+        for token in bad_tokens:
+            with self.assertRaises(google_auth.GoogleTokenError):
+                google_auth.verify_id_token(token)
+
+    def test_access_token_userinfo_is_cached_by_hash(self):
+        for _ in range(3):
+            userinfo = google_auth.resolve_google_user('good-access-token')
+            self.assertEqual(userinfo['sub'], '42')
+        self.assertEqual(self.userinfo_calls, 1)
+        self.assertTrue(cache.get(google_auth._userinfo_cache_key('good-access-token')))
+
+        with self.assertRaisesMessage(google_auth.GoogleTokenError, 'Failed to get user info from Google'):
+            google_auth.resolve_google_user('revoked-access-token')
+        self.assertIsNone(cache.get(google_auth._userinfo_cache_key('revoked-access-token')))
+
+
+class GoogleLoginQueryBudgetTests(TestCase):
+    userinfo = {
+        'sub': 'google-42', 'email': 'new@example.com', 'given_name': 'Ada', 'family_name': 'Lovelace',
+    }
+
+    def setUp(self):
+        patcher = mock.patch.object(google_auth, 'resolve_google_user', side_effect=lambda token: dict(self.userinfo))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _login(self):
+        response = self.client.post('/api/auth/google/', {'token': 'token'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['user']
+
+    def test_new_user(self):
+        # user lookup, username scan, savepoint, user, account, social account, release
+        with self.assertNumQueries(7):
+            user = self._login()
+        self.assertEqual(user['username'], 'new@example.com')
+        self.assertEqual(UserAccount.objects.filter(user_id=user['id']).count(), 1)
+        self.assertEqual(SocialAccount.objects.filter(user_id=user['id'], uid='google-42').count(), 1)
+
+    def test_returning_user(self):
+        self._login()
+        # user + account lookup, social account update
+        with self.assertNumQueries(2):
+            self._login()
+
+        self.userinfo = dict(self.userinfo, family_name='King')
+        # ... plus an UPDATE of the changed name only
+        with self.assertNumQueries(3):
+            user = self._login()
+        self.assertEqual(user['last_name'], 'King')
+        self.assertEqual(User.objects.count(), 1)
+        self.assertEqual(SocialAccount.objects.get().extra_data['family_name'], 'King')
+
+    def test_many_username_collisions(self):
+        User.objects.bulk_create(
+            [User(username='new@example.com', email='other@example.com')]
+            + [User(username=f'new@example.com{i}', email=f'other{i}@example.com') for i in range(1, 50)]
+        )
+        with self.assertNumQueries(7):
+            user = self._login()
+        self.assertEqual(user['username'], 'new@example.com50')
+
+
+@override_settings(AUTH_USER_CACHE_TTL=60, AUTH_USER_CACHE_ALIAS=None)
+class CachedUserAuthenticationTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.user = User.objects.create_user(username='cached')
+        UserAccount.objects.create(user=self.user, account_value=Decimal('5.00'))
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def _get_account(self):
+        return self.client.get('/api/account/', **self.auth)
+
+    def test_user_lookup_is_cached(self):
+        # user + account
+        with self.assertNumQueries(2):
+            self.assertEqual(self._get_account().status_code, 200)
+        # account only
+        with self.assertNumQueries(1):
+            self.assertEqual(self._get_account().status_code, 200)
+
+    def test_hits_build_fresh_instances(self):
+        self._get_account()
+        first = user_cache.get(self.user.pk)
+        first.account  # caches the related account on this instance only
+        second = user_cache.get(self.user.pk)
+        self.assertIsNot(first, second)
+        self.assertFalse(second._state.fields_cache)
+        self.assertEqual((second.pk, second.username), (self.user.pk, 'cached'))
+
+    def test_save_and_delete_invalidate(self):
+        self._get_account()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self._get_account().status_code, 401)
+
+        self.user.is_active = True
+        self.user.save()
+        self.assertEqual(self._get_account().status_code, 200)
+        self.user.delete()
+        self.assertEqual(self._get_account().status_code, 401)
+
+    @override_settings(AUTH_USER_CACHE_ALIAS='default')
+    def test_shared_cache_backs_local_misses(self):
+        cache.clear()
+        self._get_account()
+        user_cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(self._get_account().status_code, 200)
+        self.user.save()
+        self.assertIsNone(cache.get(f'auth-user:{self.user.pk}'))
+
+    def test_password_is_not_cached(self):
+        with override_settings(AUTH_USER_CACHE_ALIAS='default'):
+            cache.clear()
+            self.user.set_password('correct horse battery staple')
+            self.user.save()
+            self._get_account()
+            version, (_, values) = cache.get(f'auth-user:{self.user.pk}')
+            user = user_cache.get(self.user.pk)
+        self.assertNotIn(self.user.password, values)
+        self.assertFalse(any(isinstance(value, str) and value.startswith('pbkdf2_') for value in values))
+
+        self.assertEqual(user.get_deferred_fields(), {'password', 'last_login'})
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password('correct horse battery staple'))
+
+    @override_settings(AUTH_USER_CACHE_ALIAS='default')
+    def test_invalidation_reaches_other_processes(self):
+        cache.clear()
+        self._get_account()
+
+        # Another worker deactivates the user: it shares the cache, but not this process's LRU
+        other_worker = UserCache()
+        with mock.patch('api.authentication.user_cache', other_worker):
+            self.user.is_active = False
+            self.user.save()
+        self.assertIsNotNone(user_cache._entries.get(str(self.user.pk)))
+        self.assertEqual(self._get_account().status_code, 401)
+
+        # Entries filled after the change are served locally again
+        with mock.patch('api.authentication.user_cache', other_worker):
+            self.user.is_active = True
+            self.user.save()
+        self.assertEqual(self._get_account().status_code, 200)
+        with self.assertNumQueries(1):
+            self.assertEqual(self._get_account().status_code, 200)
+
+
+# Run by test_scrape_merges_a_flushed_snapshot_from_another_process as a second worker
+OTHER_WORKER = r'''
+import sys
+import django
+django.setup()
+from api import metrics
+stats = metrics._RequestStats()
+stats.db_queries, stats.db_seconds = 3, 0.5
+metrics.registry.shard().observe('all_users', 'GET', '200', 0.2, stats)
+metrics.registry.flush(sys.argv[1])
+'''
+
+
+@override_settings(METRICS_TOKEN='scrape-token')
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+        user_cache.clear()
+        cache.clear()
+        self.user = User.objects.create_user(username='metrics')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def _scrape(self):
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def test_records_latency_and_queries_per_url_name(self):
+        self.assertEqual(self.client.get('/api/api/all', **self.auth).status_code, 200)
+        self.client.get('/api/api/all', **self.auth)
+        self.client.get('/no-such-page')
+
+        body = self._scrape()
+        self.assertIn('django_http_request_duration_seconds_count{view="all_users",method="GET",status="200"} 2', body)
+        # user + page, then nothing once the user and the response are cached
+        self.assertIn('django_http_request_db_queries_total{view="all_users"} 2', body)
+        self.assertIn('django_http_request_duration_seconds_bucket{view="all_users",method="GET",status="200",le="+Inf"} 2', body)
+        self.assertIn('django_http_request_duration_seconds_count{view="<unresolved>",method="GET",status="404"} 1', body)
+
+    def test_outbound_calls_are_attributed_to_the_view(self):
+        def resolve(token):
+            metrics.record_outbound('https://www.googleapis.com/oauth2/v3/userinfo', 0.25)
+            return {'sub': '1', 'email': 'm@example.com'}
+
+        with mock.patch.object(google_auth, 'resolve_google_user', side_effect=resolve):
+            self.client.post('/api/auth/google/', {'token': 't'}, content_type='application/json')
+        body = self._scrape()
+        self.assertIn('django_outbound_http_requests_total{view="google_login",host="www.googleapis.com"} 1', body)
+        self.assertIn('django_outbound_http_request_seconds_total{view="google_login",host="www.googleapis.com"} 0.25', body)
+
+    def test_scrape_merges_other_workers(self):
+        self.client.get('/api/api/all', **self.auth)
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            metrics.registry.flush(directory)
+            os.rename(os.path.join(directory, f'{os.getpid()}.json'), os.path.join(directory, '1.json'))
+            body = self._scrape()
+        self.assertIn('django_http_request_duration_seconds_count{view="all_users",method="GET",status="200"} 2', body)
+
+    def test_scrape_merges_a_flushed_snapshot_from_another_process(self):
+        self.client.get('/api/api/all', **self.auth)
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+            subprocess.run([sys.executable, '-c', OTHER_WORKER, directory], env=env, check=True,
+                           capture_output=True)
+            self.assertEqual(len(os.listdir(directory)), 1)
+            self.assertNotEqual(os.listdir(directory), [f'{os.getpid()}.json'])
+            body = self._scrape()
+        self.assertIn('django_http_request_duration_seconds_count{view="all_users",method="GET",status="200"} 2', body)
+        # 2 queries here (user + page) and 3 in the other worker
+        self.assertIn('django_http_request_db_queries_total{view="all_users"} 5', body)
+        self.assertIn('django_http_request_duration_seconds_bucket{view="all_users",method="GET",status="200",le="+Inf"} 2', body)
+
+    def test_scrape_requires_the_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong-token')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="metrics"')
+        self.assertNotIn(b'django_http_request', response.content)
+        self._scrape()
+
+    def test_without_a_token_only_debug_serves_metrics(self):
+        with override_settings(METRICS_TOKEN=None):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+            with override_settings(DEBUG=True):
+                self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+class SampleResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.user = User.objects.create_user(username='etag')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+        SampleModel.objects.create(name='first', age=1)
+        self.client.get('/api/account/', **self.auth)  # warm the user cache
+
+    def _get(self, etag=None, url='/api/api/all'):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(url, headers=headers, **self.auth)
+
+    def test_conditional_get_returns_304(self):
+        first = self._get()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['Cache-Control'], 'private, no-cache')
+        self.assertEqual(json.loads(first.content)['results'][0]['name'], 'first')
+        etag = first['ETag']
+        with self.assertNumQueries(0):
+            second = self._get(etag)
+            cached = self._get()
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second['ETag'], etag)
+        self.assertEqual(second.content, b'')
+        self.assertEqual((cached.status_code, cached.content), (200, first.content))
+        self.assertEqual(self._get(f'W/{etag}, "other"').status_code, 304)
+        self.assertEqual(self._get('"other"').status_code, 200)
+
+    def test_signals_invalidate(self):
+        original = self._get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            sample = SampleModel.objects.create(name='second', age=2)
+        response = self._get(original)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)['results']), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sample.delete()
+        response = self._get(response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)['results']), 1)
+        # The ETag is a hash of the body, so identical content revalidates again
+        self.assertEqual(response['ETag'], original)
+
+    def test_bulk_insert_invalidates(self):
+        etag = self._get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.client.post('/api/api/bulk', [{'name': 'bulk', 'age': 3}],
+                             content_type='application/json', **self.auth)
+        self.assertTrue(callbacks)
+        response = self._get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['name'] for row in json.loads(response.content)['results']], ['first', 'bulk'])
+
+    def test_shared_file_based_cache(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory},
+        }):
+            etag = self._get()['ETag']
+            self.assertTrue(os.listdir(directory))
+            self.assertEqual(self._get(etag).status_code, 304)
+            # Another worker writes without signals reaching this process:
+            # only the shared version token tells us
+            SampleModel.objects.bulk_create([SampleModel(name='elsewhere', age=4)])
+            self.assertEqual(self._get(etag).status_code, 304)
+            sample_list_cache.bump()
+            self.assertEqual(self._get(etag).status_code, 200)
+
+    def test_browsable_api_is_not_cached(self):
+        response = self.client.get('/api/api/all', HTTP_ACCEPT='text/html', **self.auth)
+        self.assertNotIn('ETag', response)
+
+
+class FastSerializationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.user = User.objects.create_user(username='fast')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+        names = ['plain', 'ünïcode ✓', 'quote " and \\ backslash', 'line\u2028separator', '', '😀' * 10]
+        SampleModel.objects.bulk_create([SampleModel(name=name, age=i * 7) for i, name in enumerate(names)])
+        for i, amount in enumerate(['0.00', '1.5', '12345678.90', '9.99', '100']):
+            PaymentTransaction.objects.create(user=self.user, transaction_id=f'fast-{i}', amount=Decimal(amount),
+                                              status=('completed', 'pending')[i % 2])
+        # Microseconds and a naive-looking value in the past
+        PaymentTransaction.objects.filter(transaction_id='fast-0').update(
+            created_at=datetime.datetime(2024, 2, 29, 23, 59, 59, 123456, tzinfo=datetime.timezone.utc))
+
+    def _pairs(self):
+        return [
+            (sample_values, SampleSerializer, SampleModel.objects.order_by('id')),
+            (payment_transaction_values, PaymentTransactionSerializer, PaymentTransaction.objects.order_by('-id')),
+        ]
+
+    def test_values_match_serializers_byte_for_byte(self):
+        for zone in ('UTC', 'Asia/Kolkata', 'America/New_York'):
+            with timezone.override(zone):
+                for values, serializer_class, queryset in self._pairs():
+                    expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+                    fast = FastJSONRenderer().render(values.to_representation(values.rows(queryset)))
+                    self.assertEqual(fast, expected, (zone, serializer_class.__name__))
+
+    def test_list_endpoints_are_byte_identical(self):
+        for url, serializer_class, queryset in (
+            ('/api/api/all?page_size=2', SampleSerializer, SampleModel.objects.order_by('id')),
+            ('/api/payments/history/?page_size=2', PaymentTransactionSerializer,
+             PaymentTransaction.objects.order_by('-created_at', '-id')),
+        ):
+            seen = []
+            while url:
+                response = self.client.get(url, **self.auth)
+                self.assertEqual(response.status_code, 200)
+                page = json.loads(response.content)
+                results = [serializer_class(queryset.get(id=row['id'])).data for row in page['results']]
+                expected = JSONRenderer().render({'next': page['next'], 'previous': page['previous'],
+                                                  'results': results})
+                self.assertEqual(response.content, expected)
+                seen += [row['id'] for row in page['results']]
+                url = page['next']
+            self.assertEqual(seen, list(queryset.values_list('id', flat=True)))
+
+    def test_renderer_falls_back_for_non_native_data(self):
+        data = {
+            'detail': ErrorDetail('Invalid cursor', code='not_found'),
+            'amount': Decimal('1.10'),
+            'when': datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc),
+            'text': 'a\u2029b',
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(data, 'application/json; indent=4'),
+                         JSONRenderer().render(data, 'application/json; indent=4'))
+
+    def test_rejects_serializers_that_are_not_plain_columns(self):
+        with self.assertRaises(ImproperlyConfigured):
+            ValuesSerializer(UserWithAccountSerializer).columns
+
+
+class SampleSearchTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(username='search')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+        rows = [('Alice', 30), ('alicia', 25), ('Alina', 41), ('Bob', 30), ('Malice', 52), ('Zoë', 19), ('Al', 64)]
+        SampleModel.objects.bulk_create([SampleModel(name=name, age=age) for name, age in rows])
+
+    def _search(self, **params):
+        response = self.client.get('/api/api/search', params, **self.auth)
+        self.assertEqual(response.status_code, 200, response.content)
+        return json.loads(response.content)
+
+    def _names(self, **params):
+        return [row['name'] for row in self._search(**params)['results']]
+
+    def test_prefix_is_a_case_sensitive_range(self):
+        self.assertEqual(self._names(q='Al'), ['Al', 'Alice', 'Alina'])
+        self.assertEqual(self._names(q='ali'), ['alicia'])
+        self.assertEqual(self._names(q='Ali', ordering='-name'), ['Alina', 'Alice'])
+        self.assertEqual(search.prefix_upper_bound('Al'), 'Am')
+        self.assertEqual(search.prefix_upper_bound('a\U0010ffff'), 'b')
+        self.assertEqual(search.prefix_upper_bound('\ud7ff'), '\ue000')
+        self.assertIsNone(search.prefix_upper_bound('\U0010ffff'))
+
+    def test_contains_uses_fts_and_follows_writes(self):
+        self.assertTrue(search.fts_available('default'))
+        self.assertEqual(self._names(q='lic', match='contains'), ['Alice', 'Malice', 'alicia'])  # binary order
+        # Too short for trigrams: falls back to icontains
+        self.assertEqual(self._names(q='ë', match='contains'), ['Zoë'])
+        # FTS5 syntax is matched literally
+        self.assertEqual(self._names(q='lic OR Bob', match='contains'), [])
+        self.assertEqual(self._names(q='"', match='contains'), [])
+
+        SampleModel.objects.filter(name='Malice').update(name='Mallory')
+        SampleModel.objects.filter(name='alicia').delete()
+        SampleModel.objects.create(name='Felicity', age=33)
+        self.assertEqual(self._names(q='lic', match='contains'), ['Alice', 'Felicity'])
+
+    def test_age_range_and_ordering(self):
+        self.assertEqual(self._names(age_min=25, age_max=41), ['Alice', 'alicia', 'Alina', 'Bob'])
+        self.assertEqual(self._names(age_min=30, age_max=30, ordering='-id'), ['Bob', 'Alice'])
+        self.assertEqual(self._names(q='Al', age_max=40), ['Alice'])
+        self.assertEqual(self._names(ordering='age'), ['Zoë', 'alicia', 'Alice', 'Bob', 'Alina', 'Malice', 'Al'])
+
+    def test_cursor_pagination(self):
+        for ordering in search.ORDERINGS:
+            expected = self._names(ordering=ordering)
+            seen, url = [], f'/api/api/search?ordering={ordering}&page_size=2'
+            while url:
+                page = json.loads(self.client.get(url, **self.auth).content)
+                seen += [row['name'] for row in page['results']]
+                url = page['next']
+            self.assertEqual(seen, expected, ordering)
+
+    def test_invalid_parameters(self):
+        for params in ({'age_min': 'old'}, {'ordering': 'created_at'}, {'match': 'regex'},
+                       {'age_min': 50, 'age_max': 10}, {'q': 'x' * 151}):
+            response = self.client.get('/api/api/search', params, **self.auth)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_query_plans_use_indexes(self):
+        def plan(queryset):
+            return queryset.explain()
+
+        queryset = search.search_samples('default', q='Al')
+        self.assertIn('api_sample_name_id_idx', plan(queryset.order_by('name', 'id')))
+        queryset = search.search_samples('default', age_min=20, age_max=40)
+        self.assertIn('api_sample_age_id_idx', plan(queryset.order_by('age', 'id')))
+        queryset = search.search_samples('default', q='lic', match='contains')
+        self.assertIn('VIRTUAL TABLE INDEX', plan(queryset.order_by('name', 'id')))
+        for queryset in (search.search_samples('default', q='Al').order_by('name', 'id'),
+                         search.search_samples('default', age_min=20).order_by('age', 'id')):
+            self.assertNotIn('TEMP B-TREE', plan(queryset))
+
+
+class PaymentRollupTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(username='rollup')
+        self.other = User.objects.create_user(username='rollup-other')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def _create(self, user, transaction_id, amount, day=None, currency='CAD'):
+        transaction = rollups.create_transaction(user=user, transaction_id=transaction_id,
+                                                 amount=Decimal(amount), currency=currency)
+        if day is not None:
+            # Backdate both the transaction and its bucket
+            created_at = datetime.datetime(*day, 12, tzinfo=datetime.timezone.utc)
+            PaymentRollup.objects.filter(user=user, day=rollups.day_of(transaction.created_at)).delete()
+            PaymentTransaction.objects.filter(pk=transaction.pk).update(created_at=created_at)
+            transaction.created_at = created_at
+            rollups.record_created(transaction)
+        return transaction
+
+    def _snapshot(self):
+        return sorted(PaymentRollup.objects.filter(count__gt=0).values_list(
+            'user_id', 'day', 'currency', 'status', 'count', 'amount'))
+
+    def _stats(self, **params):
+        response = self.client.get('/api/payments/stats/', params, **self.auth)
+        self.assertEqual(response.status_code, 200, response.content)
+        return json.loads(response.content)['results']
+
+    def test_transitions_move_between_buckets(self):
+        self._create(self.user, 'r-1', '10.00', day=(2026, 1, 1))
+        self._create(self.user, 'r-2', '2.50', day=(2026, 1, 1))
+        self._create(self.user, 'r-3', '7.25', day=(2026, 1, 2), currency='USD')
+        self._create(self.other, 'r-4', '100.00', day=(2026, 1, 1))
+        webhooks.apply_event('order_created', 'r-1', {})
+        webhooks.apply_event('order_paid', 'r-1', {})
+        webhooks.apply_event('order_paid', 'r-1', {})  # replay
+        webhooks.apply_event('order_paid', 'r-3', {})  # straight from pending
+
+        self.assertEqual(self._stats(), [
+            {'currency': 'CAD', 'status': 'completed', 'count': 1, 'amount': '10.00'},
+            {'currency': 'CAD', 'status': 'pending', 'count': 1, 'amount': '2.50'},
+            {'currency': 'USD', 'status': 'completed', 'count': 1, 'amount': '7.25'},
+        ])
+        self.assertEqual(self._stats(group_by='day', start='2026-01-02'), [
+            {'day': '2026-01-02', 'count': 1, 'amount': '7.25'},
+        ])
+        self.assertEqual(self._stats(group_by='status,day', end='2026-01-01'), [
+            {'status': 'completed', 'day': '2026-01-01', 'count': 1, 'amount': '10.00'},
+            {'status': 'pending', 'day': '2026-01-01', 'count': 1, 'amount': '2.50'},
+        ])
+
+        # The incremental rollups match a rebuild from scratch
+        incremental = self._snapshot()
+        call_command('rebuild_payment_rollups', stdout=io.StringIO())
+        self.assertEqual(self._snapshot(), incremental)
+
+    def test_create_payment_intent_counts_pending(self):
+        product_catalog._publish([{'id': 'credits', 'name': 'Credits', 'slug': 'credits', 'price': '$12.00',
+                                   'by_now_url': 'https://example.com/checkout'}])
+        self.addCleanup(product_catalog.invalidate)
+        response = self.client.post('/api/payments/create/', {'product_id': 'credits'},
+                                    content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self._stats(), [{'currency': 'CAD', 'status': 'pending', 'count': 1, 'amount': '12.00'}])
+
+    def test_stats_read_only_rollups(self):
+        for i in range(20):
+            self._create(self.user, f'q-{i}', '1.00')
+        with self.assertNumQueries(1):
+            rows = list(rollups.totals(['day', 'currency', 'status'], user=self.user))
+        self.assertEqual(len(rows), 1)
+        sql = str(rollups.totals(['day'], user=self.user).query)
+        self.assertNotIn('api_paymenttransaction', sql)
+
+    def test_rebuild_repairs_drift(self):
+        self._create(self.user, 'd-1', '5.00')
+        PaymentTransaction.objects.bulk_create([
+            PaymentTransaction(user=self.user, transaction_id='d-2', amount=Decimal('3.00'), status='failed')
+        ])
+        PaymentRollup.objects.update(amount=Decimal('999.00'))
+        call_command('rebuild_payment_rollups', stdout=io.StringIO())
+        self.assertEqual(self._stats(group_by='status'), [
+            {'status': 'failed', 'count': 1, 'amount': '3.00'},
+            {'status': 'pending', 'count': 1, 'amount': '5.00'},
+        ])
+
+    def test_permissions_and_parameters(self):
+        self._create(self.other, 'p-1', '4.00')
+        self.assertEqual(self._stats(), [])
+        response = self.client.get('/api/payments/stats/', {'group_by': 'user'}, **self.auth)
+        self.assertEqual(response.status_code, 403)
+        for params in ({'group_by': 'amount'}, {'group_by': 'day,day'}, {'group_by': ','},
+                       {'start': '2026-02-01', 'end': '2026-01-01'}, {'start': 'yesterday'}):
+            response = self.client.get('/api/payments/stats/', params, **self.auth)
+            self.assertEqual(response.status_code, 400, params)
+
+        self.user.is_staff = True
+        self.user.save()
+        user_cache.clear()
+        self.assertEqual(self._stats(group_by='user'), [{'user': self.other.pk, 'count': 1, 'amount': '4.00'}])
+
+
+class PaymentRetentionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='retention')
+        self.now = timezone.now()
+
+    def _create(self, transaction_id, age, status='pending', amount='1.00'):
+        transaction = PaymentTransaction.objects.create(user=self.user, transaction_id=transaction_id,
+                                                        amount=Decimal(amount), currency='CAD', status=status)
+        # Backdate, then count it in the bucket of its new day
+        transaction.created_at = self.now - age
+        PaymentTransaction.objects.filter(pk=transaction.pk).update(created_at=transaction.created_at)
+        rollups.record_created(transaction)
+        return transaction
+
+    def _rollups(self):
+        return [(row['status'], row['count'], row['amount']) for row in rollups.totals(['status'])]
+
+    def _archive(self, *args):
+        out = io.StringIO()
+        call_command('archive_payments', '--pending-ttl=3600', '--archive-after=30', *args, stdout=out)
+        return out.getvalue()
+
+    def test_expires_and_archives_in_chunks(self):
+        for i in range(5):
+            self._create(f'stale-{i}', datetime.timedelta(hours=2))
+        self._create('fresh', datetime.timedelta(minutes=5))
+        paid = self._create('old-paid', datetime.timedelta(days=40), status='completed', amount='9.00')
+        webhooks.credit_balance(paid)
+        failed = self._create('old-failed', datetime.timedelta(days=40), status='failed')
+        self._create('recent-paid', datetime.timedelta(days=2), status='completed')
+        abandoned = self._create('old-pending', datetime.timedelta(days=40))
+        before = self._rollups()
+
+        output = self._archive('--dry-run')
+        self.assertIn('6 pending payment(s) would be expired and 3 archived', output)
+        self.assertEqual(PaymentTransaction.objects.filter(status='pending').count(), 7)
+
+        output = self._archive('--chunk-size=2')
+        self.assertIn('Expired 2/6', output)
+        self.assertIn('Archived 3/3', output)
+        self.assertIn('Done: expired=6 archived=3', output)
+        self.assertEqual(
+            sorted(PaymentTransaction.objects.values_list('transaction_id', 'status')),
+            [('fresh', 'pending'), ('recent-paid', 'completed')]
+            + [(f'stale-{i}', 'expired') for i in range(5)],
+        )
+        self.assertEqual(
+            sorted(ArchivedPaymentTransaction.objects.values_list('id', 'transaction_id', 'status', 'amount')),
+            [
+                (paid.pk, 'old-paid', 'completed', Decimal('9.00')),
+                (failed.pk, 'old-failed', 'failed', Decimal('1.00')),
+                (abandoned.pk, 'old-pending', 'expired', Decimal('1.00')),
+            ],
+        )
+        self.assertEqual(BalanceLedgerEntry.objects.get().amount, Decimal('9.00'))
+
+        # Expiry moved the rollups; archiving kept them, and a rebuild agrees
+        after = self._rollups()
+        self.assertEqual(after, [
+            ('completed', 2, Decimal('10.00')), ('expired', 6, Decimal('6.00')),
+            ('failed', 1, Decimal('1.00')), ('pending', 1, Decimal('1.00')),
+        ])
+        self.assertEqual(sum(count for _, count, _ in after), sum(count for _, count, _ in before))
+        rollups.rebuild()
+        self.assertEqual(self._rollups(), after)
+
+        self.assertIn('Done: expired=0 archived=0', self._archive())
+
+    def test_late_payment_completes_expired_transaction(self):
+        self._create('late', datetime.timedelta(hours=2), amount='4.00')
+        self.assertEqual(retention.expire_chunk(self.now - datetime.timedelta(hours=1), 10), 1)
+        webhooks.apply_event('order_paid', 'late', {})
+        self.assertEqual(PaymentTransaction.objects.get().status, 'completed')
+        self.assertEqual(UserAccount.objects.get(user=self.user).account_value, Decimal('4.00'))
+        self.assertEqual(self._rollups(), [('completed', 1, Decimal('4.00'))])
+
+    def test_late_payment_restores_archived_transaction(self):
+        expired = self._create('late-archived', datetime.timedelta(days=40), amount='4.00')
+        self._create('paid-archived', datetime.timedelta(days=40), status='completed', amount='2.00')
+        self._archive()
+        self.assertFalse(PaymentTransaction.objects.exists())
+
+        webhooks.apply_event('order_paid', 'late-archived', {})
+        restored = PaymentTransaction.objects.get()
+        self.assertEqual((restored.pk, restored.status), (expired.pk, 'completed'))
+        self.assertEqual(restored.created_at, expired.created_at)
+        self.assertEqual(list(ArchivedPaymentTransaction.objects.values_list('transaction_id', flat=True)),
+                         ['paid-archived'])
+        self.assertEqual(UserAccount.objects.get(user=self.user).account_value, Decimal('4.00'))
+        self.assertEqual(self._rollups(), [('completed', 2, Decimal('6.00'))])
+
+        # Replays for archived transactions are acknowledged, not retried
+        webhooks.apply_event('order_paid', 'paid-archived', {})
+        webhooks.apply_event('order_created', 'paid-archived', {})
+        self.assertEqual(UserAccount.objects.get(user=self.user).account_value, Decimal('4.00'))
+        self.assertEqual(ArchivedPaymentTransaction.objects.count(), 1)
+        with self.assertRaises(webhooks.WebhookRetryableError):
+            webhooks.apply_event('order_paid', 'unknown', {})
+
+    def test_chunks_use_the_status_index(self):
+        cutoff = self.now
+        for queryset in (retention.stale_pending(cutoff)[:500], retention.archivable(cutoff)[:500]):
+            sql, params = queryset.values('id').query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = ' '.join(row[-1] for row in cursor.fetchall())
+            self.assertIn('api_payment_status_created_idx', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+
+@override_settings(LEMON_SQUEEZY_SIGNING_SECRET='test-secret')
+class QueryPlanTests(TestCase):
+    """
+    Run every endpoint in api/urls.py on a seeded data set, EXPLAIN QUERY PLAN
+    each statement it issued and fail on full scans of large tables or on
+    temp B-tree sorts. An ordered scan with a LIMIT and no WHERE (the first
+    keyset page) stops early and is allowed.
+    """
+    LARGE_TABLES = ('api_samplemodel', 'api_paymenttransaction', 'api_paymentrollup', 'api_webhookevent',
+                    'api_balanceledgerentry', 'api_useraccount', 'auth_user', 'socialaccount_socialaccount')
+    # Deliberate exceptions: {url name: {plan detail prefix: reason}}
+    ALLOWED = {
+        'export_samples': {'SCAN api_samplemodel': 'streams the whole table'},
+        'search_users': {
+            'SCAN api_samplemodel': 'contains searches under 3 characters fall back to icontains',
+            'USE TEMP B-TREE FOR ORDER BY': 'sorts only the rows FTS5 matched',
+        },
+        'payment_stats': {'USE TEMP B-TREE FOR GROUP BY': "groups one user's rollup buckets (O(days))"},
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='planner', email='planner@example.com')
+        UserAccount.objects.create(user=cls.user, account_value=Decimal('0.00'))
+        SocialAccount.objects.create(user=cls.user, provider='google', uid='planner-sub', extra_data={})
+        users = User.objects.bulk_create([User(username=f'plan-{i}', email=f'plan-{i}@example.com') for i in range(50)])
+        SampleModel.objects.bulk_create([SampleModel(name=f'sample-{i}', age=i % 90) for i in range(300)])
+        for i in range(60):
+            rollups.create_transaction(user=cls.user if i % 2 else users[i % 50], transaction_id=f'plan-{i}',
+                                       amount=Decimal('3.00'))
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+        product_catalog._publish([{'id': 'plan', 'name': 'Plan', 'slug': 'plan', 'price': '$5.00',
+                                   'by_now_url': 'https://example.com/checkout'}])
+        self.addCleanup(product_catalog.invalidate)
+
+    def _cursor(self, url):
+        return json.loads(self.client.get(url, **self.auth).content)['next']
+
+    def _webhook(self):
+        body = json.dumps({'meta': {'event_name': 'order_paid', 'custom_data': {'transaction_id': 'plan-1'}}})
+        signature = hmac.new(b'test-secret', body.encode('utf-8'), hashlib.sha256).hexdigest()
+        response = self.client.post('/api/webhooks/lemonsqueezy/', body, content_type='application/json',
+                                    headers={'X-Signature': signature})
+        webhooks.process_batch()
+        return response
+
+    def _google_login(self, email):
+        userinfo = {'sub': f'{email}-sub', 'email': email, 'given_name': 'Plan', 'family_name': 'Ner'}
+        with mock.patch.object(google_auth, 'resolve_google_user', return_value=userinfo):
+            return self.client.post('/api/auth/google/', {'token': 'x'}, content_type='application/json')
+
+    def _requests(self):
+        """
+        {url name: [callables issuing the endpoint's requests]}.
+        """
+        get = lambda url: lambda: self.client.get(url, **self.auth)
+        post = lambda url, data: lambda: self.client.post(url, data, content_type='application/json', **self.auth)
+        return {
+            'root_view': [get('/api/')],
+            'add_user': [post('/api/api/add', {'name': 'planned', 'age': 3})],
+            'add_users_bulk': [post('/api/api/bulk', [{'name': f'b-{i}', 'age': i} for i in range(3)])],
+            'all_users': [get('/api/api/all'), lambda: self.client.get(self._cursor('/api/api/all'), **self.auth)],
+            'search_users': [
+                get(f'/api/api/search?{query}') for query in (
+                    'q=sample-1', 'q=sample-1&ordering=-name', 'q=ple-2&match=contains', 'q=e-&match=contains',
+                    'age_min=10&age_max=20&ordering=age', 'age_min=10&ordering=-age', 'ordering=-id',
+                )
+            ] + [lambda: self.client.get(self._cursor('/api/api/search?q=sample&page_size=5'), **self.auth)],
+            'export_samples': [get('/api/api/export')],
+            'google_login': [lambda: self._google_login('planner@example.com'),
+                             lambda: self._google_login('newcomer@example.com')],
+            'user_account': [get('/api/account/')],
+            'create_payment': [post('/api/payments/create/', {'product_id': 'plan'})],
+            'payment_history': [get('/api/payments/history/'),
+                                lambda: self.client.get(self._cursor('/api/payments/history/?page_size=5'),
+                                                        **self.auth)],
+            'payment_stats': [get('/api/payments/stats/?group_by=day,status&start=2020-01-01')],
+            'export_payments': [get('/api/payments/export/')],
+            'lemon_squeezy_webhook': [self._webhook],
+            'get_products': [get('/api/payments/products/')],
+        }
+
+    def _plans(self, fn):
+        statements = []
+
+        def capture(execute, sql, params, many, context):
+            if not many and sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'WITH')):
+                statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            response = fn()
+            if getattr(response, 'streaming', False):
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400, response)
+        plans = []
+        with connection.cursor() as cursor:
+            for sql, params in statements:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plans.append((sql, [row[3] for row in cursor.fetchall()]))
+        return plans
+
+    def _problems(self, sql, details, allowed):
+        bounded = ' LIMIT ' in sql and ' WHERE ' not in sql
+        for detail in details:
+            if any(detail.startswith(prefix) for prefix in allowed):
+                continue
+            if 'TEMP B-TREE' in detail:
+                yield detail
+            elif detail.startswith('SCAN ') and detail.split()[1] in self.LARGE_TABLES and not bounded:
+                yield detail
+
+    def test_every_endpoint_is_covered(self):
+        names = {pattern.name for pattern in api_urls.urlpatterns}
+        self.assertEqual(names, set(self._requests()))
+
+    def test_no_full_scans_or_temp_sorts(self):
+        for name, calls in self._requests().items():
+            for call in calls:
+                for sql, details in self._plans(call):
+                    problems = list(self._problems(sql, details, self.ALLOWED.get(name, {})))
+                    with self.subTest(endpoint=name, sql=sql):
+                        self.assertEqual(problems, [])
+
+
+class BenchmarkCommandTests(TestCase):
+    def _run(self, *args):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            try:
+                call_command('benchmark', '--samples', '20', '--users', '2', '--transactions', '10',
+                             '--iterations', '3', '--warmup', '1', '--output', output, *args,
+                             stdout=io.StringIO())
+            finally:
+                with open(output) as f:
+                    self.results = json.load(f)
+        return self.results
+
+    def test_reports_every_benchmark_and_rolls_back(self):
+        results = self._run()
+        self.assertIn('view.all_samples', results['benchmarks'])
+        self.assertIn('webhook.process_event', results['benchmarks'])
+        for stats in results['benchmarks'].values():
+            self.assertEqual(
+                set(stats),
+                {'iterations', 'ops_per_sec', 'mean_ms', 'p50_ms', 'p99_ms', 'queries_per_op', 'peak_memory_kb'},
+            )
+        self.assertFalse(SampleModel.objects.exists())
+        self.assertFalse(User.objects.exists())
+
+    def test_baseline_regressions_fail_the_run(self):
+        baseline = {'benchmarks': {
+            'view.user_account': {'p50_ms': 1e-6, 'queries_per_op': 0},
+        }}
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(baseline, f)
+        self.addCleanup(os.unlink, f.name)
+        with self.assertRaisesMessage(CommandError, '2 regression(s)'):
+            self._run('--only', 'view.user_account', '--baseline', f.name)
+        self.assertEqual(list(self.results['benchmarks']), ['view.user_account'])
+
+
+@override_settings(ADMISSION_CONTROL={
+    'outbound': {'views': ['get_products'], 'limit': 1, 'queue': 1, 'timeout': 0.2, 'retry_after': 7},
+    'exports': {'views': ['export_samples'], 'limit': 1},
+})
+class AdmissionControlTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(username='bulkhead')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def test_bulkhead_queue_and_timeout(self):
+        bulkhead = admission.Bulkhead('test', limit=1, queue=1, timeout=5)
+        self.assertTrue(bulkhead.acquire())
+        with ThreadPoolExecutor(1) as pool:
+            queued = pool.submit(bulkhead.acquire)
+            while bulkhead.stats()['waiting'] == 0:
+                time.sleep(0.001)
+            # Queue full: shed without waiting
+            started = time.monotonic()
+            self.assertFalse(bulkhead.acquire())
+            self.assertLess(time.monotonic() - started, 1)
+            bulkhead.release()
+            self.assertTrue(queued.result())
+        self.assertEqual(bulkhead.stats(), {'limit': 1, 'queue': 1, 'active': 1, 'waiting': 0,
+                                            'admitted': 2, 'rejected': 1})
+        bulkhead.timeout = 0.05
+        self.assertFalse(bulkhead.acquire())  # waited, timed out
+        self.assertEqual(bulkhead.stats()['rejected'], 2)
+
+    def test_slow_dependency_is_isolated(self):
+        entered, proceed = threading.Event(), threading.Event()
+
+        def slow_products():
+            entered.set()
+            proceed.wait(5)
+            return []
+
+        with mock.patch('api.views.get_product_list', side_effect=slow_products), \
+                ThreadPoolExecutor(1) as pool:
+            stuck = pool.submit(lambda: Client().get('/api/payments/products/').status_code)
+            self.assertTrue(entered.wait(5))
+
+            shed = self.client.get('/api/payments/products/')
+            self.assertEqual(shed.status_code, 503)
+            self.assertEqual(shed['Retry-After'], '7')
+            # Other endpoints are not held up by the saturated group
+            self.assertEqual(self.client.get('/api/account/', **self.auth).status_code, 200)
+            with self.settings(METRICS_TOKEN='scrape-token'):
+                body = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token').content.decode()
+            self.assertIn('django_admission_active_requests{group="outbound"} 1', body)
+            self.assertIn('django_admission_rejected_total{group="outbound"} 1', body)
+
+            proceed.set()
+            self.assertEqual(stuck.result(), 200)
+            self.assertEqual(self.client.get('/api/payments/products/').status_code, 200)
+        self.assertEqual(admission.bulkheads.stats()['outbound']['active'], 0)
+
+    def test_streaming_response_holds_its_slot(self):
+        first = self.client.get('/api/api/export', **self.auth)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.client.get('/api/api/export', **self.auth).status_code, 503)
+        b''.join(first.streaming_content)
+        first.close()
+        second = self.client.get('/api/api/export', **self.auth)
+        self.assertEqual(second.status_code, 200)
+        second.close()  # closed before streaming: still released
+        self.assertEqual(admission.bulkheads.stats()['exports']['active'], 0)
+
+
+class OpenAPISchemaTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(frontend.file_cache.clear)
+        self.directory = directory.name
+        self.live = mock.Mock(return_value=JsonResponse({'live': True}))
+        self.view = openapi.precomputed(self.live)
+        self.factory = RequestFactory()
+
+    def _generate(self):
+        call_command('generate_openapi_schema', '--output-dir', self.directory, stdout=io.StringIO())
+
+    def test_command_writes_every_format(self):
+        self._generate()
+        with open(os.path.join(self.directory, 'swagger.json')) as f:
+            schema = json.load(f)
+        self.assertIn('/api/api/search', schema['paths'])
+        self.assertNotIn('host', schema)
+        with open(os.path.join(self.directory, 'swagger.yaml')) as f:
+            self.assertIn('\n  /api/api/search:\n', f.read())
+
+    def test_serves_precomputed_schema_with_etag(self):
+        self._generate()
+        with override_settings(OPENAPI_SCHEMA_DIR=self.directory, OPENAPI_SCHEMA_MAX_AGE=600):
+            response = self.view(self.factory.get('/swagger.json/'), format='.json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Cache-Control'], 'public, max-age=600')
+            self.assertIn('/api/api/search', json.loads(response.content)['paths'])
+            etag = response['ETag']
+
+            revalidated = self.view(self.factory.get('/swagger.json/', HTTP_IF_NONE_MATCH=etag), format='.json')
+            self.assertEqual(revalidated.status_code, 304)
+            # The spec request made by the Swagger UI and ReDoc pages
+            spec = self.view(self.factory.get('/swagger/', {'format': 'openapi'}))
+            self.assertEqual(spec['ETag'], etag)
+            yaml = self.view(self.factory.get('/swagger.yaml/'), format='.yaml')
+            self.assertEqual(yaml['Content-Type'], 'application/yaml')
+            with self.assertRaises(Http404):
+                self.view(self.factory.get('/swagger.xml/'), format='.xml')
+        self.live.assert_not_called()
+
+        # The UI pages do not introspect the API and stay live
+        self.view(self.factory.get('/swagger/'))
+        self.live.assert_called_once()
+
+    def test_live_generation_only_in_debug(self):
+        with override_settings(OPENAPI_SCHEMA_DIR=self.directory):
+            with override_settings(DEBUG=True):
+                response = self.view(self.factory.get('/swagger.json/'), format='.json')
+                self.assertEqual(json.loads(response.content), {'live': True})
+            with override_settings(DEBUG=False), self.assertLogs('api.openapi', 'ERROR'):
+                with self.assertRaises(Http404):
+                    self.view(self.factory.get('/swagger.json/'), format='.json')
+
+
+class StartupProfileTests(SimpleTestCase):
+    # Only the views that call Google or Lemon Squeezy need these
+    DEFERRED = ('api.google_auth', 'api.http_client', 'google.auth', 'httpx')
+
+    def _profile(self, *args):
+        out = io.StringIO()
+        call_command('profile_startup', '--json', *args, stdout=out)
+        return json.loads(out.getvalue())
+
+    def test_first_response_skips_outbound_clients(self):
+        report = self._profile()
+        self.assertEqual(report['status'], 200)
+        self.assertIn('api.views', report['modules'])
+        self.assertEqual([module for module in self.DEFERRED if module in report['modules']], [])
+        self.assertGreater(report['packages']['django']['modules'], 0)
+        self.assertGreater(report['boot_ms'], 0)
+
+    def test_budget(self):
+        with self.assertRaisesMessage(CommandError, 'over the 1.0 ms budget'):
+            self._profile('--budget-ms', '1')
+
+    def test_parse_importtime(self):
+        packages, other = parse_importtime(
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   django.utils\n"
+            "import time:        30 |        150 | django\n"
+            "import time:         5 |          5 | api\n"
+            "Traceback (most recent call last):\n"
+        )
+        self.assertEqual(packages, {'django': {'self_us': 150, 'modules': 2}, 'api': {'self_us': 5, 'modules': 1}})
+        self.assertEqual(other, ['Traceback (most recent call last):'])
+
+
+class FrontendServingTests(SimpleTestCase):
+    index = b'<!doctype html><html><head><title>App</title></head><body>' + b'<div id="root"></div>' * 40 + b'</body></html>'
+
+    def setUp(self):
+        self.build = tempfile.TemporaryDirectory()
+        self.addCleanup(self.build.cleanup)
+        os.makedirs(os.path.join(self.build.name, 'static', 'js'))
+        self._write('index.html', self.index)
+        self._write('static/js/main.3f2a1b9c.js', b'console.log("app");' * 50)
+        self._write('static/js/config.js', b'window.CONFIG = {};' * 50)
+        frontend.file_cache.clear()
+        self.addCleanup(frontend.file_cache.clear)
+        settings = override_settings(SERVE_UI=True, FRONTEND_BUILD_DIR=self.build.name, FRONTEND_RELOAD_INTERVAL=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def _write(self, name, body, mtime=None):
+        path = os.path.join(self.build.name, name)
+        with open(path, 'wb') as f:
+            f.write(body)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def test_index_is_served_from_memory_with_etag(self):
+        response = self.client.get('/api/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.index)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        etag = response['ETag']
+
+        with mock.patch('builtins.open', side_effect=AssertionError('read from disk')):
+            self.assertEqual(self.client.get('/api/').content, self.index)
+            not_modified = self.client.get('/api/', headers={'If-None-Match': etag})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], etag)
+
+    def test_precompressed_variants(self):
+        index = os.path.join(self.build.name, 'index.html')
+        self._write('index.html.br', b'fake brotli body', mtime=os.stat(index).st_mtime + 1)
+        response = self.client.get('/api/', headers={'Accept-Encoding': 'gzip, deflate, br'})
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response.content, b'fake brotli body')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        response = self.client.get('/api/', headers={'Accept-Encoding': 'gzip, br;q=0'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.index)
+        self.assertNotEqual(response['ETag'], self.client.get('/api/')['ETag'])
+
+    def test_reloads_when_mtime_changes(self):
+        first = self.client.get('/api/')
+        stat = os.stat(os.path.join(self.build.name, 'index.html'))
+        self._write('index.html', b'<html>new build</html>', mtime=stat.st_mtime + 10)
+        second = self.client.get('/api/', headers={'If-None-Match': first['ETag']})
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, b'<html>new build</html>')
+
+    def test_static_assets(self):
+        factory = RequestFactory()
+        hashed = frontend.serve_static(factory.get('/static/js/main.3f2a1b9c.js'), 'js/main.3f2a1b9c.js')
+        self.assertEqual(hashed['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertTrue(hashed['Content-Type'].startswith(('text/javascript', 'application/javascript')))
+        plain = frontend.serve_static(factory.get('/static/js/config.js'), 'js/config.js')
+        self.assertEqual(plain['Cache-Control'], 'no-cache')
+        for bad_path in ('../index.html', 'js/missing.js', 'js'):
+            with self.assertRaises(frontend.Http404):
+                frontend.serve_static(factory.get(f'/static/{bad_path}'), bad_path)
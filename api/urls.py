@@ -1,18 +1,30 @@
 # users/urls.py
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# I/O-bound endpoints have native async implementations for ASGI deployments
+if settings.ASYNC_VIEWS:
+    from . import async_views as io_views
+else:
+    io_views = views
+
 urlpatterns = [
     path('api/add', views.add_sample, name='add_user'),
+    path('api/bulk', views.add_samples_bulk, name='add_users_bulk'),
     path('api/all', views.get_all_samples, name='all_users'),
+    path('api/search', views.search_samples, name='search_users'),
+    path('api/export', views.export_samples, name='export_samples'),
     path('', views.root_view, name='root_view'),
-    path('auth/google/', views.google_login, name='google_login'),
+    path('auth/google/', io_views.google_login, name='google_login'),
     
     # Payment-related endpoints - remove /api/ prefix as it's already included in backend/urls.py
     path('account/', views.get_user_account, name='user_account'),
-    path('payments/create/', views.create_payment_intent, name='create_payment'),
+    path('payments/create/', io_views.create_payment_intent, name='create_payment'),
     path('payments/history/', views.get_payment_history, name='payment_history'),
+    path('payments/stats/', views.get_payment_stats, name='payment_stats'),
+    path('payments/export/', views.export_payment_history, name='export_payments'),
     path('webhooks/lemonsqueezy/', views.lemon_squeezy_webhook, name='lemon_squeezy_webhook'),
     # Add products list route
-    path('payments/products/', views.get_products, name='get_products'),
+    path('payments/products/', io_views.get_products, name='get_products'),
 ]
@@ -2,24 +2,34 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import NotFound, ParseError, UnsupportedMediaType
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
 from django.shortcuts import get_list_or_404, get_object_or_404
 from .models import SampleModel, UserAccount, PaymentTransaction
-from .serializers import SampleSerializer, UserAccountSerializer, PaymentTransactionSerializer, UserWithAccountSerializer
+from .serializers import PaymentStatsSerializer, SampleSearchSerializer, SampleSerializer, UserAccountSerializer, UserWithAccountSerializer
+from .catalog import ProductCatalog, ProductCatalogError
+from .pagination import KeysetPagination
+from .exports import EXPORT_RENDERERS, streaming_export
+from .fast_serializers import FastJSONRenderer, payment_transaction_values, sample_values
+from .response_cache import cached_response, sample_list_cache
+from . import frontend, rollups, search, webhooks
+# google_auth and http_client (google.auth, cryptography, requests, httpx) are
+# imported by the views that call out, not at worker boot; see profile_startup.
+# SocialAccount and RefreshToken are imported where used too, although the app
+# registry (allauth.socialaccount) and JWTAuthentication load them at boot anyway
 import logging
 from django.conf import settings
-from django.http import FileResponse, JsonResponse
+from django.db import DatabaseError, IntegrityError, router, transaction as db_transaction
+from django.http import Http404, JsonResponse
 import os
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework.decorators import permission_classes
+from rest_framework.decorators import permission_classes, renderer_classes
 from django.contrib.auth.models import User
-from allauth.socialaccount.models import SocialAccount
-from rest_framework_simplejwt.tokens import RefreshToken
-import requests  # Use Python's requests library instead of google.auth.transport.requests
 import json
 import hmac
 import hashlib
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_POST, require_safe
 from decimal import Decimal, InvalidOperation, InvalidOperation
 
 logger = logging.getLogger(__name__)
@@ -47,42 +57,267 @@ def add_sample(request):
         logger.error(f"Error creating sample: {str(e)}")
         return Response({"detail": "Error creating sample"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/json-seq')
+
+
+def _iter_bulk_rows(request):
+    """
+    Yields (row, parse_error) for each row of a JSON array or NDJSON body.
+    NDJSON bodies are read line by line instead of being loaded whole.
+    """
+    if request.content_type in NDJSON_CONTENT_TYPES:
+        stream = request.stream
+        if stream is None:
+            return
+        for line in iter(stream.readline, b''):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line), None
+            except ValueError as e:
+                yield None, {"non_field_errors": [f"JSON parse error - {str(e)}"]}
+        return
+
+    data = request.data
+    if not isinstance(data, list):
+        raise ParseError("Expected a JSON array or an NDJSON body.")
+    for row in data:
+        yield row, None
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def add_samples_bulk(request):
+    """
+    Add many samples in one request from a JSON array or an NDJSON stream.
+    Valid rows are inserted with bulk_create, one transaction per batch of
+    BULK_INSERT_BATCH_SIZE rows; invalid rows are reported with their index.
+    """
+    batch_size = getattr(settings, 'BULK_INSERT_BATCH_SIZE', 1000)
+    serializer = SampleSerializer(many=True, context={'batch_size': batch_size})
+    created = 0
+    errors = []
+    try:
+        offset = 0
+        for batch in _batches(_iter_bulk_rows(request), batch_size):
+            rows = []
+            for index, (row, parse_error) in enumerate(batch, start=offset):
+                if parse_error is not None:
+                    errors.append({"row": index, "errors": parse_error})
+                else:
+                    rows.append((index, row))
+            offset += len(batch)
+
+            valid, invalid = serializer.validate_rows(rows)
+            errors += invalid
+            if not valid:
+                continue
+            try:
+                with db_transaction.atomic():
+                    created += len(serializer.create([data for _, data in valid]))
+                    # bulk_create sends no post_save signals
+                    sample_list_cache.invalidate()
+            except DatabaseError as e:
+                logger.error(f"Bulk insert of {len(valid)} samples failed: {str(e)}")
+                errors += [
+                    {"row": index, "errors": {"non_field_errors": ["Database error, batch rolled back"]}}
+                    for index, _ in valid
+                ]
+    except (ParseError, UnsupportedMediaType):
+        raise
+    except Exception as e:
+        logger.error(f"Error bulk creating samples: {str(e)}")
+        return Response({"detail": "Error creating samples"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    logger.info(f"Bulk created {created} samples, {len(errors)} rows rejected")
+    errors.sort(key=lambda error: error["row"])
+    return Response(
+        {
+            "created": created,
+            "failed": len(errors),
+            "errors": errors,
+            "message": "samples created successfully" if created else "no samples created",
+        },
+        status=status.HTTP_201_CREATED if created or not errors else status.HTTP_400_BAD_REQUEST
+    )
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@renderer_classes([FastJSONRenderer, BrowsableAPIRenderer])
 def get_all_samples(request):
     """
-    Get all sample from the database.
+    Get one page of samples from the database, ordered by id.
     Equivalent to /sample/all in FastAPI.
+    Use the returned next/previous cursors to walk the table.
     """
-    # print user info
-    print(request.user)
+    cacheable = isinstance(request.accepted_renderer, JSONRenderer)
     try:
-        samples = SampleModel.objects.all()  # or get_list_or_404(sampleModel)
-        serializer = SampleSerializer(samples, many=True)
-        logger.info("Retrieved all samples")
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        if cacheable:
+            # Read the version before querying, so a concurrent write can only
+            # make this response land under an already retired version
+            version = sample_list_cache.version()
+            # Replica pages are kept apart so users pinned to the primary see their writes
+            database = router.db_for_read(SampleModel)
+            key = sample_list_cache.key(request, version, database)
+            hit = sample_list_cache.get(key)
+            if hit is not None:
+                return cached_response(request, *hit)
+
+        paginator = KeysetPagination(ordering=('id',))
+        queryset = SampleModel.objects.using(database) if cacheable else SampleModel.objects.all()
+        samples = paginator.paginate_queryset(sample_values.rows(queryset), request)
+        logger.info(f"Retrieved {len(samples)} samples")
+        response = paginator.get_paginated_response(sample_values.to_representation(samples))
+        if not cacheable:
+            return response
+        body = request.accepted_renderer.render(response.data, request.accepted_media_type, {'request': request})
+        etag = sample_list_cache.set(key, body, database)
+        return cached_response(request, etag, body)
+    except NotFound:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving samples: {str(e)}")
         return Response({"detail": "Error retrieving samples"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([FastJSONRenderer, BrowsableAPIRenderer])
+def search_samples(request):
+    """
+    Search samples by name (q, match=prefix|contains) and age range
+    (age_min, age_max), sorted by ordering and paginated like /api/all.
+    """
+    params = SampleSearchSerializer(data=request.query_params)
+    if not params.is_valid():
+        return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+    filters = params.validated_data
+    try:
+        ordering = filters.pop('ordering', 'name' if filters.get('q') else 'id')
+        queryset = search.search_samples(router.db_for_read(SampleModel), **filters)
+        paginator = KeysetPagination(ordering=search.ORDERINGS[ordering])
+        samples = paginator.paginate_queryset(sample_values.rows(queryset), request)
+        return paginator.get_paginated_response(sample_values.to_representation(samples))
+    except NotFound:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching samples: {str(e)}")
+        return Response({"detail": "Error searching samples"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@require_safe
 def root_view(request):
     """
     Serve the React UI or a default message based on the SERVE_UI flag.
     Equivalent to FastAPI's "/" route.
     """
     if settings.SERVE_UI:
-        # e.g. "path/to/app/frontend/build/index.html"
-        react_index = os.path.join(settings.BASE_DIR, 'frontend', 'build', 'index.html')
-        print(react_index)
-        if os.path.exists(react_index):
-            return FileResponse(open(react_index, 'rb'))
-        else:
+        try:
+            # index.html is served from memory, see api/frontend.py
+            return frontend.serve_index(request)
+        except Http404:
             return JsonResponse({"detail": "React build not found. SERVE_UI is enabled but no build folder present."},
                                 status=404)
     else:
         return JsonResponse({"message": "Django sample Manager API is running. UI is disabled."})
 
+def login_response_data(user, account, refresh):
+    """
+    Build the google_login response body: JWT pair plus the user's details.
+    """
+    user_data = {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'account_value': float(account.account_value)
+    }
+    return {
+        'access': str(refresh.access_token),
+        'refresh': str(refresh),
+        'user': user_data
+    }
+
+
+def allocate_username(base):
+    """
+    Return ``base`` or the first free ``base<N>``, using a single query
+    no matter how many of them are already taken.
+    """
+    # A range on the unique index rather than LIKE 'base%', which SQLite
+    # compares case-insensitively and so answers with a full scan
+    usernames = User.objects.filter(username__gte=base)
+    upper = search.prefix_upper_bound(base)
+    if upper is not None:
+        usernames = usernames.filter(username__lt=upper)
+    taken = set(usernames.values_list('username', flat=True))
+    username, counter = base, 1
+    while username in taken:
+        username = f"{base}{counter}"
+        counter += 1
+    return username
+
+
+def provision_google_user(email, first_name, last_name, sub, userinfo):
+    """
+    Get or create the user for a Google login, with their account and social account.
+    A returning user costs two queries (three if their name changed);
+    a new user is created in one transaction.
+    """
+    from allauth.socialaccount.models import SocialAccount
+
+    user = User.objects.select_related('account').filter(email=email).first()
+
+    if user is None:
+        for attempt in range(3):
+            try:
+                with db_transaction.atomic():
+                    user = User.objects.create_user(
+                        username=allocate_username(email),
+                        email=email,
+                        first_name=first_name,
+                        last_name=last_name
+                    )
+                    account = UserAccount.objects.create(user=user, account_value=Decimal('0.00'))
+                    SocialAccount.objects.create(user=user, provider='google', uid=sub, extra_data=userinfo)
+                return user, account
+            except IntegrityError:
+                # Another login took the username first; allocate again
+                if attempt == 2:
+                    raise
+
+    # Update user info in case it changed
+    if first_name or last_name:
+        names = {'first_name': first_name, 'last_name': last_name}
+        changed = [field for field, value in names.items() if getattr(user, field) != value]
+        if changed:
+            for field in changed:
+                setattr(user, field, names[field])
+            user.save(update_fields=changed)
+
+    # Create or update social account
+    if not SocialAccount.objects.filter(user=user, provider='google', uid=sub).update(extra_data=userinfo):
+        SocialAccount.objects.create(user=user, provider='google', uid=sub, extra_data=userinfo)
+
+    # Make sure user has an account
+    try:
+        account = user.account
+    except UserAccount.DoesNotExist:
+        account = UserAccount.objects.create(user=user, account_value=Decimal('0.00'))
+    return user, account
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def google_login(request):
@@ -90,23 +325,18 @@ def google_login(request):
     if not google_token:
         return Response({'error': 'No token provided'}, status=status.HTTP_400_BAD_REQUEST)
     
+    import requests  # Exceptions only; outbound calls go through api.http_client
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from . import google_auth
+
     try:
-        # Use the access token to get user info from Google
-        userinfo_response = requests.get(
-            'https://www.googleapis.com/oauth2/v3/userinfo',
-            headers={'Authorization': f'Bearer {google_token}'}
-        )
-        
-        if userinfo_response.status_code != 200:
-            return Response(
-                {'error': f'Failed to get user info from Google: {userinfo_response.text}'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        # ID tokens are verified locally; access tokens go through the (cached) userinfo call
+        try:
+            userinfo = google_auth.resolve_google_user(google_token)
+        except google_auth.GoogleTokenError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        userinfo = userinfo_response.json()
-        print("Google user info:", userinfo)  # Debug print
-        
-        # Extract user info from the userinfo response
+        # Extract user info from the verified claims / userinfo response
         email = userinfo.get('email')
         if not email:
             return Response({'error': 'Email not found in user info'}, status=status.HTTP_400_BAD_REQUEST)
@@ -118,70 +348,21 @@ def google_login(request):
         if not sub:
             return Response({'error': 'User ID not found in Google response'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get or create user
-        try:
-            user = User.objects.get(email=email)
-            # Update user info in case it changed
-            if first_name or last_name:
-                user.first_name = first_name
-                user.last_name = last_name
-                user.save()
-        except User.DoesNotExist:
-            # Create new user
-            username = email
-            base_username = username
-            counter = 1
-            while User.objects.filter(username=username).exists():
-                username = f"{base_username}{counter}"
-                counter += 1
-            
-            user = User.objects.create_user(
-                username=username,
-                email=email,
-                first_name=first_name,
-                last_name=last_name
-            )
-            
-            # Create user account with default value
-            UserAccount.objects.create(user=user, account_value=0.00)
-        
-        # Create or update social account
-        SocialAccount.objects.update_or_create(
-            user=user,
-            provider='google',
-            uid=sub,
-            defaults={'extra_data': userinfo}
-        )
-        
+        user, account = provision_google_user(email, first_name, last_name, sub, userinfo)
+
         # Generate JWT tokens
         refresh = RefreshToken.for_user(user)
-        
-        # Make sure user has an account
-        account, created = UserAccount.objects.get_or_create(user=user, defaults={'account_value': 0.00})
-        
-        user_data = {
-            'id': user.id,
-            'username': user.username,
-            'email': user.email,
-            'first_name': user.first_name,
-            'last_name': user.last_name,
-            'account_value': float(account.account_value)
-        }
-        
-        return Response({
-            'access': str(refresh.access_token),
-            'refresh': str(refresh),
-            'user': user_data
-        })
+
+        return Response(login_response_data(user, account, refresh))
         
     except requests.RequestException as e:
-        print("Google login error:", str(e))  # Add debug logging
+        logger.error(f"Google login error: {str(e)}")
         return Response(
             {'error': f'Failed to communicate with Google: {str(e)}'}, 
             status=status.HTTP_400_BAD_REQUEST
         )
     except Exception as e:
-        print("Unexpected error during Google login:", str(e))  # Add debug logging
+        logger.error(f"Unexpected error during Google login: {str(e)}")
         return Response(
             {'error': f'Authentication failed: {str(e)}'}, 
             status=status.HTTP_400_BAD_REQUEST
@@ -194,12 +375,14 @@ def get_user_account(request):
     Get the current user's account details
     """
     try:
-        # Get or create user account
-        account, created = UserAccount.objects.get_or_create(
-            user=request.user, 
-            defaults={'account_value': 0.00}
-        )
-        
+        # get_or_create() always reads from the primary, so only use it when missing
+        account = UserAccount.objects.filter(user=request.user).first()
+        if account is None:
+            account, created = UserAccount.objects.get_or_create(
+                user=request.user,
+                defaults={'account_value': 0.00}
+            )
+
         serializer = UserAccountSerializer(account)
         return Response(serializer.data, status=status.HTTP_200_OK)
     except Exception as e:
@@ -217,53 +400,36 @@ def create_payment_intent(request):
         if not product_id:
             return Response({"detail": "product_id is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        products_lookup = get_product_list()
-        
-        if not products_lookup:
-            logger.error("Failed to fetch products list")
+        try:
+            # O(1) lookup in the cached id -> product index
+            product_info = product_catalog.get(product_id)
+        except ProductCatalogError as e:
+            logger.error(f"Failed to fetch products list: {str(e)}")
             return Response({"detail": "Failed to fetch products list"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
-        # Find the product in the list by matching ID
-        product_info = next((item for item in products_lookup if item["id"] == product_id), None)
+
         if not product_info:
             logger.error(f"Invalid product_id received: {product_id}")
             return Response({"detail": "Invalid product_id"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Parse the price string (removing currency symbol and converting to decimal)
-        price_str = product_info["price"]
-        # Remove currency symbol, commas and any whitespace
-        price_str = ''.join(c for c in price_str if c.isdigit() or c == '.')
-        
         try:
-            amount = Decimal(price_str)
+            amount = parse_price(product_info["price"])
         except (InvalidOperation, ValueError) as e:
-            logger.error(f"Failed to parse price string '{price_str}': {str(e)}")
+            logger.error(f"Failed to parse price string '{product_info['price']}': {str(e)}")
             return Response(
                 {"detail": "Invalid price format from product data"}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
         # Create a local transaction with 'pending' status
-        transaction = PaymentTransaction.objects.create(
+        transaction = rollups.create_transaction(
             user=request.user,
-            transaction_id=f"ls_{os.urandom(8).hex()}",  # Random transaction ID
+            transaction_id=new_transaction_id(),
             amount=amount,
             status='pending', 
             currency='CAD'  # Adjust as needed
         )
 
-        # Build the Lemon Squeezy checkout URL with custom data
-        checkout_url = (
-            f"{product_info['by_now_url']}?"
-            f"checkout[custom][transaction_id]={transaction.transaction_id}"
-        )
-
-        return Response({
-            "transaction_id": transaction.transaction_id,
-            "checkout_url": checkout_url,
-            "amount": float(transaction.amount),
-            "status": transaction.status,
-        }, status=status.HTTP_201_CREATED)
+        return Response(payment_intent_data(product_info, transaction), status=status.HTTP_201_CREATED)
     
     except Exception as e:
         logger.error(f"Error creating payment intent: {str(e)}", exc_info=True)
@@ -272,21 +438,52 @@ def create_payment_intent(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
         
+def parse_price(price_str):
+    """
+    Parse a formatted price such as "$1,234.50" into a Decimal.
+    """
+    # Remove currency symbol, commas and any whitespace
+    return Decimal(''.join(c for c in price_str if c.isdigit() or c == '.'))
+
+
+def payment_intent_data(product_info, transaction):
+    """
+    Build the create_payment_intent response body for a pending transaction.
+    """
+    # Build the Lemon Squeezy checkout URL with custom data
+    checkout_url = (
+        f"{product_info['by_now_url']}?"
+        f"checkout[custom][transaction_id]={transaction.transaction_id}"
+    )
+    return {
+        "transaction_id": transaction.transaction_id,
+        "checkout_url": checkout_url,
+        "amount": float(transaction.amount),
+        "status": transaction.status,
+    }
+
+
+def new_transaction_id():
+    return f"ls_{os.urandom(8).hex()}"  # Random transaction ID
+
+
 @csrf_exempt
 @require_POST
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def lemon_squeezy_webhook(request):
     """
-    Handle Lemon Squeezy webhooks
+    Handle Lemon Squeezy webhooks.
+    Verified events are appended to the WebhookEvent inbox and acknowledged
+    immediately; the process_webhooks command applies them.
     """
     try:
         logger.debug(f"Received webhook request. Headers: {dict(request.headers)}")
-        logger.debug(f"Request body: {request.body.decode('utf-8')}")
 
         try:
-            payload = json.loads(request.body)
-        except json.JSONDecodeError as e:
+            # Decoded up front: the inbox stores the body as UTF-8 text
+            payload = json.loads(request.body.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
             logger.error(f"Failed to parse webhook JSON: {str(e)}")
             return Response({"detail": "Invalid JSON payload"}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -300,69 +497,19 @@ def lemon_squeezy_webhook(request):
             logger.error("Invalid webhook signature")
             return Response({"detail": "Invalid signature"}, status=status.HTTP_401_UNAUTHORIZED)
 
-        meta_data = payload.get('meta', {})
-        event_name = meta_data.get('event_name')
-        if not event_name:
-            logger.error("Missing event_name in payload['meta']")
-            return Response({"detail": "Missing event name"}, status=status.HTTP_400_BAD_REQUEST)
-
-        logger.info(f"Processing webhook event: {event_name}")
-
-        # 1) Get custom_data from meta
-        custom_data = meta_data.get('custom_data', {})
-        if not isinstance(custom_data, dict):
-            logger.error(f"Invalid custom_data format: {custom_data}")
-            return Response({"detail": "Invalid custom_data format"}, status=status.HTTP_400_BAD_REQUEST)
-
-        transaction_id = custom_data.get('transaction_id')
-        if not transaction_id:
-            logger.error("No transaction_id in meta.custom_data")
-            return Response({"detail": "No transaction ID found"}, status=status.HTTP_400_BAD_REQUEST)
-
-        # 2) Optionally, read from data->attributes if needed:
-        order_data = payload.get('data', {}).get('attributes', {})
-        order_status = order_data.get('status')
-        # etc...
-
-        # 3) Handle events
-        if event_name == 'order_created':
-            # Mark transaction as 'processing'
-            try:
-                transaction = PaymentTransaction.objects.get(transaction_id=transaction_id)
-                transaction.status = 'processing'
-                transaction.save()
-                logger.info(f"Updated transaction {transaction_id} to processing status")
-            except PaymentTransaction.DoesNotExist:
-                logger.error(f"Transaction not found: {transaction_id}")
-                return Response({"detail": "Transaction not found"}, status=status.HTTP_404_NOT_FOUND)
-
-        elif event_name == 'order_paid':
-            # Mark transaction as 'completed' & update user balance
-            try:
-                transaction = PaymentTransaction.objects.get(transaction_id=transaction_id)
-                transaction.status = 'completed'
-                transaction.save()
-
-                account, _ = UserAccount.objects.get_or_create(
-                    user=transaction.user, defaults={'account_value': 0.00}
-                )
-                old_balance = account.account_value
-                account.account_value += Decimal(str(transaction.amount))
-                account.save()
-
-                logger.info(f"Transaction {transaction_id} completed. "
-                            f"Balance updated from {old_balance} to {account.account_value}")
-            except PaymentTransaction.DoesNotExist:
-                logger.error(f"Transaction not found: {transaction_id}")
-                return Response({"detail": "Transaction not found"}, status=status.HTTP_404_NOT_FOUND)
-            except Exception as e:
-                logger.error(f"Error updating account balance: {str(e)}")
-                return Response({"detail": "Error updating account"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        else:
+        try:
+            event_name, transaction_id = webhooks.parse_event(payload)
+        except webhooks.WebhookPayloadError as e:
+            logger.error(f"Invalid webhook payload: {str(e)}")
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if event_name not in webhooks.HANDLED_EVENTS:
             logger.warning(f"Unhandled event type: {event_name}")
             return Response({"detail": "Event acknowledged"}, status=status.HTTP_200_OK)
 
-        return Response({"detail": "Webhook processed successfully"}, status=status.HTTP_200_OK)
+        webhooks.enqueue_event(request.body, event_name)
+        logger.info(f"Queued webhook event {event_name} for transaction {transaction_id}")
+        return Response({"detail": "Webhook received"}, status=status.HTTP_200_OK)
 
     except Exception as e:
         logger.error(f"Error processing webhook: {str(e)}", exc_info=True)
@@ -393,68 +540,174 @@ def verify_lemon_squeezy_signature(payload, signature):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@renderer_classes([FastJSONRenderer, BrowsableAPIRenderer])
 def get_payment_history(request):
     """
-    Get the user's payment history
+    Get the user's payment history, newest first, one page at a time
     """
     try:
-        transactions = PaymentTransaction.objects.filter(user=request.user).order_by('-created_at')
-        serializer = PaymentTransactionSerializer(transactions, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        paginator = KeysetPagination(ordering=('-created_at', '-id'))
+        transactions = paginator.paginate_queryset(
+            payment_transaction_values.rows(PaymentTransaction.objects.filter(user=request.user)), request
+        )
+        return paginator.get_paginated_response(payment_transaction_values.to_representation(transactions))
+    except NotFound:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving payment history: {str(e)}")
         return Response({"detail": "Error retrieving payment history"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
 
-def get_product_list():
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_payment_stats(request):
+    """
+    Payment counts and totals from the rollups, grouped by group_by and
+    limited to start..end (days, inclusive). Users see their own payments;
+    staff grouping by user see everyone's.
+    """
+    params = PaymentStatsSerializer(data=request.query_params)
+    if not params.is_valid():
+        return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+    group_by = params.validated_data['group_by']
+    if 'user' in group_by and not request.user.is_staff:
+        return Response({"detail": "Only staff can group by user"}, status=status.HTTP_403_FORBIDDEN)
+    try:
+        rows = rollups.totals(
+            group_by,
+            user=None if 'user' in group_by else request.user,
+            start=params.validated_data.get('start'),
+            end=params.validated_data.get('end'),
+        )
+        results = []
+        for row in rows:
+            if 'user_id' in row:
+                row['user'] = row.pop('user_id')
+            if 'day' in row:
+                row['day'] = row['day'].isoformat()
+            row['amount'] = f"{row['amount']:.2f}"
+            results.append(row)
+        return Response({"group_by": group_by, "results": results})
+    except Exception as e:
+        logger.error(f"Error retrieving payment stats: {str(e)}")
+        return Response({"detail": "Error retrieving payment stats"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes(EXPORT_RENDERERS)
+def export_samples(request):
+    """
+    Stream every sample as NDJSON (default) or CSV (Accept: text/csv).
+    Gzip-compressed on the fly when the client sends Accept-Encoding: gzip.
+    """
+    queryset = SampleModel.objects.order_by('id')
+    logger.info("Exporting samples")
+    return streaming_export(request, queryset, ['id', 'name', 'age'], 'samples')
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes(EXPORT_RENDERERS)
+def export_payment_history(request):
+    """
+    Stream the user's payment history as NDJSON (default) or CSV (Accept: text/csv).
+    """
+    queryset = PaymentTransaction.objects.filter(user=request.user).order_by('-created_at', '-id')
+    columns = ['id', 'transaction_id', 'amount', 'currency', 'status', 'payment_method', 'created_at']
+    return streaming_export(request, queryset, columns, 'payments')
+
+
+LEMON_SQUEEZY_PRODUCTS_URL = "https://api.lemonsqueezy.com/v1/products"
+
+
+def _lemon_squeezy_headers():
+    """
+    Returns the Lemon Squeezy API headers, or raises if the API key is missing.
+    """
+    api_token = os.getenv('LEMON_SQUEEZY_API_KEY', None)
+    if not api_token:
+        logger.error("LEMON_SQUEEZY_API_KEY not set in environment")
+        raise ProductCatalogError("Server misconfiguration: no API key.")
+    return {
+        "Accept": "application/json",
+        "Authorization": f"Bearer {api_token}",
+    }
+
+
+def _parse_product_list(response):
+    """
+    Turns a Lemon Squeezy /v1/products response into a simplified product list.
+    """
+    if response.status_code != 200:
+        logger.error(f"Failed to fetch products: {response.text}")
+        raise ProductCatalogError(
+            f"Error fetching products from Lemon Squeezy. Status: {response.status_code}"
+        )
+
+    data = response.json()
+    products_list = []
+    for item in data.get("data", []):
+        attr = item.get("attributes", {})
+        # Removed unnecessary print statements; build a cleaner product object
+        products_list.append({
+            # Extract product ID from the buy_now_url if available
+            "id": attr.get("buy_now_url").split("/")[-1] if attr.get("buy_now_url") else None,
+            "by_now_url": attr.get("buy_now_url"),
+            "name": attr.get("name"),
+            "slug": attr.get("slug"),
+            "price": attr.get("price_formatted"),  # Consider using "from_price" if needed
+        })
+
+    logger.debug(f"Fetched {len(products_list)} products from Lemon Squeezy")
+    return products_list
+
+
+def fetch_product_list():
     """
     Fetches the product list from Lemon Squeezy's API and returns a simplified list.
+    Raises ProductCatalogError if the list cannot be fetched.
     """
+    from . import http_client
+
     try:
-        # 1) Load the API token from the environment
-        api_token = os.getenv('LEMON_SQUEEZY_API_KEY', None)
-        if not api_token:
-            logger.error("LEMON_SQUEEZY_API_KEY not set in environment")
-            return Response(
-                {"detail": "Server misconfiguration: no API key."},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        headers = _lemon_squeezy_headers()
+        response = http_client.get(LEMON_SQUEEZY_PRODUCTS_URL, headers=headers)
+        return _parse_product_list(response)
+    except ProductCatalogError:
+        raise
+    except Exception as e:
+        logger.exception("Unexpected error fetching Lemon Squeezy products")
+        raise e
 
-        # 2) Request the product list from Lemon Squeezy API
-        url = "https://api.lemonsqueezy.com/v1/products"
-        headers = {
-            "Accept": "application/json",
-            "Authorization": f"Bearer {api_token}",
-        }
-        response = requests.get(url, headers=headers)
 
-        if response.status_code != 200:
-            logger.error(f"Failed to fetch products: {response.text}")
-            return Response(
-                {"detail": f"Error fetching products from Lemon Squeezy. Status: {response.status_code}"},
-                status=status.HTTP_502_BAD_GATEWAY
-            )
+async def afetch_product_list():
+    """
+    Async variant of fetch_product_list() using the pooled httpx client.
+    """
+    from . import http_client
 
-        data = response.json()
-        products_list = []
-        for item in data.get("data", []):
-            attr = item.get("attributes", {})
-            # Removed unnecessary print statements; build a cleaner product object
-            products_list.append({
-                # Extract product ID from the buy_now_url if available
-                "id": attr.get("buy_now_url").split("/")[-1] if attr.get("buy_now_url") else None,
-                "by_now_url": attr.get("buy_now_url"),
-                "name": attr.get("name"),
-                "slug": attr.get("slug"),
-                "price": attr.get("price_formatted"),  # Consider using "from_price" if needed
-            })
-
-        logger.debug(f"Fetched {len(products_list)} products from Lemon Squeezy")
-        return products_list
+    try:
+        headers = _lemon_squeezy_headers()
+        response = await http_client.aget(LEMON_SQUEEZY_PRODUCTS_URL, headers=headers)
+        return _parse_product_list(response)
+    except ProductCatalogError:
+        raise
     except Exception as e:
         logger.exception("Unexpected error fetching Lemon Squeezy products")
         raise e
-    
+
+
+# Shared per-process catalog; TTLs come from PRODUCT_CATALOG_* settings.
+product_catalog = ProductCatalog(fetch_product_list, async_fetcher=afetch_product_list)
+
+
+def get_product_list():
+    """
+    Returns the (cached) simplified product list from Lemon Squeezy.
+    """
+    return product_catalog.products()
+
 @api_view(['GET'])
 @permission_classes([AllowAny])  # or IsAuthenticated if you want only logged-in users
 def get_products(request):
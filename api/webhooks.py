@@ -0,0 +1,218 @@
+# api/webhooks.py
+import hashlib
+import json
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import retention, rollups
+from .models import ArchivedPaymentTransaction, BalanceLedgerEntry, PaymentTransaction, UserAccount, WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+# Events that change local state; anything else is acknowledged and dropped
+HANDLED_EVENTS = ('order_created', 'order_paid')
+
+
+class WebhookPayloadError(Exception):
+    """
+    The webhook payload is malformed; retrying it will never succeed.
+    """
+
+
+class WebhookRetryableError(Exception):
+    """
+    The event could not be applied yet (e.g. unknown transaction); retry later.
+    """
+
+
+def parse_event(payload):
+    """
+    Validate a decoded Lemon Squeezy payload.
+    Returns (event_name, transaction_id) or raises WebhookPayloadError.
+    """
+    if not isinstance(payload, dict):
+        raise WebhookPayloadError("Invalid JSON payload")
+
+    meta_data = payload.get('meta', {})
+    event_name = meta_data.get('event_name')
+    if not event_name:
+        raise WebhookPayloadError("Missing event name")
+
+    custom_data = meta_data.get('custom_data', {})
+    if not isinstance(custom_data, dict):
+        raise WebhookPayloadError("Invalid custom_data format")
+
+    transaction_id = custom_data.get('transaction_id')
+    if not transaction_id:
+        raise WebhookPayloadError("No transaction ID found")
+
+    return event_name, transaction_id
+
+
+def event_id_for(body):
+    """
+    Deduplication key for a delivery. Lemon Squeezy retries resend the
+    identical signed body, so its digest identifies the event.
+    """
+    return hashlib.sha256(body).hexdigest()
+
+
+def enqueue_event(body, event_name):
+    """
+    Append a verified raw delivery to the inbox with a single INSERT.
+    Duplicate deliveries are ignored by the unique event_id.
+    """
+    WebhookEvent.objects.bulk_create(
+        [WebhookEvent(event_id=event_id_for(body), event_name=event_name, payload=body.decode('utf-8'))],
+        ignore_conflicts=True,
+    )
+
+
+def apply_event(event_name, transaction_id, payload):
+    """
+    Apply one event's state transition. Must run inside a transaction.
+    Transitions are conditional UPDATEs, so replays, out-of-order deliveries
+    and concurrent workers are safe without holding row locks.
+    """
+    if event_name not in HANDLED_EVENTS:
+        logger.warning(f"Unhandled event type: {event_name}")
+        return
+
+    transactions = PaymentTransaction.objects.filter(transaction_id=transaction_id)
+    now = timezone.now()
+
+    if event_name == 'order_created':
+        # Mark transaction as 'processing' unless a later event already moved it on
+        if transactions.filter(status='pending').update(status='processing', updated_at=now):
+            rollups.record_transition(transactions.get(), 'pending')
+            logger.info(f"Updated transaction {transaction_id} to processing status")
+        elif not transactions.exists():
+            if ArchivedPaymentTransaction.objects.filter(transaction_id=transaction_id).exists():
+                logger.info(f"Transaction {transaction_id} already archived")
+                return
+            raise WebhookRetryableError(f"Transaction not found: {transaction_id}")
+
+    elif event_name == 'order_paid':
+        # Only the worker whose UPDATE flips the status credits the balance;
+        # the UPDATE is conditional on the status read, so the rollups also
+        # know which bucket the transaction leaves
+        while True:
+            transaction = transactions.first()
+            if transaction is None:
+                # A late payment for an archived failed or expired checkout
+                if retention.restore_archived(transaction_id):
+                    continue
+                if ArchivedPaymentTransaction.objects.filter(
+                    transaction_id=transaction_id, status='completed'
+                ).exists():
+                    logger.info(f"Transaction {transaction_id} already completed (archived)")
+                    return
+                raise WebhookRetryableError(f"Transaction not found: {transaction_id}")
+            if transaction.status == 'completed':
+                logger.info(f"Transaction {transaction_id} already completed")
+                return
+            old_status = transaction.status
+            if transactions.filter(status=old_status).update(status='completed', updated_at=now):
+                break
+
+        transaction.status, transaction.updated_at = 'completed', now
+        credit_balance(transaction)
+        rollups.record_transition(transaction, old_status)
+        logger.info(f"Transaction {transaction_id} completed. "
+                    f"Balance increased by {transaction.amount}")
+
+
+def credit_balance(transaction):
+    """
+    Record a completed payment in the ledger and add it to the user's balance
+    with an atomic F() increment (no read-modify-write, no lost updates).
+    """
+    BalanceLedgerEntry.objects.create(
+        user_id=transaction.user_id,
+        transaction=transaction,
+        amount=transaction.amount,
+        reason='payment',
+    )
+    UserAccount.objects.get_or_create(
+        user_id=transaction.user_id, defaults={'account_value': Decimal('0.00')}
+    )
+    UserAccount.objects.filter(user_id=transaction.user_id).update(
+        account_value=F('account_value') + transaction.amount,
+        last_updated=timezone.now(),
+    )
+
+
+def _claim(event, lease):
+    """
+    Claim an event for this worker by bumping its attempt counter.
+    Returns False if another worker claimed it first.
+    """
+    now = timezone.now()
+    claimed = WebhookEvent.objects.filter(
+        pk=event.pk, status='pending', attempts=event.attempts,
+    ).update(attempts=F('attempts') + 1, next_attempt_at=now + lease)
+    if claimed:
+        event.attempts += 1
+    return bool(claimed)
+
+
+def process_event(event, max_attempts, backoff, lease):
+    """
+    Apply one inbox event and record the outcome. Returns the new status,
+    or None if another worker claimed the event.
+    """
+    if not _claim(event, lease):
+        return None
+
+    try:
+        payload = json.loads(event.payload)
+        event_name, transaction_id = parse_event(payload)
+        with db_transaction.atomic():
+            apply_event(event_name, transaction_id, payload)
+            WebhookEvent.objects.filter(pk=event.pk).update(
+                status='processed', processed_at=timezone.now(), last_error=''
+            )
+        return 'processed'
+    except (ValueError, WebhookPayloadError) as e:
+        error, retry = str(e), False
+    except Exception as e:
+        error, retry = str(e), True
+
+    if retry and event.attempts < max_attempts:
+        delay = backoff * (2 ** (event.attempts - 1))
+        WebhookEvent.objects.filter(pk=event.pk).update(
+            last_error=error, next_attempt_at=timezone.now() + timedelta(seconds=delay)
+        )
+        logger.warning(f"Webhook event {event.pk} failed (attempt {event.attempts}), retrying in {delay}s: {error}")
+        return 'pending'
+
+    WebhookEvent.objects.filter(pk=event.pk).update(status='failed', last_error=error)
+    logger.error(f"Webhook event {event.pk} failed permanently: {error}")
+    return 'failed'
+
+
+def process_batch(batch_size=None, max_attempts=None, backoff=None, lease=None):
+    """
+    Drain up to batch_size due events from the inbox, oldest first.
+    Returns a dict counting the outcomes.
+    """
+    batch_size = batch_size or getattr(settings, 'WEBHOOK_BATCH_SIZE', 100)
+    max_attempts = max_attempts or getattr(settings, 'WEBHOOK_MAX_ATTEMPTS', 5)
+    backoff = backoff if backoff is not None else getattr(settings, 'WEBHOOK_RETRY_BACKOFF', 30)
+    lease = timedelta(seconds=lease if lease is not None else getattr(settings, 'WEBHOOK_CLAIM_LEASE', 300))
+
+    events = list(
+        WebhookEvent.objects.filter(status='pending', next_attempt_at__lte=timezone.now())
+        .order_by('id')[:batch_size]
+    )
+    counts = {'processed': 0, 'pending': 0, 'failed': 0, 'skipped': 0}
+    for event in events:
+        outcome = process_event(event, max_attempts, backoff, lease)
+        counts[outcome or 'skipped'] += 1
+    return counts
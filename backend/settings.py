@@ -12,21 +12,29 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
-from dotenv import load_dotenv
 from datetime import timedelta
 
-# Load environment variables from a .env file
-load_dotenv()
-SERVE_UI = os.getenv('SERVE_UI', 'false').lower() == 'true'
-print(f"SERVE_UI: {SERVE_UI}")
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Load environment variables from the project's .env file, if there is one.
+# Every process imports this module, so skip python-dotenv (and its search
+# up the directory tree) when there is nothing to load.
+if (BASE_DIR / '.env').is_file():
+    from dotenv import load_dotenv
+    load_dotenv(BASE_DIR / '.env')
+SERVE_UI = os.getenv('SERVE_UI', 'false').lower() == 'true'
+
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'frontend', 'build', 'static'),
 ]
 
+# React build served by root_view and /static/ when SERVE_UI is on (api/frontend.py).
+# Files are cached in memory and re-read when their mtime changes.
+FRONTEND_BUILD_DIR = os.path.join(BASE_DIR, 'frontend', 'build')
+FRONTEND_RELOAD_INTERVAL = float(os.getenv('FRONTEND_RELOAD_INTERVAL', '1'))  # seconds between mtime checks
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
 
@@ -66,6 +74,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',  # first, so it times the whole stack
+    'api.admission.AdmissionControlMiddleware',  # sheds load before any other work
+    'api.db_router.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -97,6 +108,40 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'backend.wsgi.application'
 
+# Request metrics (api/metrics.py), scraped from /metrics in Prometheus format.
+# With several worker processes, point METRICS_DIR at a directory shared by them
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_DIR = os.getenv('METRICS_DIR') or None
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))  # seconds between per-process snapshots
+# Bearer token Prometheus must send to scrape /metrics; unset, /metrics is only served with DEBUG on
+METRICS_TOKEN = os.getenv('METRICS_TOKEN') or None
+
+# Bulkheads (api/admission.py): per-process concurrency limits by URL name.
+# Past `limit`, up to `queue` requests wait `timeout` seconds for a slot; the rest get 503 + Retry-After.
+ADMISSION_CONTROL_ENABLED = os.getenv('ADMISSION_CONTROL_ENABLED', 'true').lower() == 'true'
+ADMISSION_CONTROL = {
+    # Views that wait on Google or Lemon Squeezy
+    'outbound': {
+        'views': ['get_products', 'create_payment', 'google_login'],
+        'limit': int(os.getenv('ADMISSION_OUTBOUND_LIMIT', '8')),
+        'queue': int(os.getenv('ADMISSION_OUTBOUND_QUEUE', '16')),
+        'timeout': float(os.getenv('ADMISSION_OUTBOUND_TIMEOUT', '2')),  # seconds
+        'retry_after': 5,  # seconds
+    },
+    # Streaming exports hold their slot until the whole body is sent
+    'exports': {
+        'views': ['export_samples', 'export_payments'],
+        'limit': int(os.getenv('ADMISSION_EXPORTS_LIMIT', '2')),
+        'queue': int(os.getenv('ADMISSION_EXPORTS_QUEUE', '4')),
+        'timeout': float(os.getenv('ADMISSION_EXPORTS_TIMEOUT', '5')),
+        'retry_after': 30,
+    },
+}
+
+# Route google_login, get_products and create_payment_intent to the native
+# async views in api/async_views.py (enable when serving backend.asgi with uvicorn)
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'false').lower() == 'true'
+
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:3000',  # React dev server
     'http://localhost:3001',
@@ -118,13 +163,42 @@ CORS_ALLOW_ALL_ORIGINS = True
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Production SQLite profile (api/sqlite.py): WAL, persistent connections and
+# BEGIN IMMEDIATE write transactions. SQLITE_PROFILE=off keeps SQLite's defaults
+SQLITE_PROFILE = os.getenv('SQLITE_PROFILE', 'on').lower() != 'off'
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000')),  # ms a writer waits for the lock
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),  # bytes
+    'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', '-65536')),  # negative = KiB per connection
+    'temp_store': 'MEMORY',
+} if SQLITE_PROFILE else {}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '600')) if SQLITE_PROFILE else 0,  # seconds
+        'CONN_HEALTH_CHECKS': SQLITE_PROFILE,
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'} if SQLITE_PROFILE else {},
     }
 }
 
+# Read replicas (api/db_router.py): comma-separated database paths, added as
+# aliases replica1, replica2, ... Reads of safe requests go to a replica
+# unless the user wrote within the last REPLICA_PIN_SECONDS.
+DATABASE_REPLICAS = []
+for index, replica_path in enumerate(filter(None, os.getenv('DATABASE_REPLICAS', '').split(',')), start=1):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'NAME': replica_path.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{index}')
+DATABASE_ROUTERS = ['api.db_router.PrimaryReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '15'))  # should exceed the replication lag
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -147,7 +221,7 @@ AUTH_PASSWORD_VALIDATORS = [
 # Authentication settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -155,6 +229,42 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.coreapi.AutoSchema'
 }
 
+# Authenticated-user cache used by api.authentication.CachedJWTAuthentication:
+# per-process LRU, optionally shared through the named Django cache. Without a
+# shared cache, other workers notice a deactivated or changed user only when
+# their copy expires, i.e. after up to AUTH_USER_CACHE_TTL seconds
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', '60'))  # seconds, 0 disables the cache
+AUTH_USER_CACHE_SIZE = int(os.getenv('AUTH_USER_CACHE_SIZE', '1024'))  # users kept per process
+AUTH_USER_CACHE_ALIAS = os.getenv('AUTH_USER_CACHE_ALIAS') or None  # e.g. "default"; unset = process-local only
+
+# Local memory by default; set CACHE_DIR to a directory shared by all workers
+# to use the file-based cache, so that invalidations are seen by every process
+CACHE_DIR = os.getenv('CACHE_DIR')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+    } if CACHE_DIR else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Rendered responses of GET /api/all (api/response_cache.py), invalidated on
+# every SampleModel write
+RESPONSE_CACHE_ALIAS = os.getenv('RESPONSE_CACHE_ALIAS', 'default')
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', '300'))  # seconds
+
+# Keyset pagination for list endpoints (api/pagination.py): default page size
+# and the hard cap on ?page_size=
+PAGINATION_PAGE_SIZE = int(os.getenv('PAGINATION_PAGE_SIZE', '50'))
+PAGINATION_MAX_PAGE_SIZE = int(os.getenv('PAGINATION_MAX_PAGE_SIZE', '500'))
+
+# Rows fetched per database round trip by the streaming export endpoints
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+
+# Rows per bulk_create (and per transaction) in the bulk sample ingestion endpoint
+BULK_INSERT_BATCH_SIZE = int(os.getenv('BULK_INSERT_BATCH_SIZE', '1000'))
+
 # dj-rest-auth settings
 REST_AUTH = {
     'USE_JWT': True,
@@ -201,6 +311,13 @@ SOCIALACCOUNT_LOGIN_ON_GET = True
 SOCIALACCOUNT_EMAIL_REQUIRED = True
 SOCIALACCOUNT_AUTO_SIGNUP = True  # auto-create account if not exists
 
+# Google sign-in (api/google_auth.py): ID tokens are verified locally against
+# Google's cached signing keys; access tokens fall back to the userinfo endpoint
+GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID')  # expected ID token audience
+GOOGLE_JWKS_TTL = int(os.getenv('GOOGLE_JWKS_TTL', '3600'))  # upper bound; Google's Cache-Control max-age wins if shorter
+GOOGLE_JWKS_MIN_REFRESH = int(os.getenv('GOOGLE_JWKS_MIN_REFRESH', '60'))  # seconds between refetches for unknown key ids
+GOOGLE_USERINFO_CACHE_TTL = int(os.getenv('GOOGLE_USERINFO_CACHE_TTL', '60'))  # seconds, keyed by a hash of the access token
+
 # Swagger settings
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
@@ -216,6 +333,10 @@ SWAGGER_SETTINGS = {
     'PERSIST_AUTH': True,
 }
 
+# Precomputed schema served by the swagger/redoc views (python manage.py generate_openapi_schema)
+OPENAPI_SCHEMA_DIR = os.getenv('OPENAPI_SCHEMA_DIR', os.path.join(BASE_DIR, 'openapi'))
+OPENAPI_SCHEMA_MAX_AGE = int(os.getenv('OPENAPI_SCHEMA_MAX_AGE', '86400'))  # seconds; revalidated by ETag after that
+
 # JWT settings
 SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
@@ -230,6 +351,32 @@ SIMPLE_JWT = {
 # Lemon Squeezy settings
 LEMON_SQUEEZY_SIGNING_SECRET = os.environ.get('LEMON_SQUEEZY_SIGNING_SECRET', 'your-signing-secret')  # Get this from your Lemon Squeezy dashboard
 
+# Webhook inbox worker (python manage.py process_webhooks)
+WEBHOOK_BATCH_SIZE = int(os.getenv('WEBHOOK_BATCH_SIZE', '100'))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', '5'))
+WEBHOOK_RETRY_BACKOFF = int(os.getenv('WEBHOOK_RETRY_BACKOFF', '30'))  # seconds, doubled per attempt
+WEBHOOK_CLAIM_LEASE = int(os.getenv('WEBHOOK_CLAIM_LEASE', '300'))  # seconds before a crashed worker's claim expires
+
+# Payment housekeeping (python manage.py archive_payments)
+PAYMENT_PENDING_TTL = int(os.getenv('PAYMENT_PENDING_TTL', '86400'))  # seconds before an unpaid checkout expires
+PAYMENT_ARCHIVE_AFTER_DAYS = int(os.getenv('PAYMENT_ARCHIVE_AFTER_DAYS', '90'))
+PAYMENT_RETENTION_CHUNK_SIZE = int(os.getenv('PAYMENT_RETENTION_CHUNK_SIZE', '500'))  # rows per transaction
+
+# Product catalog cache: fresh for PRODUCT_CATALOG_TTL seconds, then served stale
+# for up to PRODUCT_CATALOG_STALE_TTL more seconds while refreshing in the background
+PRODUCT_CATALOG_TTL = int(os.getenv('PRODUCT_CATALOG_TTL', '300'))
+PRODUCT_CATALOG_STALE_TTL = int(os.getenv('PRODUCT_CATALOG_STALE_TTL', '3600'))
+
+# Shared outbound HTTP client (Google, Lemon Squeezy), see api/http_client.py
+OUTBOUND_HTTP = {
+    'POOL_CONNECTIONS': int(os.getenv('OUTBOUND_HTTP_POOL_CONNECTIONS', '10')),
+    'POOL_MAXSIZE': int(os.getenv('OUTBOUND_HTTP_POOL_MAXSIZE', '20')),
+    'CONNECT_TIMEOUT': float(os.getenv('OUTBOUND_HTTP_CONNECT_TIMEOUT', '3.05')),
+    'READ_TIMEOUT': float(os.getenv('OUTBOUND_HTTP_READ_TIMEOUT', '10')),
+    'MAX_RETRIES': int(os.getenv('OUTBOUND_HTTP_MAX_RETRIES', '2')),
+    'BACKOFF_FACTOR': float(os.getenv('OUTBOUND_HTTP_BACKOFF_FACTOR', '0.3')),
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
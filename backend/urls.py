@@ -1,17 +1,16 @@
 # user_manager/urls.py
 from django.contrib import admin
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, include, re_path
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
 from rest_framework_simplejwt.views import TokenRefreshView
+from api import frontend
+from api.metrics import metrics_view
+from api.openapi import API_INFO, precomputed
 
 schema_view = get_schema_view(
-    openapi.Info(
-        title="API Documentation",
-        default_version='v1',
-        description="API documentation for your Django project",
-    ),
+    API_INFO,
     public=True,
     permission_classes=(permissions.AllowAny,),
 )
@@ -22,9 +21,14 @@ urlpatterns = [
     path('auth/', include('dj_rest_auth.urls')),
     path('auth/registration/', include('dj_rest_auth.registration.urls')),
     path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('metrics', metrics_view, name='metrics'),
     
-    # Swagger URLs
-    path('swagger<format>/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    # Swagger URLs: the schema is generated at build time (generate_openapi_schema), live only in DEBUG
+    path('swagger<format>/', precomputed(schema_view.without_ui(cache_timeout=0)), name='schema-json'),
+    path('swagger/', precomputed(schema_view.with_ui('swagger', cache_timeout=0)), name='schema-swagger-ui'),
+    path('redoc/', precomputed(schema_view.with_ui('redoc', cache_timeout=0)), name='schema-redoc'),
 ]
+
+if settings.SERVE_UI:
+    # React build assets, served from memory with long-lived caching (api/frontend.py)
+    urlpatterns.append(re_path(r'^static/(?P<path>.+)$', frontend.serve_static, name='frontend_static'))
@@ -7,7 +7,9 @@ import LemonSqueezyProducts from '../components/LemonSqueezyProducts';
 
 const PaymentsPage: React.FC = () => {
   const [transactions, setTransactions] = useState<PaymentTransaction[]>([]);
+  const [nextPage, setNextPage] = useState<string | null>(null);
   const [loading, setLoading] = useState<boolean>(false);
+  const [loadingMore, setLoadingMore] = useState<boolean>(false);
   const navigate = useNavigate();
 
   useEffect(() => {
@@ -17,8 +19,9 @@ const PaymentsPage: React.FC = () => {
   const fetchTransactions = async () => {
     try {
       setLoading(true);
-      const transactions = await paymentService.getPaymentHistory();
-      setTransactions(transactions);
+      const page = await paymentService.getPaymentHistory();
+      setTransactions(page.results);
+      setNextPage(page.next);
     } catch (error: any) {
       if (error.response?.status === 401) {
         toast.error('Please login to view your payment history');
@@ -31,6 +34,20 @@ const PaymentsPage: React.FC = () => {
     }
   };
 
+  const fetchMoreTransactions = async () => {
+    if (!nextPage) return;
+    try {
+      setLoadingMore(true);
+      const page = await paymentService.getPaymentHistory(nextPage);
+      setTransactions((current) => [...current, ...page.results]);
+      setNextPage(page.next);
+    } catch (error: any) {
+      toast.error('Failed to load payment history');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const getStatusBadgeClass = (status: string) => {
     switch (status) {
       case 'completed':
@@ -94,6 +111,17 @@ const PaymentsPage: React.FC = () => {
                 ))}
               </tbody>
             </table>
+            {nextPage && (
+              <div className="text-center mb-4">
+                <button
+                  className="btn btn-outline-primary"
+                  onClick={fetchMoreTransactions}
+                  disabled={loadingMore}
+                >
+                  {loadingMore ? 'Loading...' : 'Load more'}
+                </button>
+              </div>
+            )}
           </div>
         )}
       </div>
@@ -3,6 +3,7 @@ import { useNavigate } from "react-router-dom";
 import axios from "../axiosConfig";
 import AddSampleModal from "../components/AddSampleModal";
 import toast from "react-hot-toast";
+import { Page } from "../types/auth";
 
 type Sample = {
   id: number;
@@ -12,15 +13,30 @@ type Sample = {
 
 const SampleList: React.FC = () => {
   const [samples, setSamples] = useState<Sample[]>([]);
+  const [nextPage, setNextPage] = useState<string | null>(null);
+  const [withAuth, setWithAuth] = useState<boolean>(true);
   const [showAddSampleModal, setShowAddSampleModal] = useState<boolean>(false);
   const [loading, setLoading] = useState<boolean>(false);
+  const [loadingMore, setLoadingMore] = useState<boolean>(false);
   const navigate = useNavigate();
 
+  // The list is paged; each page links to the next one
+  const getSamplesPage = async (url: string, auth: boolean) => {
+    const response = await axios.get<Page<Sample>>(url, auth ? undefined : {
+      headers: {
+        Authorization: ""  // Send empty token
+      }
+    });
+    return response.data;
+  };
+
   const fetchSamplesWithAuth = async () => {
     try {
       setLoading(true);
-      const response = await axios.get<Sample[]>("/api/api/all");
-      setSamples(response.data);
+      const page = await getSamplesPage("/api/api/all", true);
+      setSamples(page.results);
+      setNextPage(page.next);
+      setWithAuth(true);
     } catch (error: any) {
       if (error.response?.status === 401) {
         toast.error('Session expired. Please login again');
@@ -37,13 +53,11 @@ const SampleList: React.FC = () => {
   const fetchSamplesWithoutAuth = async () => {
     try {
       setLoading(true);
-      // Create a new axios instance without the auth token
-      const response = await axios.get<Sample[]>("/api/api/all", {
-        headers: {
-          Authorization: ""  // Send empty token
-        }
-      });
-      setSamples(response.data);
+      // Request without the auth token
+      const page = await getSamplesPage("/api/api/all", false);
+      setSamples(page.results);
+      setNextPage(page.next);
+      setWithAuth(false);
     } catch (error: any) {
       toast.error('Error fetching samples');
       console.error("Error fetching samples:", error);
@@ -52,6 +66,21 @@ const SampleList: React.FC = () => {
     }
   };
 
+  const fetchMoreSamples = async () => {
+    if (!nextPage) return;
+    try {
+      setLoadingMore(true);
+      const page = await getSamplesPage(nextPage, withAuth);
+      setSamples((current) => [...current, ...page.results]);
+      setNextPage(page.next);
+    } catch (error: any) {
+      toast.error('Error fetching samples');
+      console.error("Error fetching samples:", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   return (
     <div className="container mt-5">
       <div className="d-flex justify-content-between align-items-center mb-4">
@@ -106,6 +135,17 @@ const SampleList: React.FC = () => {
               ))}
             </tbody>
           </table>
+          {nextPage && (
+            <div className="text-center mb-4">
+              <button
+                className="btn btn-outline-primary"
+                onClick={fetchMoreSamples}
+                disabled={loadingMore}
+              >
+                {loadingMore ? 'Loading...' : 'Load more'}
+              </button>
+            </div>
+          )}
         </div>
       )}
 
@@ -1,5 +1,5 @@
 import axios from '../axiosConfig';
-import { PaymentTransaction } from '../types/auth';
+import { Page, PaymentTransaction } from '../types/auth';
 
 export const paymentService = {
     getUserAccount: async () => {
@@ -15,8 +15,9 @@ export const paymentService = {
         return response.data;
     },
     
-    getPaymentHistory: async () => {
-        const response = await axios.get<PaymentTransaction[]>('/api/payments/history/');
+    // Newest transactions first; pass the returned `next` link to get older ones
+    getPaymentHistory: async (pageUrl?: string) => {
+        const response = await axios.get<Page<PaymentTransaction>>(pageUrl || '/api/payments/history/');
         return response.data;
     },
 
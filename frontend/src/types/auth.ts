@@ -35,6 +35,12 @@ export interface PaymentTransaction {
     created_at: string;
 }
 
+export interface Page<T> {
+    next: string | null;
+    previous: string | null;
+    results: T[];
+}
+
 export interface PaymentProduct {
     id: string;
     name: string;